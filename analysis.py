@@ -1,10 +1,11 @@
 import pandas as pd
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
+from data_io import load_customers
 
 def load_data(file_path):
-    """تحميل البيانات من Excel"""
-    df = pd.read_excel(file_path)
+    """تحميل البيانات من Excel (أو نسخة Parquet/Feather بنفس الاسم إن وُجدت)"""
+    df = load_customers(file_path)
     return df
 
 def perform_segmentation(df):
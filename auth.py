@@ -45,11 +45,8 @@ def clear_session():
 
 def load_users():
     """تحميل جميع المستخدمين من قاعدة البيانات"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    rows = cursor.fetchall()
-    conn.close()
+    with get_connection() as conn:
+        rows = conn.execute("SELECT * FROM users").fetchall()
     
     users = {}
     for row in rows:
@@ -69,40 +66,34 @@ def load_users():
 
 def register_user(username, email, password):
     """تسجيل مستخدم جديد"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # التحقق من وجود المستخدم
-    cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "اسم المستخدم موجود بالفعل", None
-    
-    # إنشاء كود تحقق
-    verification_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    try:
-        cursor.execute("""
-            INSERT INTO users 
-            (username, password, email, subscription, subscription_date, usage_count, created_at, verified, verification_code)
-            VALUES (?, ?, ?, 'free', ?, 0, ?, 0, ?)
-        """, (username, password, email, now, now, verification_code))
-        conn.commit()
-        conn.close()
-        return True, "تم إنشاء الحساب بنجاح! استخدم كود التحقق لتفعيل حسابك", verification_code
-    except Exception as e:
-        conn.close()
-        return False, f"خطأ في إنشاء الحساب: {str(e)}", None
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        
+        # التحقق من وجود المستخدم
+        cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
+        if cursor.fetchone():
+            return False, "اسم المستخدم موجود بالفعل", None
+        
+        # إنشاء كود تحقق
+        verification_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        try:
+            cursor.execute("""
+                INSERT INTO users 
+                (username, password, email, subscription, subscription_date, usage_count, created_at, verified, verification_code)
+                VALUES (?, ?, ?, 'free', ?, 0, ?, 0, ?)
+            """, (username, password, email, now, now, verification_code))
+            conn.commit()
+            return True, "تم إنشاء الحساب بنجاح! استخدم كود التحقق لتفعيل حسابك", verification_code
+        except Exception as e:
+            return False, f"خطأ في إنشاء الحساب: {str(e)}", None
 
 
 def verify_login(username, password):
     """التحقق من تسجيل الدخول"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT password, verified FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT password, verified FROM users WHERE username = ?", (username,)).fetchone()
     
     if not row:
         return False, "اسم المستخدم غير موجود"
@@ -118,54 +109,44 @@ def verify_login(username, password):
 
 def verify_account(username, code):
     """تفعيل الحساب"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT verification_code, verified FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    
-    if not row:
-        conn.close()
-        return False, "اسم المستخدم غير موجود"
-    
-    if row['verified'] == 1:
-        conn.close()
-        return False, "الحساب مفعل بالفعل"
-    
-    if row['verification_code'] != code:
-        conn.close()
-        return False, "كود التحقق غير صحيح"
-    
-    # تفعيل الحساب
-    cursor.execute("UPDATE users SET verified = 1 WHERE username = ?", (username,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT verification_code, verified FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return False, "اسم المستخدم غير موجود"
+        
+        if row['verified'] == 1:
+            return False, "الحساب مفعل بالفعل"
+        
+        if row['verification_code'] != code:
+            return False, "كود التحقق غير صحيح"
+        
+        # تفعيل الحساب
+        cursor.execute("UPDATE users SET verified = 1 WHERE username = ?", (username,))
+        conn.commit()
     return True, "تم تفعيل الحساب بنجاح!"
 
 
 def get_user_subscription(username):
     """الحصول على نوع اشتراك المستخدم"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT subscription FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT subscription FROM users WHERE username = ?", (username,)).fetchone()
     return row['subscription'] if row else 'free'
 
 
 def update_user_subscription(username, subscription_type):
     """تحديث اشتراك المستخدم"""
-    conn = get_connection()
-    cursor = conn.cursor()
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    cursor.execute("""
-        UPDATE users 
-        SET subscription = ?, subscription_date = ?
-        WHERE username = ?
-    """, (subscription_type, now, username))
-    
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE users 
+            SET subscription = ?, subscription_date = ?
+            WHERE username = ?
+        """, (subscription_type, now, username))
+        conn.commit()
     
     # تحديث الجلسة أيضاً
     if 'subscription' in st.session_state:
@@ -184,22 +165,17 @@ def update_user_subscription(username, subscription_type):
 
 def increment_usage(username):
     """زيادة عداد الاستخدام"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE users 
-        SET usage_count = usage_count + 1
-        WHERE username = ?
-    """, (username,))
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute("""
+            UPDATE users 
+            SET usage_count = usage_count + 1
+            WHERE username = ?
+        """, (username,))
+        conn.commit()
 
 
 def get_usage_count(username):
     """الحصول على عدد مرات الاستخدام"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT usage_count FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        row = conn.execute("SELECT usage_count FROM users WHERE username = ?", (username,)).fetchone()
     return row['usage_count'] if row else 0
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from chart_data import figure_nbytes, histogram_figure, scatter_figure
+
+print("=" * 80)
+print("📦 حجم الرسوم: px على البيانات الخام مقابل التجميع المسبق (chart_data.py)")
+print("=" * 80)
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def make_customers(n, rng):
+    """بيانات عشوائية بنفس أعمدة الداشبورد"""
+    return pd.DataFrame({
+        'Purchases': rng.integers(0, 60, n),
+        'Total_Value': rng.uniform(100, 3000, n),
+        'Visits': rng.integers(1, 61, n),
+        'predicted_future_value': rng.uniform(0, 5000, n),
+        'Advanced_Segment': rng.choice(['VIP', 'Regular', 'At Risk', 'New'], n),
+    })
+
+
+CHARTS = {
+    'histogram': (
+        lambda df: px.histogram(df, x='predicted_future_value', nbins=20),
+        lambda df: histogram_figure(df['predicted_future_value'], title=None, x_label='predicted_future_value'),
+    ),
+    'scatter': (
+        lambda df: px.scatter(df, x='Visits', y='Purchases', color='Advanced_Segment'),
+        lambda df: scatter_figure(df, x='Visits', y='Purchases', color='Advanced_Segment'),
+    ),
+}
+
+rng = np.random.default_rng(42)
+
+print(f"   {'الرسم':>10} | {'الصفوف':>10} | {'خام (KB)':>10} | {'مجمع (KB)':>10} | {'زمن المجمع':>10}")
+for n in SIZES:
+    df = make_customers(n, rng)
+    for name, (raw, aggregated) in CHARTS.items():
+        raw_bytes = figure_nbytes(raw(df))
+        start = time.perf_counter()
+        fig = aggregated(df)
+        seconds = time.perf_counter() - start
+        agg_bytes = figure_nbytes(fig)
+        print(f"   {name:>10} | {n:>10,} | {raw_bytes / 1024:>10.1f} | {agg_bytes / 1024:>10.1f} | {seconds * 1000:>8.1f}ms")
+
+print("\n" + "=" * 80)
+print("✅ انتهى القياس (حدود الحجم في test_chart_data.py)")
+print("=" * 80)
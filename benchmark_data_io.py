@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_io import columnar_available, read_table, write_table
+
+print("=" * 80)
+print("⏱️ سرعة تحميل ملف العملاء: Excel مقابل CSV / Parquet / Feather")
+print("=" * 80)
+
+# نفس حجم ملف customers_kaggle_improved.xlsx
+N_CUSTOMERS = 76_588
+REPEATS = 3
+FORMATS = ['xlsx', 'csv', 'parquet', 'feather']
+
+if not columnar_available():
+    print("\n⚠️ pyarrow غير مثبت: سيتم قياس Excel و CSV فقط")
+    FORMATS = ['xlsx', 'csv']
+
+rng = np.random.default_rng(42)
+df = pd.DataFrame({
+    'ID': np.arange(1, N_CUSTOMERS + 1),
+    'Name': [f'عميل {i}' for i in range(1, N_CUSTOMERS + 1)],
+    'Purchases': rng.integers(1, 20, N_CUSTOMERS),
+    'Total_Value': rng.uniform(10, 30000, N_CUSTOMERS).round(2),
+    'Visits': rng.integers(1, 15, N_CUSTOMERS),
+})
+
+with tempfile.TemporaryDirectory() as tmp:
+    print(f"\n   {'الصيغة':>8} | {'الكتابة':>9} | {'القراءة':>9} | {'الحجم':>9} | {'التسريع':>8} | الأنواع")
+    excel_seconds = None
+    for fmt in FORMATS:
+        path = os.path.join(tmp, f'customers.{fmt}')
+        start = time.perf_counter()
+        write_table(df, path)
+        write_seconds = time.perf_counter() - start
+
+        times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            loaded = read_table(path)
+            times.append(time.perf_counter() - start)
+        read_seconds = min(times)
+        if excel_seconds is None:
+            excel_seconds = read_seconds
+
+        dtypes = ', '.join(f"{col}:{loaded[col].dtype}" for col in ['Name', 'Purchases', 'Total_Value'])
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"   {fmt:>8} | {write_seconds:>8.3f}s | {read_seconds:>8.3f}s | {size_mb:>6.2f} MB | "
+              f"{excel_seconds / read_seconds:>7.1f}x | {dtypes}")
+
+print("\n" + "=" * 80)
+print("✅ انتهى القياس")
+print("=" * 80)
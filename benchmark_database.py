@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import database
+
+print("=" * 80)
+print("⏱️ سرعة حفظ التحليل: iterrows (الطريقة القديمة) مقابل executemany")
+print("=" * 80)
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def make_analysis(n, rng):
+    """نتائج تحليل عشوائية بنفس أعمدة الداشبورد"""
+    return pd.DataFrame({
+        'Name': [f'عميل {i}' for i in range(1, n + 1)],
+        'Purchases': rng.integers(100, 601, n),
+        'Total_Value': rng.integers(100, 3001, n),
+        'Visits': rng.integers(1, 61, n),
+        'Churn_Probability_RF': rng.uniform(0, 100, n),
+        'Churn_Probability_XGB': rng.uniform(0, 100, n),
+        'Churn_Probability': rng.uniform(0, 100, n),
+        'Segment': rng.choice(['High Risk', 'Medium Risk', 'Low Risk'], n),
+        'Advanced_Segment': rng.choice(['VIP', 'Regular', 'At Risk'], n),
+        'predicted_future_value': rng.uniform(0, 5000, n),
+    })
+
+
+def legacy_insert(df, analysis_id):
+    """نفس حلقة save_analysis قبل التعديل (بدون WAL وبدون دفعات)"""
+    conn = sqlite3.connect(database.DB_NAME)
+    cursor = conn.cursor()
+    for _, customer in df.iterrows():
+        cursor.execute("""
+            INSERT INTO analyzed_customers
+            (analysis_id, customer_name, purchases, total_value,
+             visits, churn_probability_rf, churn_probability_xgb,
+             churn_probability_best, segment, advanced_segment,
+             predicted_future_value)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            analysis_id,
+            customer['Name'],
+            int(customer['Purchases']),
+            float(customer['Total_Value']),
+            int(customer['Visits']),
+            float(customer['Churn_Probability_RF']),
+            float(customer['Churn_Probability_XGB']),
+            float(customer['Churn_Probability']),
+            customer['Segment'] if 'Segment' in customer else '',
+            customer['Advanced_Segment'],
+            float(customer['predicted_future_value']) if 'predicted_future_value' in customer else 0
+        ))
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+rng = np.random.default_rng(42)
+
+with tempfile.TemporaryDirectory() as tmp:
+    # قاعدة مؤقتة حتى لا نلمس customer_analysis.db
+    database.DB_NAME = os.path.join(tmp, 'benchmark.db')
+    database.init_database()
+
+    print(f"\n   {'الصفوف':>10} | {'iterrows':>10} | {'صف/ث':>10} | {'save_analysis':>13} | {'صف/ث':>10} | {'التسريع':>8}")
+    for n in SIZES:
+        df = make_analysis(n, rng)
+        legacy_seconds, _ = timed(legacy_insert, df, -1)
+        bulk_seconds, analysis_id = timed(database.save_analysis, df, 'benchmark')
+        if analysis_id is None:
+            print(f"   {n:>10,} | ❌ فشل الحفظ")
+            continue
+        print(f"   {n:>10,} | {legacy_seconds:>9.3f}s | {n / legacy_seconds:>10,.0f} | "
+              f"{bulk_seconds:>12.3f}s | {n / bulk_seconds:>10,.0f} | {legacy_seconds / bulk_seconds:>7.1f}x")
+
+    # التأكد من أن القيم محفوظة كأرقام وليس bytes
+    with database.get_connection() as conn:
+        types = conn.execute("""
+            SELECT typeof(purchases), typeof(total_value), typeof(churn_probability_best)
+            FROM analyzed_customers WHERE analysis_id = ? LIMIT 1
+        """, (analysis_id,)).fetchone()
+        journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    print(f"\n   أنواع الأعمدة: {tuple(types)} — journal_mode: {journal}")
+    database.get_pool().close_all()
+
+print("\n" + "=" * 80)
+print("✅ انتهى القياس")
+print("=" * 80)
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import analyze_scored, load_models, score_customers
+from sharded_scoring import ShardedScorer
+
+print("=" * 80)
+print("🧩 التحليل على عدة عمليات (sharded_scoring.py) مقابل عملية واحدة")
+print("=" * 80)
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+WORKERS = sorted({1, 2, 4, os.cpu_count() or 1})
+
+
+def make_customers(n, rng):
+    """بيانات عشوائية بنفس أعمدة الداشبورد"""
+    return pd.DataFrame({
+        'Name': [f"Customer {i}" for i in range(n)],
+        'Purchases': rng.integers(0, 60, n),
+        'Total_Value': rng.uniform(0, 3000, n),
+        'Visits': rng.integers(0, 61, n),
+    })
+
+
+rng = np.random.default_rng(42)
+df = make_customers(ROWS, rng)
+print(f"   الصفوف: {ROWS:,} | الأنوية: {os.cpu_count()}")
+
+# المسار الحالي: score_customers ثم analyze_scored في عملية واحدة
+start = time.perf_counter()
+scores, _ = score_customers(df, load_models())
+reference = analyze_scored(df.assign(**{col: scores[col] for col in scores}), 'English')
+baseline = time.perf_counter() - start
+print(f"   {'عملية واحدة':>14} | {baseline:>7.2f}s | {ROWS / baseline:>12,.0f} صف/ث")
+
+for workers in WORKERS:
+    with ShardedScorer(workers=workers) as scorer:
+        # التشغيل الأول يبدأ العمليات ويحمّل النماذج فيها
+        scorer.analyze(df.head(1000), 'English')
+        start = time.perf_counter()
+        analyzed, _ = scorer.analyze(df, 'English')
+        seconds = time.perf_counter() - start
+    pd.testing.assert_frame_equal(analyzed, reference)
+    print(f"   {workers:>8} عملية | {seconds:>7.2f}s | {ROWS / seconds:>12,.0f} صف/ث | x{baseline / seconds:.2f}")
+
+print("\n" + "=" * 80)
+print("✅ النتائج مطابقة للمسار الحالي لكل عدد عمليات")
+print("=" * 80)
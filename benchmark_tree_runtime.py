@@ -0,0 +1,67 @@
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from tree_runtime import compile_model
+
+print("=" * 80)
+print("⏱️ مقارنة السرعة: predict_proba مقابل محرك NumPy (tree_runtime.py)")
+print("=" * 80)
+
+MODEL_FILES = ['rf_churn_model.pkl', 'xgb_churn_model.pkl']
+SIZES = [1_000, 10_000, 100_000]
+REPEATS = 3
+
+
+def make_customers(n, rng):
+    """بيانات عشوائية بنفس نطاقات create_data.py"""
+    return pd.DataFrame({
+        'Purchases': rng.integers(100, 601, n),
+        'Total_Value': rng.integers(100, 3001, n).astype(float),
+        'Visits': rng.integers(1, 61, n)
+    })
+
+
+def best_time(fn, X):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(X)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+rng = np.random.default_rng(42)
+
+for model_file in MODEL_FILES:
+    try:
+        model = joblib.load(model_file)
+    except Exception as e:
+        print(f"\n❌ تعذر تحميل {model_file}: {e}")
+        continue
+
+    start = time.perf_counter()
+    compiled = compile_model(model)
+    compile_seconds = time.perf_counter() - start
+    if compiled is None:
+        print(f"\n⚠️ {model_file}: نوع النموذج غير مدعوم ({type(model).__name__})")
+        continue
+
+    mode = "جدول بحث" if compiled.table is not None else "نزول في الأشجار"
+    print(f"\n🌳 {model_file} ({type(model).__name__}, {compiled.n_trees} شجرة، عمق {compiled.max_depth})")
+    print(f"   التصدير: {compile_seconds:.2f}s — طريقة التقييم: {mode}")
+    print(f"   {'الصفوف':>10} | {'predict_proba':>14} | {'NumPy':>10} | {'التسريع':>8} | {'أقصى فرق':>10} | {'مطابق':>7}")
+
+    for n in SIZES:
+        X = make_customers(n, rng)
+        sk_seconds, sk_proba = best_time(model.predict_proba, X)
+        np_seconds, np_proba = best_time(compiled.predict_proba, X)
+        max_diff = np.abs(sk_proba[:, 1] - np_proba[:, 1]).max()
+        identical = (sk_proba[:, 1] == np_proba[:, 1]).mean() * 100
+        print(f"   {n:>10,} | {sk_seconds:>13.4f}s | {np_seconds:>9.4f}s | {sk_seconds / np_seconds:>7.1f}x | {max_diff:>10.2e} | {identical:>6.2f}%")
+
+print("\n" + "=" * 80)
+print("✅ انتهى القياس")
+print("=" * 80)
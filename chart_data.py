@@ -0,0 +1,123 @@
+# chart_data.py - تجميع بيانات الرسوم على السيرفر (الرسم يحمل أعداداً مجمعة وليس صفاً لكل عميل)
+#
+# px.histogram(df, ...) و px.scatter(df, ...) تضع كل قيمة خام داخل JSON الرسم،
+# فيكبر حجم الرسم مع عدد العملاء. هنا تُحسب الأعداد بـ NumPy ثم يُبنى الرسم منها
+# فيبقى حجمه ثابتاً مهما كان عدد العملاء.
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+
+DEFAULT_BINS = 20
+SCATTER_BINS = 20
+
+
+# ========== التجميع (بدون Plotly) ==========
+def histogram_frame(values, bins=DEFAULT_BINS, value_range=None):
+    """
+    مدرج تكراري محسوب مسبقاً
+
+    Parameters:
+    - values: Series أو مصفوفة (القيم المفقودة تُتجاهل)
+    - bins: عدد الأعمدة أو حدودها
+    - value_range: (min, max) اختياري
+
+    Returns:
+    - DataFrame: start, end, center, count
+    """
+    data = np.asarray(values, dtype=np.float64)
+    data = data[np.isfinite(data)]
+    if len(data) == 0:
+        return pd.DataFrame({'start': [], 'end': [], 'center': [], 'count': []})
+    counts, edges = np.histogram(data, bins=bins, range=value_range)
+    return pd.DataFrame({
+        'start': edges[:-1],
+        'end': edges[1:],
+        'center': (edges[:-1] + edges[1:]) / 2,
+        'count': counts,
+    })
+
+
+def counts_frame(series, name='Segment'):
+    """
+    عدد العملاء لكل قيمة (مرتب تنازلياً)
+
+    Returns:
+    - DataFrame: name, count
+    """
+    counts = series.value_counts()
+    return pd.DataFrame({name: counts.index.astype(str), 'count': counts.to_numpy()})
+
+
+def rate_by_group(df, group_column, mask, name='Segment', rate_name='Rate'):
+    """
+    نسبة الصفوف المحققة لـ mask داخل كل مجموعة (%)
+
+    Returns:
+    - DataFrame: name, rate_name
+    """
+    rates = pd.Series(np.asarray(mask, dtype=np.float64), index=df.index).groupby(
+        df[group_column], observed=True, sort=True).mean() * 100
+    return pd.DataFrame({name: rates.index.astype(str), rate_name: rates.to_numpy()})
+
+
+def binned_scatter_frame(df, x, y, color=None, bins=SCATTER_BINS):
+    """
+    نقاط مجمعة على شبكة bins × bins لكل لون
+
+    كل نقطة هي مركز خلية في الشبكة وحجمها عدد العملاء فيها
+    (float32 يكفي للمراكز ويصغّر حجم الرسم للنصف)
+
+    Returns:
+    - DataFrame: x, y, (color), count
+    """
+    xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    columns = [x, y] + ([color] if color else []) + ['count']
+    if not valid.any():
+        return pd.DataFrame({col: [] for col in columns})
+
+    # نفس الشبكة لكل الألوان حتى تتطابق المراكز
+    x_edges = np.histogram_bin_edges(xs[valid], bins=bins)
+    y_edges = np.histogram_bin_edges(ys[valid], bins=bins)
+    x_centers = ((x_edges[:-1] + x_edges[1:]) / 2).astype(np.float32)
+    y_centers = ((y_edges[:-1] + y_edges[1:]) / 2).astype(np.float32)
+
+    groups = [(None, valid)]
+    if color:
+        labels = df[color].astype(str).to_numpy()
+        groups = [(label, valid & (labels == label)) for label in pd.unique(labels[valid])]
+
+    parts = []
+    for label, mask in groups:
+        counts, _, _ = np.histogram2d(xs[mask], ys[mask], bins=[x_edges, y_edges])
+        xi, yi = np.nonzero(counts)
+        part = pd.DataFrame({x: x_centers[xi], y: y_centers[yi], 'count': counts[xi, yi].astype(np.int32)})
+        if color:
+            part.insert(2, color, label)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)[columns]
+
+
+# ========== الرسوم ==========
+def histogram_figure(values, title, x_label, y_label='count', bins=DEFAULT_BINS, value_range=None, **kwargs):
+    """بديل px.histogram(df, x=...) مبني من مدرج محسوب مسبقاً"""
+    hist = histogram_frame(values, bins, value_range)
+    fig = px.bar(hist, x='center', y='count', title=title,
+                 labels={'center': x_label, 'count': y_label},
+                 hover_data={'start': ':.2f', 'end': ':.2f', 'center': False}, **kwargs)
+    fig.update_traces(width=(hist['end'] - hist['start']).to_numpy())
+    fig.update_layout(bargap=0)
+    return fig
+
+
+def scatter_figure(df, x, y, color=None, title=None, bins=SCATTER_BINS):
+    """بديل px.scatter(df, ...) بنقاط مجمعة (الحجم = عدد العملاء)"""
+    points = binned_scatter_frame(df, x, y, color, bins)
+    return px.scatter(points, x=x, y=y, color=color, size='count', title=title)
+
+
+def figure_nbytes(fig):
+    """حجم JSON الرسم كما يُرسل للمتصفح"""
+    return len(fig.to_json().encode('utf-8'))
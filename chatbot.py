@@ -28,10 +28,19 @@ class BusinessChatbot:
                 "• 🤖 Random Forest: نموذج متوازن وموثوق\n• 🚀 XGBoost: نموذج دقيق وسريع\n• 🏆 Best Model: نختار تلقائياً أفضل نموذج لبياناتك",
         }
 
+    def _load_data(self):
+        """البيانات قد تُمرر كدوال تُحسب عند أول سؤال فقط (بدلاً من حسابها عند فتح الصفحة)"""
+        for name in ('df', 'metrics', 'alerts'):
+            value = getattr(self, name)
+            if callable(value):
+                setattr(self, name, value())
+
     def generate_dynamic_response(self, user_input):
         """
         تحليل سؤال المستخدم ومحاولة الإجابة عليه من البيانات الحية (df, metrics, alerts)
         """
+        self._load_data()
+
         # التحقق أولاً من وجود بيانات
         if self.df is None or self.metrics is None or self.alerts is None:
             # هذه الرسالة لن تظهر إلا إذا حدث خطأ، لأن الأزرار ستكون معطلة
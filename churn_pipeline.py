@@ -0,0 +1,296 @@
+# churn_pipeline.py - خطوات تحليل العملاء بدون Streamlit (للداشبورد وللتشغيل الليلي)
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from incremental_scoring import SCORE_COLUMNS
+from model_registry import get_model
+from scoring_engine import score_models
+
+
+FEATURE_COLUMNS = ['Purchases', 'Total_Value', 'Visits']
+
+# حدود التنبيهات الافتراضية (نفس قيم صفحة الإعدادات)
+ALERT_THRESHOLDS = {
+    'risk_threshold': 20,
+    'inactive_threshold': 10,
+    'revenue_threshold': 30,
+    'new_customer_threshold': 40,
+}
+
+# عدّادات تُجمع من كل جزء من البيانات ثم تُدمج (للملفات التي تُقرأ على دفعات)
+STAT_KEYS = ['n', 'repeat', 'buyers', 'new', 'inactive', 'high_risk',
+             'purchases_sum', 'value_sum', 'revenue_at_risk']
+
+# ========== حدود وتسميات الشرائح ==========
+RISK_BINS = [-1, 30, 70, 100]
+RISK_LABELS = {
+    'English': {
+        'segment': ["Loyal", "Medium", "At Risk"],
+        'final': ['✅ Loyal', '⚠️ Medium', '🚨 At Risk'],
+    },
+    'العربية': {
+        'segment': ["مخلص", "متوسط", "معرض"],
+        'final': ['✅ مخلص', '⚠️ متوسط', '🚨 معرض للرحيل'],
+    },
+}
+
+# العمود الناتج -> (عمود المصدر، الحدود، التسميات)
+SEGMENT_BINS = {
+    'Value_Segment': ('Total_Value', [0, 100, 500, float('inf')], ['Low Value', 'Medium Value', 'High Value']),
+    'Activity_Segment': ('Visits', [0, 5, 20, float('inf')], ['Inactive', 'Active', 'Very Active']),
+    'Loyalty_Segment': ('Purchases', [0, 2, 10, float('inf')], ['New', 'Regular', 'Loyal']),
+}
+
+# آخر قيمة هي الافتراضية عندما لا يتحقق أي شرط في advanced_conditions
+ADVANCED_SEGMENTS = ['VIP Customers', 'Loyal High-Value', 'At High Risk', 'Inactive New', 'Standard']
+
+
+# ========== تحميل النماذج ==========
+def xgboost_installed():
+    return importlib.util.find_spec("xgboost") is not None
+
+
+def fallback_model():
+    """نموذج احتياطي بسيط عند عدم وجود أي نموذج مدرب"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.datasets import make_classification
+    X, y = make_classification(n_samples=100, n_features=3, n_informative=2,
+                               n_redundant=0, n_repeated=0, random_state=42)
+    model = RandomForestClassifier(n_estimators=5, random_state=42)
+    model.fit(X, y)
+    return model
+
+
+def select_best_model(rf_model, xgb_model):
+    """XGBoost إذا توفر النموذجان، وإلا المتوفر منهما (None إذا لم يتوفر أي منهما)"""
+    if rf_model and xgb_model:
+        return xgb_model
+    return rf_model or xgb_model
+
+
+def load_models(xgb_available=None):
+    """
+    تحميل النماذج من السجل الموحد بنفس اختيار الداشبورد
+
+    Returns:
+    - dict: rf / xgb / best (best = نموذج احتياطي إذا لم يوجد أي نموذج)
+    """
+    if xgb_available is None:
+        xgb_available = xgboost_installed()
+    rf_model = get_model("rf_churn_model.pkl")
+    xgb_model = get_model("xgb_churn_model.pkl") if xgb_available else None
+    best_model = select_best_model(rf_model, xgb_model)
+    if best_model is None:
+        best_model = fallback_model()
+    return {'rf': rf_model, 'xgb': xgb_model, 'best': best_model}
+
+
+# ========== التنبؤ ==========
+def score_customers(df, models):
+    """
+    تشغيل النماذج وإرجاع نسب الرحيل الثلاث (مع البدائل عند غياب نموذج)
+
+    Parameters:
+    - df: بيانات العملاء (تحتوي FEATURE_COLUMNS)
+    - models: dict rf / xgb / best (None للنموذج غير المتوفر)
+
+    Returns:
+    - (DataFrame بأعمدة SCORE_COLUMNS, set رسائل الأخطاء)
+    """
+    X_input = df[FEATURE_COLUMNS]
+    # تمريرة واحدة: النماذج المكررة تُحسب مرة واحدة والمختلفة تعمل بالتوازي
+    scores = score_models(models, X_input)
+
+    n = len(df)
+    out = pd.DataFrame(index=df.index)
+    out['Churn_Probability_RF'] = (scores['proba']['rf'] if scores['proba']['rf'] is not None else np.zeros(n)) * 100
+
+    if scores['proba']['xgb'] is not None:
+        out['Churn_Probability_XGB'] = scores['proba']['xgb'] * 100
+    else:
+        # fallback: use RF as substitute
+        out['Churn_Probability_XGB'] = out['Churn_Probability_RF']
+
+    if scores['proba']['best'] is not None:
+        out['Churn_Probability'] = scores['proba']['best'] * 100
+    else:
+        # if no best model, use average of RF and XGB as a simple ensemble
+        out['Churn_Probability'] = ((out['Churn_Probability_RF'] + out['Churn_Probability_XGB']) / 2.0)
+
+    for col in SCORE_COLUMNS:
+        out[col] = out[col].clip(0, 100)
+
+    return out[SCORE_COLUMNS], set(scores['errors'].values())
+
+
+def add_risk_labels(df, language='العربية'):
+    """أعمدة Segment و Final_Label حسب احتمال الرحيل واللغة"""
+    labels = RISK_LABELS['English' if language == 'English' else 'العربية']
+    df['Segment'] = pd.cut(df['Churn_Probability'], bins=RISK_BINS, labels=labels['segment'])
+    df['Final_Label'] = df['Churn_Probability'].apply(
+        lambda x: labels['final'][0] if x <= 30 else (labels['final'][1] if x <= 70 else labels['final'][2]))
+    return df
+
+
+# ========== تقسيم العملاء ==========
+def advanced_conditions(purchases, total_value, visits, churn):
+    """شروط Advanced_Segment بالترتيب (أول شرط محقق يحدد الشريحة، وإلا Standard)"""
+    return [
+        (total_value > 500) & (visits > 20),
+        (total_value > 200) & (churn < 30),
+        (churn > 70),
+        (purchases == 0)
+    ]
+
+
+def advanced_customer_segmentation(df):
+    """تقسيم العملاء متعدد الأبعاد"""
+    # تقسيم حسب القيمة / النشاط / الولاء (بناءً على عدد المشتريات)
+    for column, (source, bins, labels) in SEGMENT_BINS.items():
+        df[column] = pd.cut(df[source], bins=bins, labels=labels)
+
+    # تقسيم متقدم يجمع بين الأبعاد
+    conditions = advanced_conditions(df['Purchases'], df['Total_Value'], df['Visits'], df['Churn_Probability'])
+    df['Advanced_Segment'] = np.select(conditions, ADVANCED_SEGMENTS[:-1], default=ADVANCED_SEGMENTS[-1])
+
+    return df
+
+
+# ========== مقاييس الأعمال ==========
+def partial_stats(df):
+    """عدّادات جزء من البيانات (تُدمج بـ merge_stats بدون الاحتفاظ بالصفوف)"""
+    purchases = df['Purchases'].to_numpy()
+    values = df['Total_Value'].to_numpy(dtype=np.float64)
+    at_risk = df['Churn_Probability'].to_numpy() > 70
+    return {
+        'n': int(len(df)),
+        'repeat': int((purchases > 1).sum()),
+        'buyers': int((purchases > 0).sum()),
+        'new': int((purchases <= 1).sum()),
+        'inactive': int((df['Visits'].to_numpy() == 0).sum()),
+        'high_risk': int(at_risk.sum()),
+        'purchases_sum': float(purchases.sum(dtype=np.float64)),
+        'value_sum': float(values.sum()),
+        'revenue_at_risk': float(values[at_risk].sum()),
+    }
+
+
+def merge_stats(total, part):
+    """جمع عدّادات جزأين (total = None في البداية)"""
+    if total is None:
+        return dict(part)
+    return {key: total[key] + part[key] for key in STAT_KEYS}
+
+
+def metrics_from_stats(stats):
+    """مقاييس الأعمال (retention_rate, ltv, conversion_rate) من العدّادات"""
+    n = stats['n']
+    metrics = {}
+
+    # معدل الاحتفاظ (تقديري)
+    metrics['retention_rate'] = (stats['repeat'] / n) * 100 if n > 0 else 0
+
+    # القيمة الدائمة للعميل (LTV) تقديرية
+    avg_purchase_freq = stats['purchases_sum'] / n if n > 0 else float('nan')
+    avg_value = stats['value_sum'] / n if n > 0 else float('nan')
+    avg_purchase_value = avg_value / avg_purchase_freq if avg_purchase_freq > 0 else 0
+    customer_lifespan = 12  # تقدير بـ 12 شهر
+    metrics['ltv'] = avg_purchase_value * avg_purchase_freq * customer_lifespan
+
+    # معدل التحويل (تقديري)
+    metrics['conversion_rate'] = (stats['buyers'] / n) * 100 if n > 0 else 0
+
+    return metrics
+
+
+def add_predicted_value(df):
+    """قيمة العميل المتوقعة"""
+    df['predicted_future_value'] = df['Total_Value'] * (1 - df['Churn_Probability']/100) * 1.2
+    return df
+
+
+def calculate_business_metrics(df):
+    """حساب مقاييس الأعمال المتقدمة"""
+    return metrics_from_stats(partial_stats(df)), add_predicted_value(df)
+
+
+# ========== التنبيهات الذكية ==========
+def alerts_from_stats(stats, language='العربية', risk_threshold=20, inactive_threshold=10,
+                      revenue_threshold=30, new_customer_threshold=40):
+    """
+    التنبيهات الذكية من العدّادات المدمجة
+
+    Parameters:
+    - stats: ناتج partial_stats / merge_stats
+    - language: 'العربية' أو 'English'
+    - *_threshold: الحدود بالنسبة المئوية (مثل 10 = 10%)
+
+    Returns:
+    - list: التنبيهات مرتبة حسب الأولوية
+    """
+    arabic = language == 'العربية'
+    n = stats['n']
+
+    # تحويل النسب المئوية (مثل 10) إلى قيم عشرية (مثل 0.1) لاستخدامها في المقارنات
+    inactive_thresh = inactive_threshold / 100.0
+    revenue_thresh = revenue_threshold / 100.0
+    new_customer_thresh = new_customer_threshold / 100.0
+
+    alerts = []
+
+    # === تحليل نسبة العملاء المعرضين للخطر ===
+    high_risk_percentage = (stats['high_risk'] / n) * 100 if n > 0 else 0
+    if high_risk_percentage > risk_threshold:
+        alerts.append({
+            'type': 'danger',
+            'title': 'نسبة عالية من العملاء المعرضين للخطر' if arabic else 'High Percentage of At-Risk Customers',
+            'message': f'{high_risk_percentage:.1f}% من العملاء معرضون للرحيل (الحد: {risk_threshold}%)' if arabic else f'{high_risk_percentage:.1f}% of customers are at risk (Threshold: {risk_threshold}%)',
+            'priority': 'high'
+        })
+
+    # === تحليل العملاء غير النشطين ===
+    inactive_customers = stats['inactive']
+    if inactive_customers > n * inactive_thresh and n > 0:
+        alerts.append({
+            'type': 'warning',
+            'title': 'عدد كبير من العملاء غير النشطين' if arabic else 'Large Number of Inactive Customers',
+            'message': f'{inactive_customers} عميل غير نشط (الحد: {inactive_threshold}%)' if arabic else f'{inactive_customers} inactive customers (Threshold: {inactive_threshold}%)',
+            'priority': 'medium'
+        })
+
+    # === تحليل القيمة المفقودة المحتملة ===
+    revenue_at_risk = stats['revenue_at_risk']
+    total_revenue = stats['value_sum']
+    if revenue_at_risk > total_revenue * revenue_thresh and total_revenue > 0:
+        alerts.append({
+            'type': 'danger',
+            'title': 'إيرادات عالية معرضة للخطر' if arabic else 'High Revenue at Risk',
+            'message': f'${revenue_at_risk:,.2f} من الإيرادات معرضة للخطر (الحد: {revenue_threshold}%)' if arabic else f'${revenue_at_risk:,.2f} revenue at risk (Threshold: {revenue_threshold}%)',
+            'priority': 'high'
+        })
+
+    # === تحليل العملاء الجدد ===
+    if stats['new'] > n * new_customer_thresh and n > 0:
+        alerts.append({
+            'type': 'info',
+            'title': 'تركيز عالٍ على العملاء الجدد' if arabic else 'High Concentration of New Customers',
+            'message': f'فرصة لتحسين استراتيجية الاحتفاظ (الحد: {new_customer_threshold}%)' if arabic else f'Opportunity to improve retention strategy (Threshold: {new_customer_threshold}%)',
+            'priority': 'medium'
+        })
+
+    return sorted(alerts, key=lambda x: x['priority'], reverse=True)
+
+
+def generate_smart_alerts(df, language='العربية', **thresholds):
+    """نظام التنبيهات الذكي (الحدود الافتراضية في ALERT_THRESHOLDS)"""
+    return alerts_from_stats(partial_stats(df), language, **{**ALERT_THRESHOLDS, **thresholds})
+
+
+# ========== الخطوات كاملة ==========
+def analyze_scored(df, language='العربية'):
+    """التسميات + التقسيم + القيمة المتوقعة على بيانات فيها SCORE_COLUMNS"""
+    df = add_risk_labels(df, language)
+    df = advanced_customer_segmentation(df)
+    return add_predicted_value(df)
@@ -0,0 +1,249 @@
+# churn_score.py - تحليل ملف عملاء كامل بدون Streamlit (للتشغيل الليلي)
+#
+# python churn_score.py customers.csv --output scored.parquet --summary summary.json --workers 4
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from churn_pipeline import (ALERT_THRESHOLDS, STAT_KEYS, alerts_from_stats, analyze_scored,
+                            load_models, merge_stats, metrics_from_stats, partial_stats,
+                            score_customers, xgboost_installed)
+from data_io import file_format, read_table
+from incremental_scoring import SCORE_COLUMNS
+from ingestion import REQUIRED_COLUMNS, coerce_customer_columns
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+LANGUAGES = {'ar': 'العربية', 'en': 'English'}
+
+LABEL_COLUMNS = ['Segment', 'Final_Label', 'Value_Segment', 'Activity_Segment',
+                 'Loyalty_Segment', 'Advanced_Segment']
+
+# أعمدة الملف الناتج (بنفس ترتيب df في الداشبورد)
+OUTPUT_COLUMNS = REQUIRED_COLUMNS + SCORE_COLUMNS + LABEL_COLUMNS + ['predicted_future_value']
+
+# النماذج تُحمّل مرة واحدة في كل عملية عاملة
+_models = None
+
+
+def output_schema():
+    """أنواع ثابتة لكل الدفعات (أعمدة category تُكتب كنصوص حتى تتطابق الدفعات)"""
+    types = {'Name': pyarrow.string(), 'Purchases': pyarrow.int64(), 'Visits': pyarrow.int64()}
+    for col in LABEL_COLUMNS:
+        types[col] = pyarrow.string()
+    return pyarrow.schema([(col, types.get(col, pyarrow.float64())) for col in OUTPUT_COLUMNS])
+
+
+# ========== قراءة الملف على دفعات ==========
+def _check_columns(columns, path):
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+
+
+def iter_chunks(path, chunksize):
+    """
+    قراءة الأعمدة المطلوبة فقط على دفعات
+
+    CSV و Parquet تُقرأ دفعة بدفعة (بدون تحميل الملف كاملاً)،
+    والصيغ الأخرى (Excel / Feather) تُقرأ مرة واحدة ثم تُقسم
+    """
+    fmt = file_format(path)
+    if fmt == 'csv':
+        _check_columns(pd.read_csv(path, nrows=0).columns, path)
+        # محرك pyarrow لا يدعم chunksize
+        yield from pd.read_csv(path, usecols=REQUIRED_COLUMNS, chunksize=chunksize)
+    elif fmt == 'parquet':
+        parquet_file = pq.ParquetFile(path)
+        _check_columns(parquet_file.schema_arrow.names, path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=REQUIRED_COLUMNS):
+            yield batch.to_pandas()
+    else:
+        df = read_table(path)
+        _check_columns(df.columns, path)
+        df = df[REQUIRED_COLUMNS]
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+
+
+# ========== تحليل دفعة واحدة ==========
+def init_worker(xgb_available):
+    global _models
+    _models = load_models(xgb_available)
+
+
+def score_chunk(chunk, language):
+    """
+    نفس خطوات الداشبورد على دفعة واحدة
+
+    Returns:
+    - dict: table (pyarrow.Table), stats, segments, risk_segments, errors, seconds
+    """
+    start = time.perf_counter()
+    df = coerce_customer_columns(chunk).reset_index(drop=True)
+    scores, errors = score_customers(df, _models)
+    for col in SCORE_COLUMNS:
+        df[col] = scores[col]
+    df = analyze_scored(df, language)
+
+    result = {
+        'rows': len(df),
+        'stats': partial_stats(df),
+        'segments': df['Advanced_Segment'].value_counts().to_dict(),
+        'risk_segments': df['Segment'].value_counts().to_dict(),
+        'errors': sorted(errors),
+    }
+    for col in LABEL_COLUMNS:
+        df[col] = df[col].astype(object)
+    df['Name'] = df['Name'].astype(str)
+    result['table'] = pyarrow.Table.from_pandas(df[OUTPUT_COLUMNS], schema=output_schema(), preserve_index=False)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def scored_chunks(chunks, language, workers, xgb_available):
+    """
+    تحليل الدفعات على عدة عمليات مع إرجاع النتائج بنفس ترتيب الملف
+
+    عدد الدفعات قيد التنفيذ محدود (ضعف عدد العمليات) حتى لا تتجمع الدفعات في الذاكرة
+    """
+    if workers <= 1:
+        init_worker(xgb_available)
+        for chunk in chunks:
+            yield score_chunk(chunk, language)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(xgb_available,)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk, language))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# ========== التشغيل ==========
+def run(input_path, output_path, language='العربية', chunksize=DEFAULT_CHUNK_SIZE,
+        workers=1, thresholds=None):
+    """
+    تحليل ملف العملاء وكتابة النتائج كـ Parquet
+
+    Returns:
+    - dict: الملخص (الأعداد، الإنتاجية، المقاييس، التنبيهات)
+    """
+    xgb_available = xgboost_installed()
+    thresholds = {**ALERT_THRESHOLDS, **(thresholds or {})}
+
+    start = time.perf_counter()
+    stats = None
+    segments, risk_segments = Counter(), Counter()
+    errors = set()
+    n_chunks = 0
+    score_seconds = 0.0
+    write_seconds = 0.0
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    writer = pq.ParquetWriter(tmp_path, output_schema())
+    try:
+        for result in scored_chunks(iter_chunks(input_path, chunksize), language, workers, xgb_available):
+            write_start = time.perf_counter()
+            writer.write_table(result['table'])
+            write_seconds += time.perf_counter() - write_start
+
+            stats = merge_stats(stats, result['stats'])
+            segments.update(result['segments'])
+            risk_segments.update(result['risk_segments'])
+            errors.update(result['errors'])
+            score_seconds += result['seconds']
+            n_chunks += 1
+            print(f"   ✅ دفعة {n_chunks}: {stats['n']:,} صف", file=sys.stderr)
+    except BaseException:
+        # لا يُترك ملف نتائج ناقص
+        writer.close()
+        os.remove(tmp_path)
+        raise
+    writer.close()
+    os.replace(tmp_path, output_path)
+    seconds = time.perf_counter() - start
+
+    if stats is None:
+        stats = {key: 0 for key in STAT_KEYS}
+    rows = stats['n']
+    return {
+        'input': input_path,
+        'output': output_path,
+        'language': language,
+        'rows': rows,
+        'chunks': n_chunks,
+        'chunksize': chunksize,
+        'workers': workers,
+        'xgb_available': xgb_available,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds > 0 else None,
+        'score_seconds': score_seconds,
+        'write_seconds': write_seconds,
+        'metrics': metrics_from_stats(stats),
+        'alerts': alerts_from_stats(stats, language, **thresholds),
+        'thresholds': thresholds,
+        'stats': stats,
+        'segments': dict(segments),
+        'risk_segments': dict(risk_segments),
+        'errors': sorted(errors),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="تحليل ملف عملاء (CSV / Parquet) وكتابة النتائج كـ Parquet + ملخص JSON")
+    parser.add_argument('input', help="ملف العملاء (Name, Purchases, Total_Value, Visits)")
+    parser.add_argument('--output', default='scored.parquet', help="ملف النتائج (Parquet)")
+    parser.add_argument('--summary', default=None, help="ملف الملخص JSON (الافتراضي: بجانب ملف النتائج)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE, help="عدد الصفوف في كل دفعة")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="عدد العمليات")
+    parser.add_argument('--language', choices=sorted(LANGUAGES), default='ar', help="لغة التسميات والتنبيهات")
+    for key, default in ALERT_THRESHOLDS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=default, dest=key)
+    args = parser.parse_args(argv)
+
+    if pyarrow is None:
+        print("❌ pyarrow غير مثبت: لا يمكن كتابة Parquet", file=sys.stderr)
+        return 2
+    if not os.path.exists(args.input):
+        print(f"❌ الملف غير موجود: {args.input}", file=sys.stderr)
+        return 2
+
+    thresholds = {key: getattr(args, key) for key in ALERT_THRESHOLDS}
+    try:
+        summary = run(args.input, args.output, LANGUAGES[args.language], args.chunksize,
+                      args.workers, thresholds)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    summary_path = args.summary or f"{os.path.splitext(args.output)[0]}.summary.json"
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=float)
+
+    print(f"✅ {summary['rows']:,} صف في {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second'] or 0:,.0f} صف/ثانية، {summary['workers']} عملية)")
+    print(f"📄 {args.output}\n📄 {summary_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,138 +1,360 @@
+import argparse
+
 import pandas as pd
 import numpy as np
 
-print("="*80)
-print("🔄 تحسين بيانات Kaggle - دمج العملاء المتشابهين")
-print("="*80)
-
-# قراءة البيانات الأصلية
-try:
-    df = pd.read_csv('customer_shopping_data.csv')
-    print(f"\n✅ تم تحميل البيانات: {len(df):,} معاملة")
-except FileNotFoundError:
-    print("\n❌ خطأ: الملف غير موجود!")
-    input("اضغط Enter للخروج...")
-    exit()
-
-# تنظيف البيانات
-df_clean = df.dropna(subset=['customer_id', 'invoice_date']).copy()
-df_clean['invoice_date'] = pd.to_datetime(df_clean['invoice_date'], format='mixed', dayfirst=True)
-df_clean['total_amount'] = df_clean['quantity'] * df_clean['price']
-
-print(f"\n📊 البيانات الأصلية: {len(df_clean):,} معاملة من {df_clean['customer_id'].nunique():,} عميل فريد")
-
-# ========== استراتيجية التحسين ==========
-print("\n" + "="*80)
-print("🔧 استراتيجية التحسين:")
-print("="*80)
-print("1. دمج العملاء المتشابهين في العمر والجنس والمول")
-print("2. إنشاء عملاء بمعاملات وزيارات متعددة")
-print("3. الحفاظ على واقعية البيانات")
-
-# إنشاء مجموعات من العملاء المتشابهين
-np.random.seed(42)
-
-# تقسيم العملاء لمجموعات حسب الخصائص المشتركة
-df_clean['age_group'] = pd.cut(df_clean['age'], bins=[0, 25, 35, 45, 55, 100], 
-                                labels=['18-25', '26-35', '36-45', '46-55', '56+'])
-df_clean['customer_group'] = (
-    df_clean['gender'].astype(str) + '_' + 
-    df_clean['age_group'].astype(str) + '_' + 
-    df_clean['shopping_mall'].astype(str)
-)
-
-# لكل مجموعة، هندمج نسبة من العملاء معاً
-print("\n🔄 جاري دمج العملاء المتشابهين...")
-
-# إنشاء customer_id جديد
-group_sizes = df_clean.groupby('customer_group').size()
-valid_groups = group_sizes[group_sizes >= 3].index  # مجموعات فيها 3+ عملاء
-
-new_customer_ids = []
-for idx, row in df_clean.iterrows():
-    if row['customer_group'] in valid_groups:
-        # احتمال 30% لدمج العملاء المتشابهين
-        if np.random.random() < 0.30:
-            # دمج مع عميل آخر في نفس المجموعة
-            group_customers = df_clean[
-                (df_clean['customer_group'] == row['customer_group']) & 
-                (df_clean.index < idx)
-            ]
-            if len(group_customers) > 0:
-                # اختيار عميل عشوائي من نفس المجموعة
-                merged_customer = np.random.choice(group_customers['customer_id'].values)
-                new_customer_ids.append(merged_customer)
-            else:
-                new_customer_ids.append(row['customer_id'])
-        else:
-            new_customer_ids.append(row['customer_id'])
+from data_io import write_customers
+
+# الأعمدة المستخدمة فعلاً (الباقي لا يُقرأ في وضع الدفعات)
+USECOLS = ['invoice_no', 'customer_id', 'gender', 'age', 'quantity', 'price', 'invoice_date', 'shopping_mall']
+
+
+def clean_transactions(df):
+    """إزالة الصفوف الناقصة وتحويل التاريخ وحساب قيمة المعاملة"""
+    df_clean = df.dropna(subset=['customer_id', 'invoice_date']).copy()
+    df_clean['invoice_date'] = pd.to_datetime(df_clean['invoice_date'], format='mixed', dayfirst=True)
+    df_clean['total_amount'] = df_clean['quantity'] * df_clean['price']
+    return df_clean
+
+
+def customer_groups(df):
+    """مجموعة العميل = الجنس + الفئة العمرية + المول"""
+    age_group = pd.cut(df['age'], bins=[0, 25, 35, 45, 55, 100],
+                       labels=['18-25', '26-35', '36-45', '46-55', '56+'])
+    return (
+        df['gender'].astype(str) + '_' + 
+        age_group.astype(str) + '_' + 
+        df['shopping_mall'].astype(str)
+    )
+
+
+class GrowingArray:
+    """مصفوفة numpy تكبر بالمضاعفة (إضافة دفعات بدون نسخ كل مرة)"""
+
+    def __init__(self, dtype, fill=0):
+        self.fill = fill
+        self.data = np.full(1024, fill, dtype=dtype)
+        self.size = 0
+
+    def reserve(self, size):
+        if size > len(self.data):
+            grown = np.full(max(size, 2 * len(self.data)), self.fill, dtype=self.data.dtype)
+            grown[:len(self.data)] = self.data
+            self.data = grown
+        self.size = max(self.size, size)
+
+    def extend(self, values):
+        begin = self.size
+        self.reserve(begin + len(values))
+        self.data[begin:self.size] = values
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class CustomerMerger:
+    """
+    دمج العملاء المتشابهين على دفعات متتالية من المعاملات
+
+    كل معاملة في مجموعة صالحة لها احتمال merge_prob أن تُنسب لعميل معاملة
+    سابقة عشوائية من نفس المجموعة. الأرقام العشوائية تُسحب بترتيب المعاملات
+    من مولدين منفصلين، فالنتيجة واحدة سواء مرّ الملف دفعة واحدة أو على دفعات.
+    الذاكرة: customer_id لكل معاملة سابقة في كل مجموعة (وليس الإطار كاملاً).
+    """
+
+    def __init__(self, valid_groups, merge_prob=0.30, seed=42):
+        self.valid_groups = set(valid_groups)
+        self.merge_prob = merge_prob
+        self.merge_rng = np.random.default_rng([seed, 0])
+        self.pick_rng = np.random.default_rng([seed, 1])
+        self.history = {}
+
+    def merge(self, customer_ids, groups):
+        """
+        Parameters:
+        - customer_ids: customer_id لكل معاملة في الدفعة
+        - groups: customer_group لكل معاملة بنفس الترتيب
+
+        Returns:
+        - numpy array: customer_id الجديد لكل معاملة
+        """
+        customer_ids = np.asarray(customer_ids, dtype=object)
+        codes, uniques = pd.factorize(np.asarray(groups, dtype=object))
+        merge_draw = self.merge_rng.random(len(customer_ids)) < self.merge_prob
+
+        # ترتيب المعاملة داخل مجموعتها = عدد المعاملات السابقة في نفس المجموعة
+        position = pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        in_valid = np.zeros(len(customer_ids), dtype=bool)
+        for code, group in enumerate(uniques):
+            rows = np.flatnonzero(codes == code)
+            history = self.history.setdefault(group, GrowingArray(object, fill=None))
+            position[rows] += history.size
+            history.extend(customer_ids[rows])
+            in_valid[rows] = group in self.valid_groups
+
+        # لا يمكن الدمج مع معاملة سابقة إذا كانت المعاملة الأولى في مجموعتها
+        merged = np.flatnonzero(in_valid & merge_draw & (position > 0))
+
+        # اختيار معاملة سابقة عشوائية (0 .. position-1) من نفس المجموعة
+        earlier = (self.pick_rng.random(len(merged)) * position[merged]).astype(np.int64)
+        new_ids = customer_ids.copy()
+        for code, group in enumerate(uniques):
+            in_group = codes[merged] == code
+            if in_group.any():
+                new_ids[merged[in_group]] = self.history[group].view()[earlier[in_group]]
+        return new_ids
+
+
+def merge_similar_customers(df, valid_groups, merge_prob=0.30, seed=42):
+    """دمج العملاء المتشابهين في إطار كامل (دفعة واحدة)"""
+    merger = CustomerMerger(valid_groups, merge_prob, seed)
+    return merger.merge(df['customer_id'].to_numpy(), df['customer_group'].to_numpy())
+
+
+class CustomerAggregator:
+    """
+    تجميع تراكمي لكل عميل: عدد الفواتير، مجموع القيمة، عدد الأيام المختلفة
+
+    الأيام المختلفة تُحفظ كأزواج (عميل، يوم) مضغوطة في int64 وتُزال
+    المكررات دورياً، فالعدّ دقيق (نفس nunique) بدون تخزين المعاملات.
+    """
+
+    DAY_BITS = 17
+    DAY_OFFSET = 2 ** 16
+
+    def __init__(self, compact_every=2_000_000):
+        self.codes = {}
+        self.ids = []
+        self.purchases = GrowingArray(np.int64)
+        self.total_value = GrowingArray(np.float64)
+        self.visit_keys = np.empty(0, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+        self.compact_every = compact_every
+
+    def _customer_codes(self, customer_ids):
+        uniques, inverse = np.unique(np.asarray(customer_ids, dtype=object).astype(str), return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, customer in enumerate(uniques):
+            code = self.codes.get(customer)
+            if code is None:
+                code = self.codes[customer] = len(self.ids)
+                self.ids.append(customer)
+            mapping[i] = code
+        return mapping[inverse]
+
+    def add(self, customer_ids, invoice_no, total_amount, invoice_date):
+        codes = self._customer_codes(customer_ids)
+        size = len(self.ids)
+        self.purchases.reserve(size)
+        self.total_value.reserve(size)
+        self.purchases.data[:size] += np.bincount(codes, weights=pd.notna(invoice_no), minlength=size).astype(np.int64)
+        self.total_value.data[:size] += np.bincount(codes, weights=np.nan_to_num(np.asarray(total_amount, dtype=np.float64)),
+                                                    minlength=size)
+
+        days = np.asarray(invoice_date, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+        keys = np.unique((codes << self.DAY_BITS) + days + self.DAY_OFFSET)
+        self.pending.append(keys)
+        self.pending_size += len(keys)
+        if self.pending_size >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        if self.pending:
+            self.visit_keys = np.unique(np.concatenate([self.visit_keys] + self.pending))
+            self.pending = []
+            self.pending_size = 0
+
+    def summary(self):
+        """DataFrame بنفس أعمدة التجميع في الذاكرة: customer_id, Purchases, Total_Value, Visits"""
+        self._compact()
+        size = len(self.ids)
+        visits = np.bincount(self.visit_keys >> self.DAY_BITS, minlength=size)
+        summary = pd.DataFrame({
+            'customer_id': self.ids,
+            'Purchases': self.purchases.view()[:size],
+            'Total_Value': self.total_value.view()[:size],
+            'Visits': visits[:size],
+        })
+        # نفس ترتيب groupby قبل الترتيب حسب المشتريات
+        return summary.sort_values('customer_id').reset_index(drop=True)
+
+
+def read_chunks(path, chunksize):
+    return pd.read_csv(path, usecols=USECOLS, chunksize=chunksize)
+
+
+def print_strategy():
+    print("\n" + "="*80)
+    print("🔧 استراتيجية التحسين:")
+    print("="*80)
+    print("1. دمج العملاء المتشابهين في العمر والجنس والمول")
+    print("2. إنشاء عملاء بمعاملات وزيارات متعددة")
+    print("3. الحفاظ على واقعية البيانات")
+
+
+def pause(args):
+    if not args.no_pause:
+        input("\n\nاضغط Enter للخروج...")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="تحويل معاملات Kaggle إلى ملف عملاء (ID, Name, Purchases, Total_Value, Visits)")
+    parser.add_argument('--input', default='customer_shopping_data.csv', help="ملف المعاملات (CSV)")
+    parser.add_argument('--chunksize', type=int, default=0,
+                        help="قراءة الملف على دفعات بهذا العدد من الصفوف (0 = تحميل الملف كاملاً في الذاكرة)")
+    parser.add_argument('--formats', default='xlsx,parquet',
+                        help="صيغ ملف الإخراج مفصولة بفواصل: xlsx, parquet, feather, csv")
+    parser.add_argument('--no-pause', action='store_true', help="عدم انتظار Enter في النهاية")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("="*80)
+    print("🔄 تحسين بيانات Kaggle - دمج العملاء المتشابهين")
+    print("="*80)
+
+    if args.chunksize > 0:
+        # ========== وضع الدفعات (ملفات كبيرة) ==========
+        # تمريرة 1: حجم كل مجموعة (لتحديد المجموعات الصالحة) بأعمدة قليلة فقط
+        try:
+            group_sizes = pd.Series(dtype=np.int64)
+            original_ids = set()
+            n_transactions = 0
+            for chunk in pd.read_csv(args.input, usecols=['customer_id', 'invoice_date', 'gender', 'age', 'shopping_mall'],
+                                     chunksize=args.chunksize):
+                chunk = chunk.dropna(subset=['customer_id', 'invoice_date'])
+                n_transactions += len(chunk)
+                original_ids.update(chunk['customer_id'].astype(str))
+                group_sizes = group_sizes.add(customer_groups(chunk).value_counts(), fill_value=0)
+        except FileNotFoundError:
+            print("\n❌ خطأ: الملف غير موجود!")
+            pause(args)
+            return
+        n_original_customers = len(original_ids)
+        del original_ids
+
+        print(f"\n✅ وضع الدفعات: {args.chunksize:,} صف في كل دفعة")
+        print(f"\n📊 البيانات الأصلية: {n_transactions:,} معاملة من {n_original_customers:,} عميل فريد")
+        print_strategy()
+
+        valid_groups = group_sizes[group_sizes >= 3].index  # مجموعات فيها 3+ عملاء
+
+        # تمريرة 2: دمج + تجميع تراكمي لكل دفعة
+        print("\n🔄 جاري دمج العملاء المتشابهين...")
+        merger = CustomerMerger(valid_groups)
+        aggregator = CustomerAggregator()
+        for chunk in read_chunks(args.input, args.chunksize):
+            chunk = clean_transactions(chunk)
+            new_ids = merger.merge(chunk['customer_id'].to_numpy(), customer_groups(chunk).to_numpy())
+            aggregator.add(new_ids, chunk['invoice_no'].to_numpy(), chunk['total_amount'].to_numpy(),
+                           chunk['invoice_date'].to_numpy())
+
+        print(f"✅ تم الدمج: من {n_original_customers:,} إلى {len(aggregator.ids):,} عميل")
+
+        # ========== التجميع النهائي ==========
+        print("\n" + "="*80)
+        print("📊 تجميع البيانات النهائية...")
+        print("="*80)
+
+        customer_summary = aggregator.summary()
     else:
-        new_customer_ids.append(row['customer_id'])
-
-df_clean['new_customer_id'] = new_customer_ids
-
-print(f"✅ تم الدمج: من {df_clean['customer_id'].nunique():,} إلى {df_clean['new_customer_id'].nunique():,} عميل")
-
-# ========== التجميع النهائي ==========
-print("\n" + "="*80)
-print("📊 تجميع البيانات النهائية...")
-print("="*80)
-
-customer_summary = df_clean.groupby('new_customer_id').agg({
-    'invoice_no': 'count',  # Purchases
-    'total_amount': 'sum',  # Total_Value
-    'invoice_date': lambda x: x.dt.date.nunique()  # Visits
-}).reset_index()
-
-customer_summary.columns = ['customer_id', 'Purchases', 'Total_Value', 'Visits']
-
-# ترتيب حسب عدد المشتريات (الأكثر نشاطاً أولاً)
-customer_summary = customer_summary.sort_values('Purchases', ascending=False).reset_index(drop=True)
-
-# إضافة ID و Name
-customer_summary.insert(0, 'ID', range(1, len(customer_summary) + 1))
-customer_summary.insert(1, 'Name', ['عميل ' + str(i) for i in range(1, len(customer_summary) + 1)])
-customer_summary = customer_summary[['ID', 'Name', 'Purchases', 'Total_Value', 'Visits']]
-
-# تنسيق الأنواع
-customer_summary['ID'] = customer_summary['ID'].astype(int)
-customer_summary['Purchases'] = customer_summary['Purchases'].astype(int)
-customer_summary['Total_Value'] = customer_summary['Total_Value'].round(2)
-customer_summary['Visits'] = customer_summary['Visits'].astype(int)
-
-# ========== عرض النتيجة ==========
-print(f"\n✅ عدد العملاء النهائي: {len(customer_summary):,}")
-print(f"\n📊 توزيع المشتريات:")
-print(customer_summary['Purchases'].describe())
-print(f"\n📊 توزيع الزيارات:")
-print(customer_summary['Visits'].describe())
-
-print(f"\n👀 أمثلة على العملاء النشطين (أعلى 10):")
-print(customer_summary.head(10).to_string(index=False))
-
-print(f"\n👀 أمثلة على العملاء العاديين (عشوائي):")
-print(customer_summary.sample(10, random_state=42).to_string(index=False))
-
-# إحصائيات تفصيلية
-print(f"\n📈 إحصائيات كاملة:")
-print(customer_summary[['Purchases', 'Total_Value', 'Visits']].describe().round(2))
-
-# توزيع الشرائح
-print(f"\n📊 توزيع العملاء حسب عدد المشتريات:")
-purchase_bins = [0, 1, 2, 3, 5, 10, 100]
-purchase_labels = ['1', '2', '3', '4-5', '6-10', '10+']
-purchase_dist = pd.cut(customer_summary['Purchases'], bins=purchase_bins, labels=purchase_labels).value_counts().sort_index()
-for label, count in purchase_dist.items():
-    pct = count / len(customer_summary) * 100
-    print(f"   {label} مشتريات: {count:,} عميل ({pct:.1f}%)")
-
-# حفظ الملف
-output_file = 'customers_kaggle_improved.xlsx'
-customer_summary.to_excel(output_file, index=False, engine='openpyxl')
-print(f"\n✅ تم حفظ الملف المحسّن: {output_file}")
-
-# إنشاء توثيق محدّث
-documentation = f"""
+        # قراءة البيانات الأصلية
+        try:
+            df = pd.read_csv(args.input)
+            print(f"\n✅ تم تحميل البيانات: {len(df):,} معاملة")
+        except FileNotFoundError:
+            print("\n❌ خطأ: الملف غير موجود!")
+            pause(args)
+            return
+
+        # تنظيف البيانات
+        df_clean = clean_transactions(df)
+        n_transactions = len(df_clean)
+
+        print(f"\n📊 البيانات الأصلية: {len(df_clean):,} معاملة من {df_clean['customer_id'].nunique():,} عميل فريد")
+
+        # ========== استراتيجية التحسين ==========
+        print_strategy()
+
+        # تقسيم العملاء لمجموعات حسب الخصائص المشتركة
+        df_clean['customer_group'] = customer_groups(df_clean)
+
+        # لكل مجموعة، هندمج نسبة من العملاء معاً
+        print("\n🔄 جاري دمج العملاء المتشابهين...")
+
+        # إنشاء customer_id جديد
+        group_sizes = df_clean.groupby('customer_group').size()
+        valid_groups = group_sizes[group_sizes >= 3].index  # مجموعات فيها 3+ عملاء
+
+        df_clean['new_customer_id'] = merge_similar_customers(df_clean, valid_groups)
+
+        print(f"✅ تم الدمج: من {df_clean['customer_id'].nunique():,} إلى {df_clean['new_customer_id'].nunique():,} عميل")
+
+        # ========== التجميع النهائي ==========
+        print("\n" + "="*80)
+        print("📊 تجميع البيانات النهائية...")
+        print("="*80)
+
+        customer_summary = df_clean.groupby('new_customer_id').agg({
+            'invoice_no': 'count',  # Purchases
+            'total_amount': 'sum',  # Total_Value
+            'invoice_date': lambda x: x.dt.date.nunique()  # Visits
+        }).reset_index()
+
+        customer_summary.columns = ['customer_id', 'Purchases', 'Total_Value', 'Visits']
+
+    # ترتيب حسب عدد المشتريات (الأكثر نشاطاً أولاً)
+    customer_summary = customer_summary.sort_values('Purchases', ascending=False).reset_index(drop=True)
+
+    # إضافة ID و Name
+    customer_summary.insert(0, 'ID', range(1, len(customer_summary) + 1))
+    customer_summary.insert(1, 'Name', ['عميل ' + str(i) for i in range(1, len(customer_summary) + 1)])
+    customer_summary = customer_summary[['ID', 'Name', 'Purchases', 'Total_Value', 'Visits']]
+
+    # تنسيق الأنواع
+    customer_summary['ID'] = customer_summary['ID'].astype(int)
+    customer_summary['Purchases'] = customer_summary['Purchases'].astype(int)
+    customer_summary['Total_Value'] = customer_summary['Total_Value'].round(2)
+    customer_summary['Visits'] = customer_summary['Visits'].astype(int)
+
+    # ========== عرض النتيجة ==========
+    print(f"\n✅ عدد العملاء النهائي: {len(customer_summary):,}")
+    print(f"\n📊 توزيع المشتريات:")
+    print(customer_summary['Purchases'].describe())
+    print(f"\n📊 توزيع الزيارات:")
+    print(customer_summary['Visits'].describe())
+
+    print(f"\n👀 أمثلة على العملاء النشطين (أعلى 10):")
+    print(customer_summary.head(10).to_string(index=False))
+
+    print(f"\n👀 أمثلة على العملاء العاديين (عشوائي):")
+    print(customer_summary.sample(10, random_state=42).to_string(index=False))
+
+    # إحصائيات تفصيلية
+    print(f"\n📈 إحصائيات كاملة:")
+    print(customer_summary[['Purchases', 'Total_Value', 'Visits']].describe().round(2))
+
+    # توزيع الشرائح
+    print(f"\n📊 توزيع العملاء حسب عدد المشتريات:")
+    purchase_bins = [0, 1, 2, 3, 5, 10, 100]
+    purchase_labels = ['1', '2', '3', '4-5', '6-10', '10+']
+    purchase_dist = pd.cut(customer_summary['Purchases'], bins=purchase_bins, labels=purchase_labels).value_counts().sort_index()
+    for label, count in purchase_dist.items():
+        pct = count / len(customer_summary) * 100
+        print(f"   {label} مشتريات: {count:,} عميل ({pct:.1f}%)")
+
+    # حفظ الملف
+    # Parquet/Feather تحفظ أنواع الأعمدة وتُقرأ أسرع بكثير من Excel
+    output_files = write_customers(customer_summary, 'customers_kaggle_improved.xlsx',
+                                   formats=[fmt.strip() for fmt in args.formats.split(',') if fmt.strip()])
+    output_file = output_files[0]
+    print(f"\n✅ تم حفظ الملف المحسّن: {', '.join(output_files)}")
+
+    # إنشاء توثيق محدّث
+    documentation = f"""
 ================================================================================
 📄 توثيق مصدر البيانات المحسّنة للجامعة
 Improved Data Source Documentation
@@ -150,7 +372,7 @@ Improved Data Source Documentation
    - بيانات معاملات حقيقية من 10 مراكز تجارية في إسطنبول، تركيا
    - Real transaction data from 10 shopping malls in Istanbul, Turkey
    - الفترة الزمنية: 2021-2023
-   - عدد المعاملات الأصلية: {len(df_clean):,} معاملة
+   - عدد المعاملات الأصلية: {n_transactions:,} معاملة
    - عدد العملاء بعد التحسين: {len(customer_summary):,} عميل
 
 🔧 خطوات المعالجة والتحسين (Processing Steps):
@@ -194,33 +416,37 @@ Improved Data Source Documentation
 ================================================================================
 """
 
-doc_file = 'data_source_documentation_improved.txt'
-with open(doc_file, 'w', encoding='utf-8') as f:
-    f.write(documentation)
-print(f"✅ تم حفظ التوثيق المحدّث: {doc_file}")
-
-# فحص التوافق
-print("\n" + "="*80)
-print("🔍 فحص التوافق مع التطبيق")
-print("="*80)
-
-required_cols = ['Purchases', 'Total_Value', 'Visits']
-if all(col in customer_summary.columns for col in required_cols):
-    print("✅ جميع الأعمدة المطلوبة موجودة")
-    print("🎉 الملف المحسّن متوافق 100% مع التطبيق!")
-else:
-    print("❌ بعض الأعمدة مفقودة")
-
-print("\n" + "="*80)
-print("✅ انتهى التحسين بنجاح!")
-print("="*80)
-print(f"\n📁 الملفات الناتجة:")
-print(f"   1. {output_file} ← الملف المحسّن (استخدم هذا)")
-print(f"   2. {doc_file} ← التوثيق المحدّث")
-print(f"\n💡 المميزات:")
-print(f"   ✅ عملاء بمعاملات متعددة ({customer_summary['Purchases'].max()} كحد أقصى)")
-print(f"   ✅ عملاء بزيارات متعددة ({customer_summary['Visits'].max()} كحد أقصى)")
-print(f"   ✅ توزيع واقعي أقرب للسلوك الحقيقي")
-print(f"   ✅ مناسب للتحليل والتنبؤ")
-
-input("\n\nاضغط Enter للخروج...")
+    doc_file = 'data_source_documentation_improved.txt'
+    with open(doc_file, 'w', encoding='utf-8') as f:
+        f.write(documentation)
+    print(f"✅ تم حفظ التوثيق المحدّث: {doc_file}")
+
+    # فحص التوافق
+    print("\n" + "="*80)
+    print("🔍 فحص التوافق مع التطبيق")
+    print("="*80)
+
+    required_cols = ['Purchases', 'Total_Value', 'Visits']
+    if all(col in customer_summary.columns for col in required_cols):
+        print("✅ جميع الأعمدة المطلوبة موجودة")
+        print("🎉 الملف المحسّن متوافق 100% مع التطبيق!")
+    else:
+        print("❌ بعض الأعمدة مفقودة")
+
+    print("\n" + "="*80)
+    print("✅ انتهى التحسين بنجاح!")
+    print("="*80)
+    print(f"\n📁 الملفات الناتجة:")
+    print(f"   1. {output_file} ← الملف المحسّن (استخدم هذا)")
+    print(f"   2. {doc_file} ← التوثيق المحدّث")
+    print(f"\n💡 المميزات:")
+    print(f"   ✅ عملاء بمعاملات متعددة ({customer_summary['Purchases'].max()} كحد أقصى)")
+    print(f"   ✅ عملاء بزيارات متعددة ({customer_summary['Visits'].max()} كحد أقصى)")
+    print(f"   ✅ توزيع واقعي أقرب للسلوك الحقيقي")
+    print(f"   ✅ مناسب للتحليل والتنبؤ")
+
+    pause(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import pandas as pd
 import random
+from data_io import write_customers
 
 data = []
 for i in range(1, 101):
@@ -12,5 +13,5 @@ for i in range(1, 101):
     })
 
 df = pd.DataFrame(data)
-df.to_excel('customers.xlsx', index=False)
-print("✅ تم إنشاء الملف: customers.xlsx")
+saved = write_customers(df, 'customers.xlsx')
+print(f"✅ تم إنشاء الملف: {', '.join(saved)}")
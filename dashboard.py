@@ -4,9 +4,11 @@ import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import joblib
+from data_io import load_customers
+from chart_data import histogram_figure
 
 # تحميل البيانات والنموذج
-df = pd.read_excel('customers_churn.xlsx')
+df = load_customers('customers_churn.xlsx')
 model = joblib.load('best_churn_model.pkl')
 
 # إنشاء التطبيق
@@ -82,9 +84,9 @@ app.layout = html.Div([
     Input('churn-distribution', 'id')
 )
 def update_churn_distribution(_):
-    fig = px.histogram(df, x='Churn_Probability', nbins=20, 
-                       title='توزيع احتمالية الرحيل',
-                       color_discrete_sequence=['#1f77b4'])
+    fig = histogram_figure(df['Churn_Probability'], x_label='Churn_Probability',
+                           title='توزيع احتمالية الرحيل',
+                           color_discrete_sequence=['#1f77b4'])
     return fig
 
 @app.callback(
@@ -0,0 +1,143 @@
+# data_io.py - قراءة وكتابة ملفات العملاء (Excel / CSV / Parquet / Feather)
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+FEATHER_EXTENSIONS = ('.feather', '.arrow')
+
+# الصيغ العمودية المفضلة عند وجودها بجانب ملف Excel (بالترتيب)
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather')
+
+# أنواع أعمدة ملفات العملاء (تُحفظ كما هي في Parquet/Feather)
+CUSTOMER_SCHEMA = {
+    'ID': 'int64',
+    'Name': 'string',
+    'Purchases': 'int64',
+    'Total_Value': 'float64',
+    'Visits': 'int64',
+    'churned': 'int64',
+}
+
+
+def file_format(name):
+    """نوع الملف من امتداده: excel, csv, parquet, feather"""
+    ext = os.path.splitext(str(name).lower())[1]
+    if ext in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if ext in FEATHER_EXTENSIONS:
+        return 'feather'
+    if ext == '.csv':
+        return 'csv'
+    return 'excel'
+
+
+def columnar_available():
+    return pyarrow is not None
+
+
+def apply_schema(df, schema=CUSTOMER_SCHEMA):
+    """توحيد أنواع الأعمدة المعروفة (الأعمدة الأخرى تبقى كما هي)"""
+    df = df.copy()
+    for col, dtype in schema.items():
+        if col not in df.columns or str(df[col].dtype) == dtype:
+            continue
+        if dtype == 'string':
+            df[col] = df[col].astype('string')
+        elif dtype == 'int64':
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def resolve_data_file(path):
+    """
+    اختيار أسرع نسخة متاحة من ملف البيانات
+
+    إذا وُجد ملف Parquet/Feather بنفس الاسم وليس أقدم من ملف Excel يُستخدم بدلاً منه
+
+    Parameters:
+    - path: المسار المطلوب (مثلاً customers_churn.xlsx)
+
+    Returns:
+    - str: المسار الذي سيُقرأ فعلاً
+    """
+    if file_format(path) != 'excel' or not columnar_available():
+        return path
+    stem = os.path.splitext(path)[0]
+    excel_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    for ext in COLUMNAR_EXTENSIONS:
+        candidate = stem + ext
+        if os.path.exists(candidate) and (excel_mtime is None or os.path.getmtime(candidate) >= excel_mtime):
+            return candidate
+    return path
+
+
+def read_table(source, name=None, columns=None):
+    """
+    قراءة جدول بيانات حسب صيغته
+
+    Parameters:
+    - source: مسار الملف أو BytesIO (للملفات المرفوعة)
+    - name: اسم الملف لتحديد الصيغة عند تمرير BytesIO
+    - columns: الأعمدة المطلوبة فقط (None = الكل)
+
+    Returns:
+    - DataFrame
+    """
+    fmt = file_format(name or source)
+    if fmt == 'parquet':
+        return pd.read_parquet(source, columns=columns)
+    if fmt == 'feather':
+        return pd.read_feather(source, columns=columns)
+    if fmt == 'csv':
+        return pd.read_csv(source, usecols=columns)
+    return pd.read_excel(source, usecols=columns)
+
+
+def load_customers(path, columns=None):
+    """قراءة ملف عملاء مع تفضيل النسخة العمودية إن وُجدت"""
+    return read_table(resolve_data_file(path), columns=columns)
+
+
+def write_table(df, path, schema=CUSTOMER_SCHEMA):
+    """
+    حفظ جدول حسب امتداد المسار (مع توحيد الأنواع للصيغ العمودية)
+
+    Returns:
+    - str: المسار المحفوظ
+    """
+    fmt = file_format(path)
+    if fmt == 'parquet':
+        apply_schema(df, schema).to_parquet(path, index=False)
+    elif fmt == 'feather':
+        apply_schema(df, schema).reset_index(drop=True).to_feather(path)
+    elif fmt == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine='openpyxl')
+    return path
+
+
+def write_customers(df, path, formats=('xlsx', 'parquet')):
+    """
+    حفظ ملف العملاء بعدة صيغ بنفس الاسم (مثلاً customers.xlsx + customers.parquet)
+
+    Returns:
+    - list: المسارات المحفوظة
+    """
+    stem = os.path.splitext(path)[0]
+    saved = []
+    for fmt in formats:
+        if fmt in ('parquet', 'feather') and not columnar_available():
+            continue
+        saved.append(write_table(df, f"{stem}.{fmt}"))
+    return saved
@@ -1,19 +1,193 @@
 # database.py
 import sqlite3
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import json
+import numpy as np
 import streamlit as st
-import struct
 
 
 DB_NAME = "customer_analysis.db"
 
+# عدد صفوف العملاء في كل دفعة executemany
+BULK_CHUNK_SIZE = 5000
+
+# أقصى عدد اتصالات خاملة محفوظة، وعدد الاستعلامات المجهزة لكل اتصال
+POOL_MAX_IDLE = 8
+CACHED_STATEMENTS = 256
+
+# إصدار القاعدة (PRAGMA user_version): 1 = القيم الرقمية المحفوظة كـ BLOB تم تحويلها
+SCHEMA_VERSION = 1
+
+# فترات جدول analysis_rollups (بداية الأسبوع يوم الاثنين)
+ROLLUP_PERIODS = ['day', 'week']
+
+# الأعمدة التي تُجمع في analysis_rollups لكل فترة
+ROLLUP_SUMS = ['analyses', 'total_customers', 'high_risk_count', 'medium_risk_count', 'low_risk_count',
+               'churn_sum', 'value_sum', 'purchases_sum', 'revenue_at_risk', 'predicted_future_value',
+               'repeat_customers']
+
+# أعمدة ملخص التحليل الرقمية: NULL (متوسط NaN أو BLOB غير معروف) = 0 في سجل التحليلات
+SUMMARY_COUNT_COLUMNS = ['total_customers', 'high_risk_count', 'medium_risk_count', 'low_risk_count']
+SUMMARY_VALUE_COLUMNS = ['avg_churn_probability', 'avg_customer_value', 'avg_purchases',
+                         'revenue_at_risk', 'predicted_future_value']
+
+
+# ========== أنواع NumPy ==========
+# قيم numpy (مثل np.int64) تُحفظ في SQLite كـ BLOB من bytes الذاكرة إذا مُررت مباشرة؛
+# هنا تُحوّل إلى int/float عادية فتُحفظ كـ INTEGER/REAL
+for _type in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64):
+    sqlite3.register_adapter(_type, int)
+for _type in (np.float16, np.float32, np.float64):
+    sqlite3.register_adapter(_type, float)
+sqlite3.register_adapter(np.bool_, bool)
+
+
+def apply_pragmas(conn):
+    """إعدادات الأداء لكل اتصال (WAL نفسه يُحفظ في ملف القاعدة)"""
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -20000")
+    conn.execute("PRAGMA busy_timeout = 5000")
+
+
+# ========== مجمع الاتصالات ==========
+
+
+class ConnectionPool:
+    """
+    مجمع اتصالات SQLite يعيد استخدام الاتصالات بدلاً من فتحها وإغلاقها كل مرة
+    
+    - الاتصال الخامل الأحدث يُستخدم أولاً (LIFO) فتبقى الاستعلامات المجهزة ساخنة
+    - الاستدعاءات المتداخلة في نفس الخيط تستخدم نفس الاتصال
+    - أي معاملة لم يُعمل لها commit تُلغى عند إرجاع الاتصال (مثل close)
+    """
+
+    def __init__(self, db_name, max_idle=POOL_MAX_IDLE):
+        self.db_name = db_name
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def _connect(self):
+        # check_same_thread=False: الاتصال ينتقل بين خيوط Streamlit لكن لا يُستخدم من خيطين معاً
+        conn = sqlite3.connect(self.db_name, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn)
+        return conn
+
+    def _request_counters(self):
+        local = self._local
+        if not hasattr(local, 'request'):
+            local.request = {'checkouts': 0, 'opened': 0}
+        return local.request
+
+    def acquire(self):
+        """أخذ اتصال من المجمع (أو فتح اتصال جديد)"""
+        counters = self._request_counters()
+        counters['checkouts'] += 1
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.opened += 1
+        counters['opened'] += 1
+        return self._connect()
+
+    def release(self, conn):
+        """إرجاع الاتصال للمجمع بعد إلغاء أي معاملة مفتوحة"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self.closed += 1
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            # استدعاء متداخل: نفس الاتصال ونفس المعاملة
+            yield conn
+            return
+        conn = self.acquire()
+        local.conn = conn
+        try:
+            yield conn
+        finally:
+            local.conn = None
+            self.release(conn)
+
+    def begin_request(self):
+        """تصفير عدادات الخيط الحالي (بداية تشغيل الصفحة)"""
+        self._local.request = {'checkouts': 0, 'opened': 0}
+
+    def stats(self):
+        """عدادات المجمع + عدادات الطلب الحالي"""
+        with self._lock:
+            totals = {
+                'opened': self.opened,
+                'reused': self.reused,
+                'closed': self.closed,
+                'idle': len(self._idle),
+            }
+        totals['request'] = dict(self._request_counters())
+        return totals
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.closed += len(idle)
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    """المجمع الخاص بقاعدة البيانات الحالية (DB_NAME)"""
+    with _pools_lock:
+        pool = _pools.get(DB_NAME)
+        if pool is None:
+            pool = _pools[DB_NAME] = ConnectionPool(DB_NAME)
+        return pool
+
 
 def get_connection():
-    """إنشاء اتصال بقاعدة البيانات"""
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    اتصال بقاعدة البيانات من المجمع
+    
+    الاستخدام:
+        with get_connection() as conn:
+            conn.execute(...)
+            conn.commit()
+    """
+    return get_pool().connection()
+
+
+def begin_request():
+    """بداية طلب جديد (إعادة تشغيل الصفحة) لحساب الاتصالات المفتوحة فيه"""
+    get_pool().begin_request()
+
+
+def connection_stats():
+    """إحصائيات الاتصالات للعرض في الشريط الجانبي"""
+    return get_pool().stats()
 
 
 def init_database():
@@ -21,6 +195,9 @@ def init_database():
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
 
+    # WAL: القراءة لا تنتظر الكتابة، والكتابة أسرع مع synchronous=NORMAL
+    cursor.execute("PRAGMA journal_mode = WAL")
+
 
     # ========== 1. جدول المستخدمين (موجود بالفعل) ==========
     cursor.execute("""
@@ -79,113 +256,430 @@ def init_database():
     """)
 
 
+    # ========== 4. ملخصات يومية وأسبوعية لكل مستخدم (لصفحة الاتجاهات) ==========
+    # تُحدّث مع كل save_analysis ولا تُحذف مع delete_old_analyses
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_rollups (
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            analyses INTEGER NOT NULL,
+            total_customers INTEGER NOT NULL,
+            high_risk_count INTEGER NOT NULL,
+            medium_risk_count INTEGER NOT NULL,
+            low_risk_count INTEGER NOT NULL,
+            churn_sum REAL NOT NULL,
+            value_sum REAL NOT NULL,
+            purchases_sum REAL NOT NULL,
+            revenue_at_risk REAL NOT NULL,
+            predicted_future_value REAL NOT NULL,
+            repeat_customers INTEGER NOT NULL,
+            last_analysis_date TEXT NOT NULL,
+            PRIMARY KEY (username, period, period_start)
+        ) WITHOUT ROWID
+    """)
+
+
+    # ========== 5. المهام الخلفية (jobs.py) ==========
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            job_key TEXT,
+            analysis_id INTEGER,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+
+
     # ========== إنشاء Indexes لتحسين الأداء ==========
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_analysis_username 
         ON analysis_summary(username)
     """)
+
+    # سجل المستخدم مرتب بالتاريخ بدون ترتيب إضافي
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_analysis_username_date
+        ON analysis_summary(username, analysis_date)
+    """)
     
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_customers_analysis 
         ON analyzed_customers(analysis_id)
     """)
 
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_key
+        ON jobs(job_key, status)
+    """)
+
+    # تفاصيل التحليل مرتبة بالخطر: الترتيب والتصفية والأعمدة المعروضة من الـ index مباشرة
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_customers_analysis_churn
+        ON analyzed_customers(analysis_id, churn_probability_best DESC, id,
+                              advanced_segment, customer_name, purchases, total_value, visits)
+    """)
+
+
+    # ========== أعمدة إعادة التحليل التدريجي (لقواعد البيانات القديمة) ==========
+    add_column_if_missing(cursor, 'analyzed_customers', 'row_hash', 'INTEGER')
+    add_column_if_missing(cursor, 'analysis_summary', 'model_fingerprint', 'TEXT')
+    add_column_if_missing(cursor, 'jobs', 'analysis_id', 'INTEGER')
+
+
+    # ========== تحويل القيم الرقمية المحفوظة كـ BLOB (مرة واحدة) ==========
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        fixed = migrate_numeric_blobs(cursor, 'analysis_summary')
+        migrate_numeric_blobs(cursor, 'analyzed_customers')
+        if fixed:
+            rebuild_rollups(cursor)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+    # ========== ملء الملخصات من التحليلات المحفوظة قبل إضافة الجدول ==========
+    if cursor.execute("SELECT 1 FROM analysis_rollups LIMIT 1").fetchone() is None:
+        rebuild_rollups(cursor)
+
 
     conn.commit()
     conn.close()
 
 
+def add_column_if_missing(cursor, table, column, definition):
+    """إضافة عمود لجدول موجود إذا لم يكن موجوداً (ترحيل بسيط)"""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+# ========== ترحيل القيم الرقمية ==========
+
+
+# حجم الـ BLOB -> نوع numpy الذي أنتجه (little-endian كما في ذاكرة numpy)
+BLOB_INTEGER_TYPES = {1: '<i1', 2: '<i2', 4: '<i4', 8: '<i8'}
+BLOB_REAL_TYPES = {2: '<f2', 4: '<f4', 8: '<f8'}
+
+
+def decode_numeric_blob(value, declared_type):
+    """
+    قراءة قيمة numpy محفوظة كـ BLOB
+    
+    Returns:
+    - int / float، أو None إذا كان الحجم غير معروف
+    """
+    types = BLOB_INTEGER_TYPES if 'INT' in declared_type.upper() else BLOB_REAL_TYPES
+    dtype = types.get(len(value))
+    if dtype is None:
+        return None
+    return np.frombuffer(value, dtype=dtype)[0].item()
+
+
+def migrate_numeric_blobs(cursor, table):
+    """
+    تحويل خلايا BLOB في الأعمدة INTEGER/REAL إلى قيمها الرقمية (بدون commit)
+    
+    Returns:
+    - int: عدد الصفوف التي تم تعديلها
+    """
+    columns = [
+        (row[1], row[2]) for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()
+        if row[2].upper() in ('INTEGER', 'REAL') and row[1] != 'id'
+    ]
+    if not columns:
+        return 0
+    where = ' OR '.join(f"typeof({name}) = 'blob'" for name, _ in columns)
+    rows = cursor.execute(
+        f"SELECT id, {', '.join(name for name, _ in columns)} FROM {table} WHERE {where}"
+    ).fetchall()
+    
+    for row in rows:
+        updates = {
+            name: decode_numeric_blob(value, declared_type)
+            for (name, declared_type), value in zip(columns, row[1:])
+            if isinstance(value, bytes)
+        }
+        assignments = ', '.join(f"{name} = ?" for name in updates)
+        cursor.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", (*updates.values(), row[0]))
+    return len(rows)
+
+
+# ========== الملخصات اليومية والأسبوعية ==========
+
+
+def period_start(analysis_date, period):
+    """بداية اليوم أو الأسبوع (الاثنين) لتاريخ التحليل بصيغة YYYY-MM-DD"""
+    day = datetime.strptime(analysis_date[:10], "%Y-%m-%d").date()
+    if period == 'week':
+        day -= timedelta(days=day.weekday())
+    return day.isoformat()
+
+
+def update_rollups(cursor, username, analysis_date, totals):
+    """
+    إضافة تحليل واحد لملخصات اليوم والأسبوع (بدون commit - نفس معاملة save_analysis)
+    
+    Parameters:
+    - totals: dict بقيم ROLLUP_SUMS لهذا التحليل
+    """
+    columns = ', '.join(ROLLUP_SUMS)
+    placeholders = ', '.join(['?'] * len(ROLLUP_SUMS))
+    updates = ', '.join(f"{col} = {col} + excluded.{col}" for col in ROLLUP_SUMS)
+    for period in ROLLUP_PERIODS:
+        cursor.execute(f"""
+            INSERT INTO analysis_rollups
+            (username, period, period_start, {columns}, last_analysis_date)
+            VALUES (?, ?, ?, {placeholders}, ?)
+            ON CONFLICT (username, period, period_start) DO UPDATE SET
+            {updates},
+            last_analysis_date = MAX(last_analysis_date, excluded.last_analysis_date)
+        """, (username, period, period_start(analysis_date, period),
+              *[totals[col] for col in ROLLUP_SUMS], analysis_date))
+
+
+def rebuild_rollups(cursor):
+    """إعادة حساب analysis_rollups من analysis_summary (للتحليلات المحفوظة سابقاً)"""
+    cursor.execute("DELETE FROM analysis_rollups")
+    starts = {
+        'day': "date(analysis_date)",
+        'week': "date(analysis_date, 'weekday 0', '-6 days')",
+    }
+    for period in ROLLUP_PERIODS:
+        cursor.execute(f"""
+            INSERT INTO analysis_rollups
+            (username, period, period_start, {', '.join(ROLLUP_SUMS)}, last_analysis_date)
+            SELECT username, ?, {starts[period]},
+                   COUNT(*), SUM(total_customers), SUM(high_risk_count),
+                   SUM(medium_risk_count), SUM(low_risk_count),
+                   SUM(avg_churn_probability * total_customers),
+                   SUM(avg_customer_value * total_customers),
+                   SUM(avg_purchases * total_customers),
+                   SUM(revenue_at_risk), SUM(predicted_future_value),
+                   SUM(CAST(ROUND(COALESCE(retention_rate, 0) * total_customers / 100.0) AS INTEGER)),
+                   MAX(analysis_date)
+            FROM analysis_summary
+            GROUP BY username, {starts[period]}
+        """, (period,))
+
+
+def get_analysis_trends(username, period='day', limit=365):
+    """
+    اتجاهات التحليلات من analysis_rollups (بدون قراءة analyzed_customers)
+    
+    Parameters:
+    - period: 'day' أو 'week'
+    - limit: آخر عدد من الفترات
+    
+    Returns:
+    - DataFrame مرتب بالتاريخ: period_start, analyses, total_customers,
+      avg_churn_probability, high_risk_pct, revenue_at_risk (متوسط التحليل),
+      retention_rate, avg_customer_value, predicted_future_value (متوسط التحليل)
+    """
+    import pandas as pd
+    
+    with get_connection() as conn:
+        df = pd.read_sql_query("""
+            SELECT * FROM analysis_rollups
+            WHERE username = ? AND period = ?
+            ORDER BY period_start DESC
+            LIMIT ?
+        """, conn, params=(username, period, limit))
+    
+    df = df.iloc[::-1].reset_index(drop=True)
+    customers = df['total_customers'].where(df['total_customers'] > 0)
+    return pd.DataFrame({
+        'period_start': pd.to_datetime(df['period_start']),
+        'analyses': df['analyses'],
+        'total_customers': df['total_customers'],
+        'avg_churn_probability': df['churn_sum'] / customers,
+        'high_risk_pct': df['high_risk_count'] / customers * 100,
+        'revenue_at_risk': df['revenue_at_risk'] / df['analyses'],
+        'retention_rate': df['repeat_customers'] / customers * 100,
+        'avg_customer_value': df['value_sum'] / customers,
+        'predicted_future_value': df['predicted_future_value'] / df['analyses'],
+    })
+
+
 # ========== دوال حفظ التحليلات ==========
 
 
-def save_analysis(df, username):
+def customer_rows(df, analysis_id, row_hashes=None):
+    """
+    تجهيز صفوف analyzed_customers من الأعمدة مباشرة بدلاً من iterrows
+    
+    tolist() يحوّل قيم numpy إلى int/float عادية حتى لا تُحفظ كـ bytes
+    
+    Parameters:
+    - df: DataFrame يحتوي على نتائج التحليل
+    - analysis_id: رقم التحليل
+    - row_hashes: بصمة كل صف (incremental_scoring.row_hashes) أو None
+    
+    Returns:
+    - list: tuples بنفس ترتيب أعمدة INSERT
+    """
+    n = len(df)
+    segment = df['Segment'].tolist() if 'Segment' in df.columns else [''] * n
+    future_value = (
+        df['predicted_future_value'].astype(float).tolist()
+        if 'predicted_future_value' in df.columns else [0] * n
+    )
+    return list(zip(
+        [analysis_id] * n,
+        df['Name'].tolist(),
+        df['Purchases'].astype('int64').tolist(),
+        df['Total_Value'].astype(float).tolist(),
+        df['Visits'].astype('int64').tolist(),
+        df['Churn_Probability_RF'].astype(float).tolist(),
+        df['Churn_Probability_XGB'].astype(float).tolist(),
+        df['Churn_Probability'].astype(float).tolist(),
+        segment,
+        df['Advanced_Segment'].tolist(),
+        future_value,
+        row_hashes.tolist() if row_hashes is not None else [None] * n
+    ))
+
+
+def insert_customers_bulk(cursor, df, analysis_id, row_hashes=None, chunk_size=BULK_CHUNK_SIZE):
+    """
+    إدخال العملاء بـ executemany على دفعات (بدون commit - المعاملة مسؤولية المستدعي)
+    
+    Returns:
+    - int: عدد الصفوف المدخلة
+    """
+    rows = customer_rows(df, analysis_id, row_hashes)
+    for start in range(0, len(rows), chunk_size):
+        cursor.executemany("""
+            INSERT INTO analyzed_customers
+            (analysis_id, customer_name, purchases, total_value, 
+             visits, churn_probability_rf, churn_probability_xgb, 
+             churn_probability_best, segment, advanced_segment, 
+             predicted_future_value, row_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows[start:start + chunk_size])
+    return len(rows)
+
+
+def save_analysis(df, username, row_hashes=None, model_fingerprint=None, job_id=None, raise_errors=False):
     """
     حفظ نتائج التحليل الكامل
     
     Parameters:
     - df: DataFrame يحتوي على نتائج التحليل
     - username: اسم المستخدم
+    - row_hashes: بصمة كل صف (لإعادة استخدام النتائج في الرفع التالي)
+    - model_fingerprint: بصمة النماذج التي أنتجت النتائج
+    - job_id: مهمة الحفظ (jobs.py)؛ رقم التحليل يُسجل فيها داخل نفس المعاملة
+    - raise_errors: رفع الخطأ بعد التراجع بدلاً من st.error (خيوط المهام بدون واجهة)
     
     Returns:
     - analysis_id: رقم التحليل المحفوظ
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # حساب الإحصائيات
-        total_customers = len(df)
-        high_risk = len(df[df['Churn_Probability'] > 70])
-        medium_risk = len(df[(df['Churn_Probability'] > 30) & (df['Churn_Probability'] <= 70)])
-        low_risk = len(df[df['Churn_Probability'] <= 30])
+    with get_connection() as conn:
+        cursor = conn.cursor()
         
-        avg_churn = df['Churn_Probability'].mean()
-        avg_value = df['Total_Value'].mean()
-        avg_purchases = df['Purchases'].mean()
-        revenue_risk = df[df['Churn_Probability'] > 70]['Total_Value'].sum()
-        predicted_value = df['predicted_future_value'].sum() if 'predicted_future_value' in df.columns else 0
+        try:
+            # حساب الإحصائيات
+            total_customers = len(df)
+            high_risk = len(df[df['Churn_Probability'] > 70])
+            medium_risk = len(df[(df['Churn_Probability'] > 30) & (df['Churn_Probability'] <= 70)])
+            low_risk = len(df[df['Churn_Probability'] <= 30])
         
-        # حساب معدل الاحتفاظ
-        repeat_customers = len(df[df['Purchases'] > 1])
-        retention_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
+            avg_churn = df['Churn_Probability'].mean()
+            avg_value = df['Total_Value'].mean()
+            avg_purchases = df['Purchases'].mean()
+            revenue_risk = df[df['Churn_Probability'] > 70]['Total_Value'].sum()
+            predicted_value = df['predicted_future_value'].sum() if 'predicted_future_value' in df.columns else 0
         
-        # 1. حفظ ملخص التحليل
-        cursor.execute("""
-            INSERT INTO analysis_summary 
-            (username, analysis_date, total_customers, high_risk_count, 
-             medium_risk_count, low_risk_count, avg_churn_probability, 
-             avg_customer_value, avg_purchases, revenue_at_risk, 
-             predicted_future_value, retention_rate)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            username,
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            total_customers,
-            high_risk,
-            medium_risk,
-            low_risk,
-            avg_churn,
-            avg_value,
-            avg_purchases,
-            revenue_risk,
-            predicted_value,
-            retention_rate
-        ))
+            # حساب معدل الاحتفاظ
+            repeat_customers = len(df[df['Purchases'] > 1])
+            retention_rate = (repeat_customers / total_customers * 100) if total_customers > 0 else 0
         
-        analysis_id = cursor.lastrowid
+            analysis_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # 2. حفظ تفاصيل كل عميل
-        for _, customer in df.iterrows():
+            # 1. حفظ ملخص التحليل
             cursor.execute("""
-                INSERT INTO analyzed_customers
-                (analysis_id, customer_name, purchases, total_value, 
-                 visits, churn_probability_rf, churn_probability_xgb, 
-                 churn_probability_best, segment, advanced_segment, 
-                 predicted_future_value)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO analysis_summary 
+                (username, analysis_date, total_customers, high_risk_count, 
+                 medium_risk_count, low_risk_count, avg_churn_probability, 
+                 avg_customer_value, avg_purchases, revenue_at_risk, 
+                 predicted_future_value, retention_rate, model_fingerprint)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
-                analysis_id,
-                customer['Name'],
-                int(customer['Purchases']),
-                float(customer['Total_Value']),
-                int(customer['Visits']),
-                float(customer['Churn_Probability_RF']),
-                float(customer['Churn_Probability_XGB']),
-                float(customer['Churn_Probability']),
-                customer['Segment'] if 'Segment' in customer else '',
-                customer['Advanced_Segment'],
-                float(customer['predicted_future_value']) if 'predicted_future_value' in customer else 0
+                username,
+                analysis_date,
+                total_customers,
+                high_risk,
+                medium_risk,
+                low_risk,
+                float(avg_churn),
+                float(avg_value),
+                float(avg_purchases),
+                float(revenue_risk),
+                float(predicted_value),
+                float(retention_rate),
+                model_fingerprint
             ))
         
-        conn.commit()
-        return analysis_id
+            analysis_id = cursor.lastrowid
         
-    except Exception as e:
-        conn.rollback()
-        st.error(f"خطأ في حفظ التحليل: {e}")
-        return None
-    finally:
-        conn.close()
+            # 2. حفظ تفاصيل العملاء دفعة واحدة (داخل نفس المعاملة)
+            insert_customers_bulk(cursor, df, analysis_id, row_hashes)
+        
+            # 3. تحديث ملخصات اليوم والأسبوع
+            update_rollups(cursor, username, analysis_date, {
+                'analyses': 1,
+                'total_customers': total_customers,
+                'high_risk_count': high_risk,
+                'medium_risk_count': medium_risk,
+                'low_risk_count': low_risk,
+                'churn_sum': float(df['Churn_Probability'].sum()),
+                'value_sum': float(df['Total_Value'].sum()),
+                'purchases_sum': float(df['Purchases'].sum()),
+                'revenue_at_risk': float(revenue_risk),
+                'predicted_future_value': float(predicted_value),
+                'repeat_customers': repeat_customers,
+            })
+
+            # 4. ربط التحليل بمهمة الحفظ: الاستئناف بعد توقف مفاجئ لا يحفظه مرة ثانية
+            if job_id is not None:
+                cursor.execute("UPDATE jobs SET analysis_id = ? WHERE id = ?", (analysis_id, job_id))
+        
+            conn.commit()
+            return analysis_id
+        
+        except Exception as e:
+            conn.rollback()
+            if raise_errors:
+                raise
+            st.error(f"خطأ في حفظ التحليل: {e}")
+            return None
+
+
+def get_user_analyses_frame(username, limit=10):
+    """
+    تاريخ التحليلات للمستخدم كـ DataFrame (الأحدث أولاً)
+    
+    Parameters:
+    - username: اسم المستخدم
+    - limit: عدد التحليلات المطلوبة
+    """
+    import pandas as pd
+    
+    with get_connection() as conn:
+        return pd.read_sql_query("""
+            SELECT * FROM analysis_summary
+            WHERE username = ?
+            ORDER BY analysis_date DESC
+            LIMIT ?
+        """, conn, params=(username, limit))
 
 
 def get_user_analyses(username, limit=10):
@@ -197,72 +691,14 @@ def get_user_analyses(username, limit=10):
     - limit: عدد التحليلات المطلوبة
     
     Returns:
-    - list: قائمة التحليلات
+    - list: قائمة التحليلات (dict لكل تحليل، retention_rate = None إذا لم يُحفظ)
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT * FROM analysis_summary
-        WHERE username = ?
-        ORDER BY analysis_date DESC
-        LIMIT ?
-    """, (username, limit))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    def safe_float(value):
-        """تحويل آمن من bytes أو أي نوع إلى float"""
-        try:
-            if value is None:
-                return 0.0
-            if isinstance(value, bytes):
-                # محاولة فك تشفير bytes إلى float
-                if len(value) == 4:  # float32
-                    return struct.unpack('f', value)[0]
-                elif len(value) == 8:  # float64
-                    return struct.unpack('d', value)[0]
-                else:
-                    return 0.0
-            return float(value)
-        except:
-            return 0.0
-    
-    def safe_int(value):
-        """تحويل آمن إلى int"""
-        try:
-            if value is None:
-                return 0
-            if isinstance(value, bytes):
-                if len(value) <= 4:
-                    return int.from_bytes(value, byteorder='little', signed=False)
-                else:
-                    return 0
-            return int(value)
-        except:
-            return 0
-    
-    # تحويل sqlite3.Row إلى dictionary عادي مع تحويل الأنواع
-    analyses = []
-    for row in rows:
-        analyses.append({
-            'id': row['id'],
-            'username': row['username'],
-            'analysis_date': row['analysis_date'],
-            'total_customers': safe_int(row['total_customers']),
-            'high_risk_count': safe_int(row['high_risk_count']),
-            'medium_risk_count': safe_int(row['medium_risk_count']),
-            'low_risk_count': safe_int(row['low_risk_count']),
-            'avg_churn_probability': safe_float(row['avg_churn_probability']),
-            'avg_customer_value': safe_float(row['avg_customer_value']),
-            'avg_purchases': safe_float(row['avg_purchases']),
-            'revenue_at_risk': safe_float(row['revenue_at_risk']),
-            'predicted_future_value': safe_float(row['predicted_future_value']),
-            'retention_rate': safe_float(row['retention_rate']) if row['retention_rate'] else None
-        })
-    
-    return analyses
+    df = get_user_analyses_frame(username, limit)
+    # الأعداد والمتوسطات تُعرض مباشرة في صفحة السجل: NULL -> 0
+    df[SUMMARY_COUNT_COLUMNS] = df[SUMMARY_COUNT_COLUMNS].fillna(0).astype(np.int64)
+    df[SUMMARY_VALUE_COLUMNS] = df[SUMMARY_VALUE_COLUMNS].fillna(0.0).astype(np.float64)
+    # باقي الأعمدة (retention_rate مثلاً): NaN (قيمة NULL) -> None
+    return df.astype(object).where(df.notna(), None).to_dict('records')
 
 
 def get_analysis_details(analysis_id):
@@ -277,17 +713,104 @@ def get_analysis_details(analysis_id):
     """
     import pandas as pd
     
-    conn = get_connection()
+    with get_connection() as conn:
+        df = pd.read_sql_query("""
+            SELECT * FROM analyzed_customers
+            WHERE analysis_id = ?
+            ORDER BY churn_probability_best DESC
+        """, conn, params=(analysis_id,))
+    
+    return df
+
+
+# أعمدة صفحة التفاصيل (كلها موجودة في idx_customers_analysis_churn)
+DETAIL_COLUMNS = ['id', 'customer_name', 'purchases', 'total_value', 'visits',
+                  'churn_probability_best', 'advanced_segment']
+
+
+def get_analysis_page(analysis_id, limit=10, after=None, segment=None):
+    """
+    صفحة من عملاء التحليل مرتبة من الأعلى خطراً (keyset: بدون OFFSET)
     
-    df = pd.read_sql_query("""
-        SELECT * FROM analyzed_customers
-        WHERE analysis_id = ?
-        ORDER BY churn_probability_best DESC
-    """, conn, params=(analysis_id,))
+    Parameters:
+    - analysis_id: رقم التحليل
+    - limit: عدد الصفوف (الصفحة الأولى = أعلى limit عميل)
+    - after: (churn_probability_best, id) لآخر صف في الصفحة السابقة
+    - segment: advanced_segment أو None للكل
     
-    conn.close()
+    Returns:
+    - DataFrame بأعمدة DETAIL_COLUMNS
+    """
+    import pandas as pd
     
-    return df
+    where = ["analysis_id = ?"]
+    params = [analysis_id]
+    if segment is not None:
+        where.append("advanced_segment = ?")
+        params.append(segment)
+    if after is not None:
+        # الشرط الأول يبدأ القراءة من موضع الصفحة في الـ index، والثاني يستبعد الصفوف المعروضة بنفس النسبة
+        where.append("churn_probability_best <= ? AND (churn_probability_best < ? OR id > ?)")
+        params.extend([after[0], after[0], after[1]])
+    params.append(limit)
+    
+    with get_connection() as conn:
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(DETAIL_COLUMNS)} FROM analyzed_customers
+            WHERE {' AND '.join(where)}
+            ORDER BY churn_probability_best DESC, id
+            LIMIT ?
+        """, conn, params=params)
+
+
+def get_analysis_segments(analysis_id):
+    """
+    عدد العملاء لكل شريحة في التحليل
+    
+    Returns:
+    - dict: {advanced_segment: count} مرتب تنازلياً
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT advanced_segment, COUNT(*) AS n FROM analyzed_customers
+            WHERE analysis_id = ?
+            GROUP BY advanced_segment
+            ORDER BY n DESC
+        """, (analysis_id,)).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def get_latest_scores(username, model_fingerprint):
+    """
+    نتائج آخر تحليل محفوظ للمستخدم بنفس النماذج (لإعادة التحليل التدريجي)
+    
+    Parameters:
+    - username: اسم المستخدم
+    - model_fingerprint: بصمة النماذج الحالية
+    
+    Returns:
+    - (hashes, scores) أو None: بصمات الصفوف ومصفوفة (n, 3) بنسب rf, xgb, best
+    """
+    with get_connection() as conn:
+        row = conn.execute("""
+            SELECT id FROM analysis_summary
+            WHERE username = ? AND model_fingerprint = ?
+            ORDER BY analysis_date DESC, id DESC
+            LIMIT 1
+        """, (username, model_fingerprint)).fetchone()
+        if row is None:
+            return None
+        
+        rows = conn.execute("""
+            SELECT row_hash, churn_probability_rf, churn_probability_xgb, churn_probability_best
+            FROM analyzed_customers
+            WHERE analysis_id = ? AND row_hash IS NOT NULL
+        """, (row['id'],)).fetchall()
+    
+    if not rows:
+        return None
+    data = np.array(rows, dtype=object)
+    return data[:, 0].astype(np.int64), data[:, 1:].astype(np.float64)
 
 
 def delete_old_analyses(username, keep_count=10):
@@ -298,37 +821,35 @@ def delete_old_analyses(username, keep_count=10):
     - username: اسم المستخدم
     - keep_count: عدد التحليلات للاحتفاظ بها
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    with get_connection() as conn:
+        cursor = conn.cursor()
     
-    # الحصول على IDs التحليلات القديمة
-    cursor.execute("""
-        SELECT id FROM analysis_summary
-        WHERE username = ?
-        ORDER BY analysis_date DESC
-        LIMIT -1 OFFSET ?
-    """, (username, keep_count))
+        # الحصول على IDs التحليلات القديمة
+        cursor.execute("""
+            SELECT id FROM analysis_summary
+            WHERE username = ?
+            ORDER BY analysis_date DESC
+            LIMIT -1 OFFSET ?
+        """, (username, keep_count))
     
-    old_ids = [row[0] for row in cursor.fetchall()]
+        old_ids = [row[0] for row in cursor.fetchall()]
     
-    if old_ids:
-        placeholders = ','.join(['?'] * len(old_ids))
+        if old_ids:
+            placeholders = ','.join(['?'] * len(old_ids))
         
-        # حذف بيانات العملاء
-        cursor.execute(f"""
-            DELETE FROM analyzed_customers
-            WHERE analysis_id IN ({placeholders})
-        """, old_ids)
+            # حذف بيانات العملاء
+            cursor.execute(f"""
+                DELETE FROM analyzed_customers
+                WHERE analysis_id IN ({placeholders})
+            """, old_ids)
         
-        # حذف ملخصات التحليل
-        cursor.execute(f"""
-            DELETE FROM analysis_summary
-            WHERE id IN ({placeholders})
-        """, old_ids)
+            # حذف ملخصات التحليل
+            cursor.execute(f"""
+                DELETE FROM analysis_summary
+                WHERE id IN ({placeholders})
+            """, old_ids)
         
-        conn.commit()
-    
-    conn.close()
+            conn.commit()
 
 
 # إنشاء قاعدة البيانات عند استيراد الملف
@@ -5,9 +5,10 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import joblib
+from data_io import load_customers
 
 # تحميل البيانات
-df = pd.read_excel('customers_churn.xlsx')
+df = load_customers('customers_churn.xlsx')
 X = df[['Purchases', 'Total_Value', 'Visits']]
 y = df['churned']
 
@@ -0,0 +1,150 @@
+# exports.py - تصدير تفاصيل التحليلات المحفوظة (CSV / Parquet) على دفعات مع حفظ الملف الناتج
+#
+# الصفوف تُقرأ من SQLite بـ fetchmany وتُكتب مباشرة في الملف، فلا يُبنى DataFrame
+# ولا نص CSV كامل في الذاكرة. الملف الناتج يُحفظ في EXPORT_DIR ويُعاد استخدامه
+# (التحليل المحفوظ لا يتغير بعد حفظه).
+import csv
+import os
+import threading
+
+from database import get_connection
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+
+EXPORT_DIR = 'exports'
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/octet-stream',
+}
+
+# نفس ترتيب get_analysis_details (الأعلى خطراً أولاً)
+EXPORT_QUERY = """
+    SELECT * FROM analyzed_customers
+    WHERE analysis_id = ?
+    ORDER BY churn_probability_best DESC, id
+"""
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or pyarrow is not None]
+
+
+def export_path(analysis_id, fmt):
+    return os.path.join(EXPORT_DIR, f"analysis_{int(analysis_id)}.{fmt}")
+
+
+def cached_export(analysis_id, fmt):
+    """مسار الملف إذا كان مُصدّراً من قبل، وإلا None"""
+    path = export_path(analysis_id, fmt)
+    return path if os.path.exists(path) else None
+
+
+# ========== الكتابة على دفعات ==========
+def _arrow_type(declared_type):
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return pyarrow.int64()
+    if 'REAL' in declared_type:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def _write_csv(cursor, path, chunk_size):
+    # utf-8-sig: نفس ملف to_csv(encoding='utf-8-sig') حتى يفتحه Excel بالعربية
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow([col[0] for col in cursor.description])
+        rows = 0
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return rows
+            writer.writerows(chunk)
+            rows += len(chunk)
+
+
+def _write_parquet(cursor, path, chunk_size, declared_types):
+    names = [col[0] for col in cursor.description]
+    schema = pyarrow.schema([(name, _arrow_type(declared_types.get(name))) for name in names])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            columns = list(zip(*chunk))
+            writer.write_batch(pyarrow.record_batch(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            rows += len(chunk)
+    return rows
+
+
+def write_export(analysis_id, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    تصدير تفاصيل تحليل إلى ملف (أو إرجاع الملف المحفوظ)
+
+    Parameters:
+    - analysis_id: رقم التحليل
+    - fmt: 'csv' أو 'parquet'
+    - chunk_size: عدد الصفوف المقروءة من SQLite في كل دفعة
+
+    Returns:
+    - str: مسار الملف
+
+    Raises:
+    - ValueError: صيغة غير مدعومة (أو parquet بدون pyarrow)
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"unsupported export format: {fmt}")
+    path = export_path(analysis_id, fmt)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # ملف مؤقت لكل عملية وخيط: طلبان لنفس الملف لا يكتبان فوق بعضهما
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with get_connection() as conn:
+            declared_types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(analyzed_customers)")}
+            cursor = conn.execute(EXPORT_QUERY, (analysis_id,))
+            if fmt == 'csv':
+                _write_csv(cursor, tmp_path, chunk_size)
+            else:
+                _write_parquet(cursor, tmp_path, chunk_size, declared_types)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def prune_exports():
+    """حذف ملفات التحليلات التي لم تعد موجودة (بعد delete_old_analyses)"""
+    if not os.path.isdir(EXPORT_DIR):
+        return 0
+    with get_connection() as conn:
+        ids = {row[0] for row in conn.execute("SELECT id FROM analysis_summary")}
+    removed = 0
+    for name in os.listdir(EXPORT_DIR):
+        stem = name.split('.', 1)[0]
+        if not stem.startswith('analysis_') or name.endswith('.tmp'):
+            continue
+        try:
+            analysis_id = int(stem[len('analysis_'):])
+        except ValueError:
+            continue
+        if analysis_id not in ids:
+            os.remove(os.path.join(EXPORT_DIR, name))
+            removed += 1
+    return removed
@@ -0,0 +1,186 @@
+# frame_store.py - إطارات العملاء المحللة مشتركة بين كل جلسات Streamlit (نسخة واحدة لكل ملف)
+#
+# جلسات Streamlit خيوط داخل نفس العملية، فالمصفوفات تُشارك مباشرة بدون نسخ:
+# كل عمود يُحفظ مرة واحدة كمصفوفة NumPy للقراءة فقط، وكل جلسة تحصل على DataFrame
+# مبني على نفس المصفوفات (copy=False). أي محاولة تعديل في مكانها ترفع ValueError
+# بدلاً من تغيير بيانات الجلسات الأخرى، وإضافة عمود جديد تخص نسخة الجلسة فقط.
+#
+# المفتاح = بصمة محتوى الملف + بصمة النماذج (بدون اللغة والإعدادات)، فالتسميات
+# تُحفظ كأرقام (sharded_scoring.segment_codes) ونصوص كل لغة تُبنى مرة واحدة لكل ملف.
+# كل نسخة مُعطاة تُعد مرجعاً حتى يحذفها جامع القمامة (weakref)، والملف بدون مراجع
+# يُحذف من المخزن (الأقدم استخداماً أولاً) عند تجاوز الحد.
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import FEATURE_COLUMNS
+from incremental_scoring import SCORE_COLUMNS
+from sharded_scoring import CODE_COLUMNS, segment_codes, segment_labels
+
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# الأعمدة المشتركة بين كل اللغات (بنفس ترتيب إطار الداشبورد، والتسميات بعدها)
+BASE_COLUMNS = ['Name'] + FEATURE_COLUMNS + SCORE_COLUMNS
+
+# التسميات التي تختلف نصوصها باللغة (الباقي يُبنى مرة واحدة ويُشارك بين اللغات)
+LANGUAGE_COLUMNS = ['Segment', 'Final_Label']
+
+
+def _freeze(values):
+    """نفس البيانات (بدون نسخ) للقراءة فقط: التعديل في المكان يرفع ValueError"""
+    if isinstance(values, pd.Categorical):
+        # codes تُرجع view للقراءة فقط، و Categorical المبني عليها يرفض التعديل
+        return pd.Categorical.from_codes(values.codes, dtype=values.dtype)
+    view = np.asarray(values).view()
+    view.flags.writeable = False
+    return view
+
+
+def _column_values(series):
+    return series.array if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+
+
+def _nbytes(values):
+    if isinstance(values, pd.Categorical):
+        return int(values.codes.nbytes + values.categories.memory_usage(deep=True))
+    if values.dtype == object:
+        return int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+    return int(values.nbytes)
+
+
+class FrameStore:
+    """
+    مخزن واحد على مستوى العملية لإطارات العملاء المحللة
+
+    مثال:
+        if not store.contains(key):
+            store.put(key, analyzed_df, extras={'row_hashes': hashes})
+        df = store.acquire(key, language='English')   # نسخة للقراءة فقط
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        # RLock: الإفراج (weakref.finalize) قد يحدث أثناء جمع القمامة داخل قسم مقفول في نفس الخيط
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, df, extras=None):
+        """
+        حفظ إطار محلل (ناتج analyze_scored أو ShardedScorer.analyze)
+
+        الأعمدة الرقمية تُشارك مع df بدون نسخ، والتسميات تُحفظ كأرقام int8
+
+        Parameters:
+        - key: بصمة المحتوى + النماذج
+        - df: إطار فيه BASE_COLUMNS و predicted_future_value
+        - extras: dict مصفوفات إضافية لنفس الملف (مثلاً row_hashes)
+        """
+        values = {col: _column_values(df[col]) for col in BASE_COLUMNS}
+        columns = {col: _freeze(column) for col, column in values.items()}
+        features = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        # عمود بعد عمود في الذاكرة: أرقام كل تسمية متصلة فتُبنى عليها Categorical بدون نسخ
+        codes = np.asfortranarray(segment_codes(features, df['Churn_Probability'].to_numpy(dtype=np.float64)))
+        codes.flags.writeable = False
+        entry = {
+            'columns': columns,
+            'codes': codes,
+            'predicted': _freeze(df['predicted_future_value'].to_numpy()),
+            'index': df.index,
+            'extras': {name: _freeze(value) for name, value in (extras or {}).items()},
+            # تسميات كل لغة تُبنى مرة واحدة عند أول طلب
+            'labels': {},
+            'refs': 0,
+        }
+        # الحجم يُحسب قبل التجميد (memory_usage(deep=True) لا يقبل مصفوفة object للقراءة فقط)
+        entry['nbytes'] = (sum(_nbytes(column) for column in values.values())
+                           + codes.nbytes + entry['predicted'].nbytes
+                           + sum(value.nbytes for value in entry['extras'].values()))
+        with self._lock:
+            if key in self._entries:
+                # نفس المحتوى حُسب في جلستين معاً: نحتفظ بالأول (النسخ المُعطاة منه تبقى صحيحة)
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = entry
+            self._evict()
+
+    def _labels(self, entry, language):
+        labels = entry['labels'].get(language)
+        if labels is None:
+            # Categorical تشارك أرقام entry['codes']؛ فقط الأعمدة النصية تُبنى لكل لغة
+            built = segment_labels(entry['codes'], language)
+            shared = next(iter(entry['labels'].values()), None)
+            new_columns = CODE_COLUMNS if shared is None else LANGUAGE_COLUMNS
+            labels = dict(shared or {})
+            labels.update({col: _freeze(built[col]) for col in new_columns})
+            entry['labels'][language] = labels
+            entry['nbytes'] += sum(built[col].nbytes for col in new_columns if not isinstance(built[col], pd.Categorical))
+        return labels
+
+    def acquire(self, key, language='العربية'):
+        """
+        نسخة للقراءة فقط من الإطار (نفس أعمدة analyze_scored بلغة الواجهة) أو None
+
+        الإطار يبقى في المخزن طالما توجد نسخة منه مستخدمة
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = dict(entry['columns'])
+            data.update(self._labels(entry, language))
+            data['predicted_future_value'] = entry['predicted']
+            view = pd.DataFrame(data, index=entry['index'], copy=False)
+            entry['refs'] += 1
+        weakref.finalize(view, self._release, entry)
+        return view
+
+    def extra(self, key, name):
+        """مصفوفة إضافية محفوظة مع الإطار (أو None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['extras'].get(name) if entry is not None else None
+
+    def _release(self, entry):
+        with self._lock:
+            entry['refs'] -= 1
+            self._evict()
+
+    def _evict(self):
+        # فقط الإطارات بدون نسخ مستخدمة، الأقدم استخداماً أولاً (آخر إطار يبقى دائماً كما في ScoringCache)
+        for key in list(self._entries)[:-1]:
+            if self.total_bytes() <= self.max_bytes:
+                break
+            entry = self._entries.get(key)
+            if entry is not None and entry['refs'] == 0:
+                del self._entries[key]
+
+    def total_bytes(self):
+        return sum(entry['nbytes'] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """إحصائيات المخزن للعرض في الشريط الجانبي"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'refs': sum(entry['refs'] for entry in self._entries.values()),
+                'bytes': self.total_bytes(),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -1,7 +1,8 @@
 import pandas as pd
 import random
+from data_io import load_customers, write_customers
 
-df = pd.read_excel('customers.xlsx')
+df = load_customers('customers.xlsx')
 df['churned'] = df['Purchases'].apply(lambda x: 1 if random.random() < 0.2 else 0)
-df.to_excel('customers_churn.xlsx', index=False)
-print("تم حفظ customers_churn.xlsx")
+saved = write_customers(df, 'customers_churn.xlsx')
+print(f"تم حفظ {', '.join(saved)}")
@@ -0,0 +1,119 @@
+# incremental_scoring.py - إعادة استخدام نتائج الصفوف التي لم تتغير بين رفع وآخر
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# الصف يُعتبر نفسه إذا تطابقت هذه الأعمدة
+HASH_COLUMNS = ['Name', 'Purchases', 'Total_Value', 'Visits']
+
+# نتائج النماذج المحفوظة لكل صف (بنفس أسماء أعمدة الداشبورد)
+SCORE_COLUMNS = ['Churn_Probability_RF', 'Churn_Probability_XGB', 'Churn_Probability']
+
+
+def row_hashes(df):
+    """بصمة int64 لكل صف من الأعمدة الأربعة (لا تتأثر بنوع العمود int32/int64/category)"""
+    hashes = pd.util.hash_pandas_object(df[HASH_COLUMNS], index=False).to_numpy()
+    # SQLite يخزن INTEGER كـ int64 بإشارة
+    return hashes.view(np.int64)
+
+
+def scores_fingerprint(model_hashes, **settings):
+    """
+    بصمة النماذج والإعدادات التي أنتجت النتائج
+
+    Parameters:
+    - model_hashes: dict اسم النموذج -> sha256 للملف (أو None إذا لم يوجد)
+    - settings: إعدادات أخرى تغيّر النتائج (مثلاً xgb_available)
+    """
+    parts = [f"{name}={model_hashes[name]}" for name in sorted(model_hashes)]
+    parts.extend(f"{name}={settings[name]!r}" for name in sorted(settings))
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+
+def _unique_sorted(hashes, scores):
+    """ترتيب البصمات وإزالة المكرر (الصفوف المتطابقة لها نفس النتائج)"""
+    hashes, first = np.unique(hashes, return_index=True)
+    return hashes, np.ascontiguousarray(scores[first], dtype=np.float64)
+
+
+class ScoreStore:
+    """
+    آخر إطار محلل لكل مستخدم: بصمات الصفوف ونتائجها (مرتبة للبحث السريع)
+
+    يُحتفظ بعدد محدود من المستخدمين (LRU) والباقي يُقرأ من analyzed_customers
+    """
+
+    def __init__(self, max_users=32):
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, fingerprint):
+        """(hashes, scores) لآخر تحليل بنفس النماذج أو None"""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry['fingerprint'] != fingerprint:
+                return None
+            self._entries.move_to_end(username)
+            return entry['hashes'], entry['scores']
+
+    def put(self, username, fingerprint, hashes, scores):
+        hashes, scores = _unique_sorted(np.asarray(hashes, dtype=np.int64), np.asarray(scores))
+        with self._lock:
+            self._entries[username] = {'fingerprint': fingerprint, 'hashes': hashes, 'scores': scores}
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def lookup_scores(hashes, known_hashes, known_scores):
+    """
+    البحث عن نتائج محفوظة لكل صف (known_hashes مرتبة وبدون تكرار)
+
+    Returns:
+    - (scores, found): مصفوفة (n, 3) و mask للصفوف التي وُجدت نتيجتها
+    """
+    scores = np.full((len(hashes), len(SCORE_COLUMNS)), np.nan)
+    if known_hashes is None or len(known_hashes) == 0:
+        return scores, np.zeros(len(hashes), dtype=bool)
+    position = np.searchsorted(known_hashes, hashes)
+    position = np.minimum(position, len(known_hashes) - 1)
+    found = known_hashes[position] == hashes
+    scores[found] = known_scores[position[found]]
+    return scores, found
+
+
+def incremental_scores(df, hashes, previous, score_rows):
+    """
+    حساب النتائج للصفوف الجديدة أو المتغيرة فقط ودمجها مع النتائج السابقة
+
+    Parameters:
+    - df: بيانات العملاء
+    - hashes: row_hashes(df)
+    - previous: (hashes, scores) من ScoreStore أو get_latest_scores أو None
+    - score_rows: دالة تستقبل جزء df وترجع DataFrame بأعمدة SCORE_COLUMNS
+
+    Returns:
+    - (scores DataFrame بنفس index الخاص بـ df, stats: reused / rescored)
+    """
+    known_hashes, known_scores = None, None
+    if previous is not None:
+        # النتائج القادمة من قاعدة البيانات غير مرتبة
+        known_hashes, known_scores = _unique_sorted(np.asarray(previous[0], dtype=np.int64), np.asarray(previous[1]))
+    scores, found = lookup_scores(hashes, known_hashes, known_scores)
+
+    rescored = np.flatnonzero(~found)
+    if len(rescored):
+        fresh = score_rows(df.iloc[rescored])
+        scores[rescored] = fresh[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+
+    stats = {'reused': int(found.sum()), 'rescored': int(len(rescored))}
+    return pd.DataFrame(scores, columns=SCORE_COLUMNS, index=df.index), stats
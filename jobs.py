@@ -0,0 +1,298 @@
+# jobs.py - مهام خلفية للعمليات الطويلة (تحليل ملف كبير / حفظ التحليل) بدون إيقاف واجهة Streamlit
+#
+# المهمة تُسجل في جدول jobs وتعمل في خيط منفصل عن خيط الصفحة، فإعادة تشغيل الصفحة
+# أو الانتقال لصفحة أخرى لا يوقفها. المدخلات والنتائج ونقاط التقدم تُحفظ في JOB_DIR،
+# والمهام التي لم تنتهِ (إغلاق التطبيق مثلاً) تُستأنف عند أول get_runner() من آخر دفعة محفوظة.
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import load_models, score_customers
+from database import delete_old_analyses, get_connection, save_analysis
+from exports import prune_exports
+from incremental_scoring import SCORE_COLUMNS
+from sharded_scoring import ShardedScorer, use_shards
+
+
+JOB_DIR = 'jobs'
+
+# خيطان: حفظ تحليل لا ينتظر انتهاء مهمة تحليل ملف كبير
+JOB_WORKERS = 2
+
+# عدد الصفوف في كل دفعة من مهمة التحليل (كل دفعة تُحفظ فور انتهائها)
+JOB_CHUNK_SIZE = 20_000
+
+# ملفات المهام المنتهية الأقدم من ذلك تُحذف عند بدء التشغيل
+JOB_RETENTION_DAYS = 7
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+# ========== جدول المهام ==========
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _job_file(job_id, name):
+    return os.path.join(JOB_DIR, f"job_{int(job_id)}.{name}")
+
+
+def get_job(job_id):
+    """
+    حالة مهمة
+
+    Returns:
+    - dict: id, username, kind, job_key, analysis_id, status (queued/running/done/failed),
+      progress (0-1), message, error, created_at, started_at, finished_at — أو None
+    """
+    with get_connection() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def find_job(job_key, reuse_done=True):
+    """
+    آخر مهمة بنفس المفتاح لم تفشل (قيد التنفيذ أو منتهية ونتيجتها موجودة)
+
+    reuse_done=False: المهام قيد التنفيذ فقط
+    """
+    statuses = ACTIVE_STATUSES + (('done',) if reuse_done else ())
+    with get_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT * FROM jobs
+            WHERE job_key = ? AND status IN ({', '.join('?' * len(statuses))})
+            ORDER BY id DESC
+        """, (job_key, *statuses)).fetchall()
+    for row in rows:
+        if row['status'] != 'done' or os.path.exists(_job_file(row['id'], 'result.pkl')):
+            return dict(row)
+    return None
+
+
+def _update_job(job_id, **fields):
+    assignments = ', '.join(f"{name} = ?" for name in fields)
+    with get_connection() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+
+def load_result(job_id):
+    """نتيجة مهمة منتهية (كما أرجعتها دالة المهمة)"""
+    with open(_job_file(job_id, 'result.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+def _save_pickle(path, value):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# ========== دوال المهام ==========
+def run_score_job(job_id, payload, report):
+    """
+    تحليل صفوف العملاء على دفعات؛ كل دفعة منتهية تُحفظ فلا تُعاد عند الاستئناف
+
+    الملفات الكبيرة جداً تُقسم كل دفعة منها على عدة عمليات (sharded_scoring)
+
+    payload: features (DataFrame بأعمدة FEATURE_COLUMNS), xgb_available
+    Returns: dict scores (DataFrame بأعمدة SCORE_COLUMNS بنفس ترتيب features), errors
+    """
+    features = payload['features']
+    if use_shards(len(features)):
+        scorer = ShardedScorer(xgb_available=payload.get('xgb_available'), shard_rows=JOB_CHUNK_SIZE)
+        # كل دفعة محفوظة = جزء واحد لكل عملية
+        chunk_size = JOB_CHUNK_SIZE * scorer.workers
+        score_chunk = scorer.score
+    else:
+        scorer = None
+        models = load_models(payload.get('xgb_available'))
+        chunk_size = JOB_CHUNK_SIZE
+        score_chunk = lambda part: score_customers(part, models)
+
+    starts = range(0, len(features), chunk_size)
+    parts = []
+    errors = set()
+    try:
+        for i, start in enumerate(starts):
+            # حجم الدفعة في الاسم: الاستئناف على جهاز بعدد أنوية مختلف لا يخلط الدفعات
+            part_path = _job_file(job_id, f"part{chunk_size}-{i}.npy")
+            if os.path.exists(part_path):
+                parts.append(np.load(part_path))
+            else:
+                scores, part_errors = score_chunk(features.iloc[start:start + chunk_size])
+                errors.update(part_errors)
+                values = scores[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+                np.save(part_path, values)
+                parts.append(values)
+            report((i + 1) / len(starts), f"{min(start + chunk_size, len(features)):,} / {len(features):,}")
+    finally:
+        if scorer is not None:
+            scorer.close()
+
+    values = np.concatenate(parts) if parts else np.empty((0, len(SCORE_COLUMNS)))
+    return {
+        'scores': pd.DataFrame(values, columns=SCORE_COLUMNS, index=features.index),
+        'errors': sorted(errors),
+    }
+
+
+def run_save_job(job_id, payload, report):
+    """
+    حفظ التحليل ثم حذف التحليلات القديمة وملفات تصديرها
+
+    رقم التحليل يُسجل في صف المهمة مع الحفظ نفسه، فالاستئناف بعد توقف مفاجئ
+    لا يحفظ نفس التحليل مرتين
+
+    payload: df, username, row_hashes, model_fingerprint, keep_count
+    Returns: dict analysis_id
+    """
+    analysis_id = get_job(job_id)['analysis_id']
+    if analysis_id is None:
+        report(0.1, 'save_analysis')
+        analysis_id = save_analysis(payload['df'], payload['username'],
+                                    row_hashes=payload.get('row_hashes'),
+                                    model_fingerprint=payload.get('model_fingerprint'),
+                                    job_id=job_id, raise_errors=True)
+    report(0.9, 'delete_old_analyses')
+    delete_old_analyses(payload['username'], keep_count=payload.get('keep_count', 10))
+    prune_exports()
+    return {'analysis_id': analysis_id}
+
+
+JOB_HANDLERS = {
+    'score': run_score_job,
+    'save': run_save_job,
+}
+
+
+# ========== المنفذ ==========
+class JobRunner:
+    """
+    تشغيل المهام في خيوط خلفية مع حفظ الحالة في جدول jobs
+
+    مثال:
+        job_id = get_runner().submit('score', username, {'features': X}, job_key=key)
+        get_job(job_id)['status']  # queued / running / done / failed
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+        self._lock = threading.Lock()
+        self.seconds = {}
+
+    def submit(self, kind, username, payload, job_key=None, reuse_done=True):
+        """
+        إضافة مهمة (أو إرجاع المهمة الموجودة بنفس job_key)
+
+        reuse_done=False: المهمة المنتهية بنفس المفتاح لا تمنع مهمة جديدة (فقط قيد التنفيذ)
+
+        Returns:
+        - int: رقم المهمة
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"unknown job kind: {kind}")
+        with self._lock:
+            if job_key is not None:
+                existing = find_job(job_key, reuse_done)
+                if existing is not None:
+                    return existing['id']
+            with get_connection() as conn:
+                cursor = conn.execute("""
+                    INSERT INTO jobs (username, kind, job_key, status, progress, created_at)
+                    VALUES (?, ?, ?, 'queued', 0, ?)
+                """, (username, kind, job_key, _now()))
+                conn.commit()
+                job_id = cursor.lastrowid
+            os.makedirs(JOB_DIR, exist_ok=True)
+            _save_pickle(_job_file(job_id, 'input.pkl'), payload)
+        self._executor.submit(self._run, job_id, kind)
+        return job_id
+
+    def _run(self, job_id, kind):
+        def report(progress, message=None):
+            _update_job(job_id, progress=float(progress), message=message)
+
+        start = time.perf_counter()
+        _update_job(job_id, status='running', started_at=_now())
+        try:
+            with open(_job_file(job_id, 'input.pkl'), 'rb') as f:
+                payload = pickle.load(f)
+            result = JOB_HANDLERS[kind](job_id, payload, report)
+            _save_pickle(_job_file(job_id, 'result.pkl'), result)
+        except Exception as e:
+            _update_job(job_id, status='failed', error=f"{type(e).__name__}: {e}", finished_at=_now())
+            return
+        finally:
+            self.seconds[job_id] = time.perf_counter() - start
+        _update_job(job_id, status='done', progress=1.0, finished_at=_now())
+        _remove_job_files(job_id, keep=('result.pkl',))
+
+    def resume(self):
+        """
+        إعادة تشغيل المهام التي لم تنتهِ في عملية سابقة (تكمل من آخر دفعة محفوظة)
+
+        Returns:
+        - int: عدد المهام المستأنفة
+        """
+        with get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, kind FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))}) ORDER BY id",
+                ACTIVE_STATUSES,
+            ).fetchall()
+        resumed = 0
+        for row in rows:
+            if not os.path.exists(_job_file(row['id'], 'input.pkl')):
+                _update_job(row['id'], status='failed', error='input missing', finished_at=_now())
+                continue
+            _update_job(row['id'], status='queued')
+            self._executor.submit(self._run, row['id'], row['kind'])
+            resumed += 1
+        return resumed
+
+
+def _remove_job_files(job_id, keep=()):
+    if not os.path.isdir(JOB_DIR):
+        return
+    prefix = f"job_{int(job_id)}."
+    for name in os.listdir(JOB_DIR):
+        if name.startswith(prefix) and name[len(prefix):] not in keep:
+            os.remove(os.path.join(JOB_DIR, name))
+
+
+def prune_jobs(max_age_days=JOB_RETENTION_DAYS):
+    """حذف المهام المنتهية القديمة وملفاتها"""
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+    with get_connection() as conn:
+        ids = [row[0] for row in conn.execute("""
+            SELECT id FROM jobs
+            WHERE status IN ('done', 'failed') AND finished_at < ?
+        """, (cutoff,)).fetchall()]
+        if ids:
+            conn.execute(f"DELETE FROM jobs WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            conn.commit()
+    for job_id in ids:
+        _remove_job_files(job_id)
+    return len(ids)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """المنفذ المشترك للعملية (يُنشأ ويستأنف المهام غير المنتهية عند أول استدعاء)"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+            prune_jobs()
+            _runner.resume()
+        return _runner
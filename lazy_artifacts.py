@@ -0,0 +1,78 @@
+# lazy_artifacts.py - حساب نتائج التحليل عند أول طلب فقط مع حفظها لكل ملف مرفوع
+import time
+
+from scoring_cache import estimate_nbytes
+
+
+class LazyArtifacts:
+    """
+    نتائج مشتقة تُعرّف مرة واحدة (الدالة + ما تعتمد عليه) وتُحسب عند أول وصول
+
+    memo: dict يُحفظ في الكاش لنفس الملف المرفوع، فالنتائج المحسوبة في تشغيل سابق
+    لا تُحسب مرة أخرى، والصفحات التي لا تحتاج نتيجة لا تحسبها أبداً
+
+    مثال:
+        artifacts.declare('stats', partial_stats, ['scored'])
+        artifacts['stats']  # يحسب 'scored' أولاً إن لم يكن محسوباً
+    """
+
+    def __init__(self, memo=None):
+        self.memo = memo if memo is not None else {}
+        self.timings = {}
+        self._recipes = {}
+        self._computing = set()
+
+    def declare(self, name, fn, deps=()):
+        """تعريف نتيجة: fn تُستدعى بقيم deps بنفس الترتيب"""
+        self._recipes[name] = (fn, tuple(deps))
+
+    def __getitem__(self, name):
+        if name in self.memo:
+            return self.memo[name]
+        if name not in self._recipes:
+            raise KeyError(f"unknown artifact: {name}")
+        if name in self._computing:
+            raise ValueError(f"circular dependency on artifact: {name}")
+
+        fn, deps = self._recipes[name]
+        self._computing.add(name)
+        try:
+            args = [self[dep] for dep in deps]
+            start = time.perf_counter()
+            value = fn(*args)
+            self.timings[name] = time.perf_counter() - start
+        finally:
+            self._computing.discard(name)
+        self.memo[name] = value
+        return value
+
+    def ready(self, name):
+        """هل النتيجة محسوبة بالفعل (بدون حسابها)"""
+        return name in self.memo
+
+    def lazy(self, name):
+        """دالة بدون معاملات تُرجع النتيجة عند استدعائها (لتمريرها لمكونات أخرى)"""
+        return lambda: self[name]
+
+    def computed(self):
+        """النتائج التي حُسبت في هذا التشغيل (الاسم -> الزمن بالثواني)"""
+        return dict(self.timings)
+
+    def nbytes(self, exclude=()):
+        """
+        الحجم التقريبي للنتائج المحفوظة (الكائن المشترك بين نتيجتين يُحسب مرة واحدة)
+
+        exclude: نتائج ذاكرتها محسوبة في مكان آخر (مثلاً إطار من مخزن مشترك)
+        """
+        seen = set()
+        total = 0
+        for name, value in self.memo.items():
+            if name in exclude:
+                continue
+            values = value.values() if isinstance(value, dict) else [value]
+            for item in values:
+                if id(item) in seen:
+                    continue
+                seen.add(id(item))
+                total += estimate_nbytes(item)
+        return total
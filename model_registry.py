@@ -0,0 +1,170 @@
+# model_registry.py - سجل موحد لتحميل النماذج مرة واحدة لكل عملية
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+try:
+    import gdown
+except ImportError:
+    gdown = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ============== روابط النماذج على Google Drive ==============
+MODEL_URLS = {
+    'rf_churn_model.pkl': 'https://drive.google.com/uc?id=1idlcUhdY2iEig13jnqy4QMAOUnfgw_RI&export=download',
+    'xgb_churn_model.pkl': 'https://drive.google.com/uc?id=1ZiTC5OEMWOpjp2rMoBFtCWi-gxVWnlPw&export=download',
+    'best_churn_model.pkl': 'https://drive.google.com/uc?id=1bWSqxCFri4UHeb4KP3p-try70E7nkLuq&export=download'
+}
+
+# نسخ غير مضغوطة من النماذج لتحميلها بـ mmap_mode='r'
+CACHE_DIR = 'model_cache'
+
+_models = {}
+_by_sha = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def current_rss():
+    """حجم الذاكرة المستخدمة حالياً (bytes) إن أمكن قياسه"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def file_sha256(path):
+    """بصمة SHA-256 لمحتوى ملف"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compiled_path(name):
+    """مسار النسخة المصدّرة لمحرك NumPy (tree_runtime.py) بجانب ملف النموذج"""
+    return f"{os.path.splitext(name)[0]}.compiled.joblib"
+
+
+def _load_compiled(name, sha):
+    """تحميل النسخة المصدّرة إن وُجدت وكانت مطابقة لنفس ملف النموذج"""
+    path = compiled_path(name)
+    if not os.path.exists(path):
+        return None, None
+    try:
+        compiled = joblib.load(path, mmap_mode='r')
+    except Exception:
+        return None, None
+    if getattr(compiled, 'source_sha256', None) != sha:
+        return None, None
+    return compiled, path
+
+
+def ensure_model_file(name):
+    """تنزيل ملف النموذج من Google Drive إذا لم يكن موجوداً"""
+    if os.path.exists(name):
+        return True
+    url = MODEL_URLS.get(name)
+    if url and gdown is not None:
+        try:
+            gdown.download(url, name, quiet=True)
+        except Exception:
+            pass
+    return os.path.exists(name)
+
+
+def _uncompressed_copy(path, sha):
+    """
+    إرجاع مسار نسخة joblib غير مضغوطة من النموذج (تُنشأ مرة واحدة لكل محتوى)
+
+    النسخة غير المضغوطة تسمح بتحميل مصفوفات numpy كـ memory-map للقراءة فقط
+    بحيث تتشارك عمليات السيرفر نفس صفحات الذاكرة
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(CACHE_DIR, f"{stem}-{sha[:16]}.joblib")
+    if not os.path.exists(cached):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        joblib.dump(joblib.load(path), tmp, compress=0)
+        os.replace(tmp, cached)
+    return cached
+
+
+def get_model(name):
+    """
+    تحميل النموذج مرة واحدة لكل عملية
+
+    Parameters:
+    - name: اسم ملف النموذج (مثلاً rf_churn_model.pkl)
+
+    Returns:
+    - النموذج أو None (سبب الفشل في model_stats()[name]['error'])
+    """
+    with _lock:
+        if name in _models:
+            return _models[name]
+
+        stats = {'path': name, 'loaded': False, 'error': None}
+        _stats[name] = stats
+        model = None
+
+        if not ensure_model_file(name):
+            stats['error'] = 'missing'
+            _models[name] = None
+            return None
+
+        rss_before = current_rss()
+        start = time.perf_counter()
+        try:
+            sha = file_sha256(name)
+            # ملفان بنفس المحتوى (مثلاً best و xgb) يتشاركان نفس الكائن
+            model, cached = _by_sha.get(sha, (None, None))
+            if model is None:
+                # النسخة المصدّرة (مصفوفات NumPy فقط) لا تحتاج unpickle لـ sklearn/xgboost
+                model, cached = _load_compiled(name, sha)
+                if model is None:
+                    cached = _uncompressed_copy(name, sha)
+                    model = joblib.load(cached, mmap_mode='r')
+                _by_sha[sha] = (model, cached)
+            stats.update({
+                'sha256': sha,
+                'cache_path': cached,
+                'file_bytes': os.path.getsize(cached),
+                'mmap': True,
+                'compiled': cached.endswith('.compiled.joblib'),
+                'loaded': True,
+            })
+        except Exception as e:
+            stats['error'] = str(e)
+        stats['load_seconds'] = time.perf_counter() - start
+        rss_after = current_rss()
+        stats['rss_delta_bytes'] = (rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+
+        _models[name] = model
+        return model
+
+
+def model_stats():
+    """إحصائيات التحميل لكل نموذج (الزمن، الحجم، الذاكرة، الأخطاء)"""
+    with _lock:
+        return {name: dict(stats) for name, stats in _stats.items()}
+
+
+def clear_models():
+    """تفريغ السجل (يُستخدم بعد إعادة تدريب النماذج)"""
+    with _lock:
+        _models.clear()
+        _by_sha.clear()
+        _stats.clear()
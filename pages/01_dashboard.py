@@ -3,20 +3,44 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import joblib
 import os
 import json
 import importlib
+import hashlib
 from streamlit_option_menu import option_menu
 from io import BytesIO
 from datetime import datetime, timedelta
 from chatbot import show_chatbot
 from subscriptions import show_subscription_page
 from auth import check_session, get_user_subscription, increment_usage, clear_session
+from scoring_cache import ScoringCache, fingerprint_bytes, make_cache_key
+from frame_store import FrameStore
+from model_registry import MODEL_URLS, get_model, model_stats
+from database import begin_request, connection_stats
+from ingestion import ingest_upload
+from incremental_scoring import SCORE_COLUMNS, ScoreStore, incremental_scores, row_hashes, scores_fingerprint
+from table_view import show_paged_table
+from lazy_artifacts import LazyArtifacts
+from chart_data import counts_frame, histogram_figure, histogram_frame, rate_by_group, scatter_figure
+from suggestions_engine import describe, suggestion_codes, suggestions_table
+from database import get_latest_scores
+from churn_pipeline import (ALERT_THRESHOLDS, FEATURE_COLUMNS, add_predicted_value, alerts_from_stats,
+                            analyze_scored, metrics_from_stats, partial_stats, score_customers)
+from jobs import ACTIVE_STATUSES, get_job, get_runner, load_result
+
+# صفحة العملاء المعرضين للخطر: عدد العملاء في الرسم بالأسماء، وحدود مدرج الباقين
+HIGH_RISK_TOP_N = 20
+HIGH_RISK_BINS = np.arange(70, 102.5, 2.5)
+
+# عدد الصفوف الجديدة/المتغيرة الذي يُحلل بعده الملف في مهمة خلفية بدلاً من داخل تشغيل الصفحة
+JOB_ROWS_THRESHOLD = 50_000
 
 # ============== تكوين الصفحة (يجب أن يكون الأول) ==============
 st.set_page_config(page_title="📊 Dashboard", layout="wide", initial_sidebar_state="expanded")
 
+# بداية تشغيل جديد للصفحة: تصفير عداد اتصالات قاعدة البيانات لهذا الطلب
+begin_request()
+
 # ============== التحقق من الجلسة ==============
 # تحميل الجلسة من الملف أولاً
 if 'logged_in' not in st.session_state:
@@ -46,45 +70,8 @@ if 'subscription' not in st.session_state:
 # زيادة عداد الاستخدام
 increment_usage(username)
 
-# ============== تحميل gdown ==============
-try:
-    import gdown
-except ImportError:
-    st.warning("gdown not available, using fallback")
-    gdown = None
-
-# ============== تحميل النماذج من Google Drive ==============
-MODEL_URLS = {
-    'rf_churn_model.pkl': 'https://drive.google.com/uc?id=1idlcUhdY2iEig13jnqy4QMAOUnfgw_RI&export=download',
-    'xgb_churn_model.pkl': 'https://drive.google.com/uc?id=1ZiTC5OEMWOpjp2rMoBFtCWi-gxVWnlPw&export=download',
-    'best_churn_model.pkl': 'https://drive.google.com/uc?id=1bWSqxCFri4UHeb4KP3p-try70E7nkLuq&export=download'
-}
-
-@st.cache_resource
-def load_models():
-    """تحميل النماذج من Google Drive"""
-    models = {}
-    for model_name, drive_url in MODEL_URLS.items():
-        model_path = model_name
-        if not os.path.exists(model_path):
-            st.info(f"جاري تحميل {model_name}...")
-            try:
-                if gdown:
-                    gdown.download(drive_url, model_path, quiet=True)
-                    st.success(f"✅ تم تحميل {model_name}")
-            except Exception as e:
-                st.warning(f"⚠️ خطأ في تحميل {model_name}: {e}")
-        
-        if os.path.exists(model_path):
-            try:
-                models[model_name.replace('.pkl', '')] = joblib.load(model_path)
-            except Exception as e:
-                st.error(f"❌ خطأ في فتح {model_name}: {e}")
-    
-    return models
-
-# تحميل النماذج
-models = load_models()
+# ============== تحميل النماذج (سجل موحد لكل عملية) ==============
+# model_registry يحمّل كل نموذج مرة واحدة ويُنزّله من Google Drive عند الحاجة
 
 # ============== إعداد اللغة ==============
 if 'language' not in st.session_state:
@@ -438,263 +425,27 @@ def simulate_campaign_execution(segment_name, action_details, customer_count, la
             'summary': f'Expected {expected_conversions} purchases ({conversion_rate*100:.1f}%) with estimated revenue ${expected_revenue:,.0f}'
         }
 
-# ---------------- باقي الدوال الموجودة (بدون تغيير) ----------------
-# [جميع الدوال السابقة تبقى كما هي بدون تغيير]
-# Advanced Customer Segmentation, Business Metrics, Smart Alerts, etc.
-
-# ---------------- Advanced Customer Segmentation ----------------
-def advanced_customer_segmentation(df):
-    """تقسيم العملاء متعدد الأبعاد"""
-    # تقسيم حسب القيمة
-    df['Value_Segment'] = pd.cut(df['Total_Value'], 
-                                 bins=[0, 100, 500, float('inf')], 
-                                 labels=['Low Value', 'Medium Value', 'High Value'])
-    
-    # تقسيم حسب النشاط
-    df['Activity_Segment'] = pd.cut(df['Visits'], 
-                                    bins=[0, 5, 20, float('inf')], 
-                                    labels=['Inactive', 'Active', 'Very Active'])
-    
-    # تقسيم حسب الولاء (بناءً على عدد المشتريات)
-    df['Loyalty_Segment'] = pd.cut(df['Purchases'], 
-                                   bins=[0, 2, 10, float('inf')], 
-                                   labels=['New', 'Regular', 'Loyal'])
-    
-    # تقسيم متقدم يجمع بين الأبعاد
-    conditions = [
-        (df['Total_Value'] > 500) & (df['Visits'] > 20),
-        (df['Total_Value'] > 200) & (df['Churn_Probability'] < 30),
-        (df['Churn_Probability'] > 70),
-        (df['Purchases'] == 0)
-    ]
-    choices = ['VIP Customers', 'Loyal High-Value', 'At High Risk', 'Inactive New']
-    df['Advanced_Segment'] = np.select(conditions, choices, default='Standard')
-    
-    return df
-
-# ---------------- Advanced Business Metrics ----------------
-def calculate_business_metrics(df):
-    """حساب مقاييس الأعمال المتقدمة"""
-    metrics = {}
-    
-    # معدل الاحتفاظ (تقديري)
-    repeat_customers = df[df['Purchases'] > 1].shape[0]
-    metrics['retention_rate'] = (repeat_customers / df.shape[0]) * 100 if df.shape[0] > 0 else 0
-    
-    # القيمة الدائمة للعميل (LTV) تقديرية
-    avg_purchase_value = df['Total_Value'].mean() / df['Purchases'].mean() if df['Purchases'].mean() > 0 else 0
-    avg_purchase_freq = df['Purchases'].mean()
-    customer_lifespan = 12  # تقدير بـ 12 شهر
-    metrics['ltv'] = avg_purchase_value * avg_purchase_freq * customer_lifespan
-    
-    # معدل التحويل (تقديري)
-    metrics['conversion_rate'] = (df[df['Purchases'] > 0].shape[0] / df.shape[0]) * 100 if df.shape[0] > 0 else 0
-    
-    # قيمة العميل المتوقعة
-    df['predicted_future_value'] = df['Total_Value'] * (1 - df['Churn_Probability']/100) * 1.2
-    
-    return metrics, df
-
-# ---------------- Smart Alerts System  ----------------
-def generate_smart_alerts(df):
-    """نظام التنبيهات الذكي - (نسخة معدلة تقرأ من الإعدادات)"""
-    
-    # الخطوة 1: قراءة الإعدادات من session_state أو استخدام القيم الافتراضية
-    # هذه المفاتيح (keys) هي نفسها المستخدمة في st.number_input في صفحة الإعدادات
-    risk_thresh = st.session_state.get('risk_threshold', 20)
-    inactive_thresh_pct = st.session_state.get('inactive_threshold', 10)
-    revenue_thresh_pct = st.session_state.get('revenue_threshold', 30)
-    new_customer_thresh_pct = st.session_state.get('new_customer_threshold', 40)
-
-    # الخطوة 2: تحويل النسب المئوية (مثل 10) إلى قيم عشرية (مثل 0.1) لاستخدامها في المقارنات
-    inactive_thresh = inactive_thresh_pct / 100.0
-    revenue_thresh = revenue_thresh_pct / 100.0
-    new_customer_thresh = new_customer_thresh_pct / 100.0
-    
-    alerts = []
-    
-    # === تحليل نسبة العملاء المعرضين للخطر ===
-    high_risk_count = (df['Churn_Probability'] > 70).sum()
-    high_risk_percentage = (high_risk_count / len(df)) * 100 if len(df) > 0 else 0
-    
-    # (تم التعديل) استخدام risk_thresh بدلاً من 20
-    if high_risk_percentage > risk_thresh:
-        alerts.append({
-            'type': 'danger',
-            'title': 'نسبة عالية من العملاء المعرضين للخطر' if st.session_state.language == 'العربية' else 'High Percentage of At-Risk Customers',
-            'message': f'{high_risk_percentage:.1f}% من العملاء معرضون للرحيل (الحد: {risk_thresh}%)' if st.session_state.language == 'العربية' else f'{high_risk_percentage:.1f}% of customers are at risk (Threshold: {risk_thresh}%)',
-            'priority': 'high'
-        })
-    
-    # === تحليل العملاء غير النشطين ===
-    inactive_customers = df[df['Visits'] == 0].shape[0]
-    
-    # (تم التعديل) استخدام inactive_thresh بدلاً من 0.1
-    if inactive_customers > len(df) * inactive_thresh and len(df) > 0:
-        alerts.append({
-            'type': 'warning',
-            'title': 'عدد كبير من العملاء غير النشطين' if st.session_state.language == 'العربية' else 'Large Number of Inactive Customers',
-            'message': f'{inactive_customers} عميل غير نشط (الحد: {inactive_thresh_pct}%)' if st.session_state.language == 'العربية' else f'{inactive_customers} inactive customers (Threshold: {inactive_thresh_pct}%)',
-            'priority': 'medium'
-        })
-    
-    # === تحليل القيمة المفقودة المحتملة ===
-    revenue_at_risk = df[df['Churn_Probability'] > 70]['Total_Value'].sum()
-    total_revenue = df['Total_Value'].sum()
-    
-    # (تم التعديل) استخدام revenue_thresh بدلاً من 0.3
-    if revenue_at_risk > total_revenue * revenue_thresh and total_revenue > 0:
-        alerts.append({
-            'type': 'danger',
-            'title': 'إيرادات عالية معرضة للخطر' if st.session_state.language == 'العربية' else 'High Revenue at Risk',
-            'message': f'${revenue_at_risk:,.2f} من الإيرادات معرضة للخطر (الحد: {revenue_thresh_pct}%)' if st.session_state.language == 'العربية' else f'${revenue_at_risk:,.2f} revenue at risk (Threshold: {revenue_thresh_pct}%)',
-            'priority': 'high'
-        })
-    
-    # === تحليل العملاء الجدد ===
-    new_customers = df[df['Purchases'] <= 1].shape[0]
-    
-    # (تم التعديل) استخدام new_customer_thresh بدلاً من 0.4
-    if new_customers > len(df) * new_customer_thresh and len(df) > 0:
-        alerts.append({
-            'type': 'info',
-            'title': 'تركيز عالٍ على العملاء الجدد' if st.session_state.language == 'العربية' else 'High Concentration of New Customers',
-            'message': f'فرصة لتحسين استراتيجية الاحتفاظ (الحد: {new_customer_thresh_pct}%)' if st.session_state.language == 'العربية' else f'Opportunity to improve retention strategy (Threshold: {new_customer_thresh_pct}%)',
-            'priority': 'medium'
-        })
-    
-    return sorted(alerts, key=lambda x: x['priority'], reverse=True)
-# ---------------- Hybrid suggestions function (الأصلية) ----------------
-def get_smart_suggestions(churn_prob, total_value, purchases, visits):
-    lang = st.session_state.language
-    
-    if lang == 'English':
-        suggestions = []
-        actions = []
-        priority = "Very High 🚨"
-        if churn_prob <= 30:
-            priority = "Low ✅"
-            suggestions = [
-                "✅ Customer is very loyal - maintain this level",
-                "💎 Offer periodic appreciation gifts",
-                "🎁 Simple and easy loyalty program", 
-                "📧 Send special offers to loyal customers"
-            ]
-            actions = ["Maintain", "Appreciation", "Loyalty"]
-        elif churn_prob <= 50:
-            priority = "Medium ⚠️"
-            suggestions = [
-                "⚠️ Customer is committed but should be monitored",
-                "🎯 Offer exclusive and new offers",
-                "📞 Contact to understand their needs",
-                "🚀 Suggest new products matching their history"
-            ]
-            actions = ["Monitor", "Offers", "Contact"]
-        elif churn_prob <= 70:
-            priority = "High ⚠️"
-            suggestions = [
-                "🔴 Customer showing signs of weak commitment",
-                "💰 Offer limited-time special discount (15-20%)",
-                "📞 Call personally to check satisfaction",
-                "🎁 Offer gift or extra reward",
-                "⭐ Ask for service rating for improvement"
-            ]
-            actions = ["Discount", "Call", "Improvement"]
-        else:
-            priority = "Critical 🚨"
-            suggestions = [
-                "🚨 This customer is about to leave - act now!",
-                "💰 Offer very large discount (25-30%)",
-                "📞 Call immediately - there might be a problem",
-                "🎁 Offer valuable gift or large reward",
-                "👥 Have customer service team follow up personally",
-                "📋 Ask for reasons of dissatisfaction"
-            ]
-            actions = ["Immediate Rescue", "Big Discount", "Personal Follow-up"]
-
-        ai_note = ""
-        if purchases > 5 and total_value > 500:
-            ai_note = "Suggestion: Target with VIP offers as customer has high value."
-        elif purchases == 0:
-            ai_note = "Suggestion: Reactivation campaign with welcome discount."
-
-        category = "Loyal" if churn_prob <= 30 else ("Normal" if churn_prob <= 50 else ("Medium Risk" if churn_prob <= 70 else "Very High Risk"))
-    else:
-        # Arabic version (original)
-        suggestions = []
-        actions = []
-        priority = "عالية جداً 🚨"
-        if churn_prob <= 30:
-            priority = "منخفضة ✅"
-            suggestions = [
-                "✅ العميل مخلص جداً - حافظ على هذا المستوى",
-                "💎 قدم هدايا تقديرية دورية",
-                "🎁 برنامج ولاء بسيط وسهل",
-                "📧 إرسال عروض خاصة للعملاء المخلصين"
-            ]
-            actions = ["الحفاظ", "التقدير", "الولاء"]
-        elif churn_prob <= 50:
-            priority = "متوسطة ⚠️"
-            suggestions = [
-                "⚠️ العميل ملتزم لكن يجب مراقبته",
-                "🎯 قدم له عروض حصرية وجديدة",
-                "📞 تواصل معه للتعرف على احتياجاته",
-                "🚀 اقترح منتجات جديدة تناسب تاريخه"
-            ]
-            actions = ["المراقبة", "العروض", "التواصل"]
-        elif churn_prob <= 70:
-            priority = "عالية ⚠️"
-            suggestions = [
-                "🔴 العميل بدأ يظهر علامات ضعف الالتزام",
-                "💰 قدم خصم خاص محدود الوقت (15-20%)",
-                "📞 اتصل به شخصياً للتحقق من رضاه",
-                "🎁 قدم هدية أو مكافأة إضافية",
-                "⭐ اطلب منه تقييم خدمتك للتحسين"
-            ]
-            actions = ["الخصم", "الاتصال", "التحسين"]
-        else:
-            priority = "حرجة جداً 🚨"
-            suggestions = [
-                "🚨 هذا العميل على وشب الرحيل - تصرف الآن!",
-                "💰 عرض خصم كبير جداً (25-30%)",
-                "📞 اتصل به فوراً - قد يكون هناك مشكلة",
-                "🎁 قدم هدية قيمة أو مكافأة كبيرة",
-                "👥 اجعل فريق خدمة العملاء يتابعه شخصياً",
-                "📋 اطلب منه أسباب عدم رضاه"
-            ]
-            actions = ["الإنقاذ الفوري", "الخصم الكبير", "المتابعة الشخصية"]
-
-        ai_note = ""
-        if purchases > 5 and total_value > 500:
-            ai_note = "اقتراح: استهداف بعروض VIP لأن العميل قيمة عالية."
-        elif purchases == 0:
-            ai_note = "اقتراح: حملة إعادة تفعيل مع خصم ترحيبي."
-
-        category = "مخلص" if churn_prob <= 30 else ("عادي" if churn_prob <= 50 else ("خطر متوسط" if churn_prob <= 70 else "خطر جداً"))
-
-    return {"priority": priority, "suggestions": suggestions, "actions": actions, "category": category, "ai_note": ai_note}
-
 # ---------------- Model loading with safe XGB handling ----------------
-@st.cache_resource
 def load_model_safe(path):
     """
-    تحميل النموذج مع معالجة الأخطاء ورسائل واضحة
+    تحميل النموذج من السجل الموحد مع رسائل واضحة
     """
     if not path:
         st.warning("⚠️ مسار الملف غير محدد")
         return None
-        
+
     if not os.path.exists(path):
+        with st.spinner(f"جاري تحميل {path}..."):
+            model = get_model(path)
+    else:
+        model = get_model(path)
+
+    error = model_stats().get(path, {}).get('error')
+    if error == 'missing':
         st.warning(f"📁 الملف غير موجود: {path}")
-        return None
-        
-    try:
-        model = joblib.load(path)
-        # Model loaded successfully
-        return model
-    except Exception as e:
-        st.error(f"❌ خطأ في تحميل النموذج {path}: {str(e)}")
-        return None
+    elif error:
+        st.error(f"❌ خطأ في تحميل النموذج {path}: {error}")
+    return model
 # check xgboost availability
 xgb_available = importlib.util.find_spec("xgboost") is not None
 if not xgb_available:
@@ -764,33 +515,34 @@ else:
     st.sidebar.warning("🚨 جاري إنشاء نموذج افتراضي..." if st.session_state.language == 'العربية' else "🚨 Creating fallback model...")
     best_model = create_fallback_model()
 
-# ---------------- helper: safe predict_proba ----------------
-def safe_predict_proba(model, X):
-    n = len(X)
-    if model is None:
-        return np.zeros((n, 2))
-    try:
-        proba = model.predict_proba(X)
-        proba = np.asarray(proba)
-        if proba.ndim == 1:
-            proba = np.vstack([1 - proba, proba]).T
-        if proba.shape[1] == 1:
-            proba = np.hstack([1-proba, proba])
-        return proba
-    except Exception:
-        # try predict -> map to probabilities 0/1
-        try:
-            preds = model.predict(X)
-            preds = np.asarray(preds).astype(int)
-            proba = np.zeros((n, 2))
-            proba[np.arange(n), preds] = 1
-            return proba
-        except Exception as e:
-            warning_msg = f"Model exists but failed prediction (predict/proba). Will use default values (0%). Internal error: {e}"
-            if st.session_state.language == 'العربية':
-                warning_msg = f"موديل موجود لكنه فشل في التنبؤ (predict/proba). سيتم استخدام قيم افتراضية (0%). خطأ داخلي: {e}"
-            st.warning(warning_msg)
-            return np.zeros((n, 2))
+# إحصائيات تحميل النماذج (الزمن والذاكرة)
+with st.sidebar.expander("🤖 حالة النماذج" if st.session_state.language == 'العربية' else "🤖 Model Status"):
+    for name, info in model_stats().items():
+        if info.get('loaded'):
+            rss = info.get('rss_delta_bytes')
+            rss_text = f"{rss / 1024 / 1024:.1f} MB" if rss is not None else "-"
+            engine = "NumPy" if info.get('compiled') else "pickle"
+            st.caption(f"✅ {name} ({engine}): {info['load_seconds']:.2f}s, {info['file_bytes'] / 1024 / 1024:.1f} MB mmap, RSS +{rss_text}")
+        else:
+            st.caption(f"❌ {name}: {info.get('error')}")
+
+# اتصالات قاعدة البيانات (المفتوحة في هذا التشغيل مقابل المعاد استخدامها)
+with st.sidebar.expander("🗄️ اتصالات قاعدة البيانات" if st.session_state.language == 'العربية' else "🗄️ Database Connections"):
+    db_stats = connection_stats()
+    request = db_stats['request']
+    if st.session_state.language == 'العربية':
+        st.caption(f"هذا التشغيل: {request['checkouts']} استخدام، {request['opened']} اتصال جديد")
+        st.caption(f"الإجمالي: {db_stats['opened']} مفتوح، {db_stats['reused']} معاد استخدامه، {db_stats['idle']} خامل")
+    else:
+        st.caption(f"This run: {request['checkouts']} checkouts, {request['opened']} new connections")
+        st.caption(f"Total: {db_stats['opened']} opened, {db_stats['reused']} reused, {db_stats['idle']} idle")
+
+# ---------------- helper: prediction warning ----------------
+def show_prediction_warning(error):
+    warning_msg = f"Model exists but failed prediction (predict/proba). Will use default values (0%). Internal error: {error}"
+    if st.session_state.language == 'العربية':
+        warning_msg = f"موديل موجود لكنه فشل في التنبؤ (predict/proba). سيتم استخدام قيم افتراضية (0%). خطأ داخلي: {error}"
+    st.warning(warning_msg)
 
 # ---------------- sample template helpers ----------------
 def make_sample_df():
@@ -903,88 +655,231 @@ if st.sidebar.button("🚪 تسجيل الخروج" if st.session_state.get('lan
     # --- (نهاية التعديل) ---
 
 # ---------------- File uploader ----------------
-uploaded_file = st.file_uploader(get_text('upload_file'), type=["xlsx", "csv"])
+uploaded_file = st.file_uploader(get_text('upload_file'), type=["xlsx", "csv", "parquet", "feather"])
 
 if not uploaded_file:
-    info_msg = "📁 Upload .xlsx file with columns: Name, Purchases, Total_Value, Visits. You can download a template for testing." if st.session_state.language == 'English' else "📁 قم برفع ملف .xlsx يحتوي الأعمدة: Name, Purchases, Total_Value, Visits. يمكنك تنزيل قالب للتجربة."
+    # صفحات لا تحتاج ملف العملاء
+    if page == get_text('subscriptions'):
+        show_subscription_page()
+        st.stop()
+    if page == get_text('live_support'):
+        show_chatbot()
+        st.stop()
+    info_msg = "📁 Upload an .xlsx, .csv, .parquet or .feather file with columns: Name, Purchases, Total_Value, Visits. You can download a template for testing." if st.session_state.language == 'English' else "📁 قم برفع ملف .xlsx أو .csv أو .parquet أو .feather يحتوي الأعمدة: Name, Purchases, Total_Value, Visits. يمكنك تنزيل قالب للتجربة."
     st.info(info_msg)
     st.stop()
 
-# ---------------- Read and validate data ----------------
-try:
-    # (هذا هو التعديل)
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
-        
-except Exception as e:
-    st.error(f"Failed to read file: {e}" if st.session_state.language == 'English' else f"فشل قراءة الملف: {e}")
-    st.stop()
+# ---------------- Scoring pipeline ----------------
+def score_rows(df):
+    """تشغيل النماذج على صفوف العملاء وإرجاع نسب الرحيل الثلاث (مع البدائل عند غياب نموذج)"""
+    # ---------------- Compute probabilities with safe fallback for XGB ----------------
+    scores, errors = score_customers(df, {
+        'rf': rf_model,
+        'xgb': xgb_model if xgb_available else None,
+        'best': best_model,
+    })
+    for error in errors:
+        show_prediction_warning(error)
+    return scores
+
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id, text):
+    """شريط تقدم المهمة؛ يعيد تشغيل الصفحة عند انتهائها"""
+    job = get_job(job_id)
+    if job is None or job['status'] in ('done', 'failed'):
+        st.rerun()
+    st.progress(job['progress'], text=f"{text} {job['message'] or ''}")
+
+
+def score_rows_in_background(df):
+    """
+    الصفوف الكثيرة تُحلل في مهمة خلفية (jobs.py): الصفحة تعرض التقدم وتتوقف بدلاً من الانتظار،
+    والمهمة تكمل حتى لو انتقل المستخدم لصفحة أخرى ثم تُستخدم نتيجتها عند العودة
+    """
+    if len(df) < JOB_ROWS_THRESHOLD:
+        return score_rows(df)
+
+    # نفس الصفوف ونفس النماذج = نفس المهمة (إعادة التشغيل لا تبدأ مهمة جديدة)
+    job_key = f"score:{model_fingerprint}:{hashlib.sha1(row_hashes(df).tobytes()).hexdigest()}"
+    job_id = get_runner().submit('score', st.session_state.username,
+                                 {'features': df[FEATURE_COLUMNS], 'xgb_available': xgb_available},
+                                 job_key=job_key)
+    job = get_job(job_id)
+    if job['status'] == 'done':
+        result = load_result(job_id)
+        for error in result['errors']:
+            show_prediction_warning(error)
+        return result['scores']
+    if job['status'] == 'failed':
+        st.error(f"Analysis failed: {job['error']}" if st.session_state.language == 'English' else f"فشل التحليل: {job['error']}")
+        st.stop()
 
-required_cols = ["Name", "Purchases", "Total_Value", "Visits"]
-missing_cols = [c for c in required_cols if c not in df.columns]
-if missing_cols:
-    error_msg = f"File missing columns: {', '.join(missing_cols)}" if st.session_state.language == 'English' else f"الملف مفقود الأعمدة التالية: {', '.join(missing_cols)}"
-    st.error(error_msg)
+    show_job_progress(job_id, f"⏳ Analyzing {len(df):,} customers in the background..." if st.session_state.language == 'English' else f"⏳ جاري تحليل {len(df):,} عميل في الخلفية...")
     st.stop()
 
-df['Purchases'] = pd.to_numeric(df['Purchases'], errors='coerce').fillna(0).astype(int)
-df['Total_Value'] = pd.to_numeric(df['Total_Value'], errors='coerce').fillna(0.0)
-df['Visits'] = pd.to_numeric(df['Visits'], errors='coerce').fillna(0).astype(int)
-df['Name'] = df['Name'].astype(str)
 
-success_msg = f"File loaded successfully: {uploaded_file.name}" if st.session_state.language == 'English' else f"تم تحميل الملف: {uploaded_file.name}"
-st.success(success_msg)
+def alert_thresholds():
+    """حدود التنبيهات من صفحة الإعدادات (أو القيم الافتراضية)"""
+    return {key: st.session_state.get(key, default) for key, default in ALERT_THRESHOLDS.items()}
 
-feature_cols = ['Purchases', 'Total_Value', 'Visits']
-X_input = df[feature_cols]
 
-# ---------------- Compute probabilities with safe fallback for XGB ----------------
-df['Churn_Probability_RF'] = safe_predict_proba(rf_model, X_input)[:, 1] * 100
+def load_upload(file_bytes, file_name):
+    """قراءة الملف المرفوع والتحقق من الأعمدة (يتوقف التشغيل مع رسالة عند الخطأ)"""
+    try:
+        # الأعمدة الأربعة فقط وبأنواع مضغوطة (calamine / pyarrow إن وُجدا)
+        df, ingest_report = ingest_upload(file_bytes, file_name)
+    except Exception as e:
+        st.error(f"Failed to read file: {e}" if st.session_state.language == 'English' else f"فشل قراءة الملف: {e}")
+        st.stop()
 
-if xgb_available and xgb_model is not None:
-    df['Churn_Probability_XGB'] = safe_predict_proba(xgb_model, X_input)[:, 1] * 100
-else:
-    # fallback: use RF as substitute and inform user
-    df['Churn_Probability_XGB'] = df['Churn_Probability_RF']
-    if not xgb_available:
-        st.info("XGBoost not installed; using Random Forest results as substitute for display." if st.session_state.language == 'English' else "XGBoost غير منصب؛ تم استخدام نتيجة Random Forest كبديل للعرض.")
-    elif xgb_model is None:
-        st.info("XGBoost model file (xgb_churn_model.pkl) not found or corrupted; using Random Forest as temporary substitute." if st.session_state.language == 'English' else "ملف نموذج XGBoost (xgb_churn_model.pkl) غير موجود أو تالف؛ تم استخدام Random Forest كبديل مؤقت.")
+    missing_cols = ingest_report['missing_columns']
+    if missing_cols:
+        error_msg = f"File missing columns: {', '.join(missing_cols)}" if st.session_state.language == 'English' else f"الملف مفقود الأعمدة التالية: {', '.join(missing_cols)}"
+        st.error(error_msg)
+        st.stop()
+    return {'df': df, 'report': ingest_report}
 
-if best_model is not None:
-    df['Churn_Probability'] = safe_predict_proba(best_model, X_input)[:, 1] * 100
-else:
-    # if no best model, use average of RF and XGB as a simple ensemble
-    df['Churn_Probability'] = ((df['Churn_Probability_RF'] + df['Churn_Probability_XGB']) / 2.0)
 
-for col in ['Churn_Probability_RF', 'Churn_Probability_XGB', 'Churn_Probability']:
-    df[col] = df[col].clip(0, 100)
+def score_upload(upload, hashes):
+    """النماذج تعمل فقط على الصفوف الجديدة أو المتغيرة منذ آخر رفع لهذا المستخدم"""
+    # نتائج آخر رفع لهذا المستخدم (من الذاكرة أو من آخر تحليل محفوظ)
+    score_store = get_score_store()
+    previous = score_store.get(st.session_state.username, model_fingerprint)
+    if previous is None:
+        previous = get_latest_scores(st.session_state.username, model_fingerprint)
 
-# ---------------- Additional columns ----------------
-if st.session_state.language == 'English':
-    df['Segment'] = pd.cut(df['Churn_Probability'], bins=[-1,30,70,100], labels=["Loyal","Medium","At Risk"])
-    df['Final_Label'] = df['Churn_Probability'].apply(lambda x: '✅ Loyal' if x <= 30 else ('⚠️ Medium' if x <= 70 else '🚨 At Risk'))
-else:
-    df['Segment'] = pd.cut(df['Churn_Probability'], bins=[-1,30,70,100], labels=["مخلص","متوسط","معرض"])
-    df['Final_Label'] = df['Churn_Probability'].apply(lambda x: '✅ مخلص' if x <= 30 else ('⚠️ متوسط' if x <= 70 else '🚨 معرض للرحيل'))
+    scores, incremental = incremental_scores(upload['df'], hashes, previous, score_rows_in_background)
+    score_store.put(st.session_state.username, model_fingerprint, hashes, scores[SCORE_COLUMNS].to_numpy())
+    return {'scores': scores, 'incremental': incremental}
 
-# ---------------- تطبيق الميزات الجديدة ----------------
-# تقسيم العملاء المتقدم
-df = advanced_customer_segmentation(df)
 
-# حساب مقاييس الأعمال المتقدمة
-business_metrics, df = calculate_business_metrics(df)
+def analyze_upload(upload, scoring):
+    """نسب الرحيل + القيمة المتوقعة (التسميات والشرائح تُحسب في مخزن الإطارات كأرقام)"""
+    df = pd.concat([upload['df'], scoring['scores'][SCORE_COLUMNS]], axis=1, copy=False)
+    return add_predicted_value(df)
 
-# توليد التنبيهات
-alerts = generate_smart_alerts(df)
 
-high_risk = df[df['Churn_Probability'] > 70]
+def shared_customers(artifacts, frame_key):
+    """
+    إطار العملاء المحلل من المخزن المشترك: أي جلسة حللت نفس الملف بنفس النماذج
+    (بأي لغة أو إعدادات) تعطي نفس المصفوفات، وإلا يُحلل الملف ويُضاف للمخزن
+    """
+    frame_store = get_frame_store()
+    customers = frame_store.acquire(frame_key, st.session_state.language)
+    if customers is None:
+        df = analyze_upload(artifacts['upload'], artifacts['scores'])
+        frame_store.put(frame_key, df, extras={'row_hashes': artifacts['row_hashes']})
+        customers = frame_store.acquire(frame_key, st.session_state.language)
+        if customers is None:
+            # أُخرج من المخزن قبل أخذ نسخة منه (مخزن ممتلئ بإطارات مستخدمة)
+            customers = analyze_scored(df, st.session_state.language)
+    return customers
+
+
+def shared_row_hashes(artifacts, frame_key):
+    """بصمات الصفوف من المخزن المشترك (بدون قراءة الملف) أو من الملف المرفوع"""
+    hashes = get_frame_store().extra(frame_key, 'row_hashes')
+    return hashes if hashes is not None else row_hashes(artifacts['upload']['df'])
+
+
+def campaign_stats(df):
+    """أعداد الشرائح ومتوسط الرحيل لكل شريحة لصفحة التسويق الآلي"""
+    by_segment = df.groupby('Advanced_Segment', sort=False)['Churn_Probability'].agg(['size', 'mean'])
+    return {
+        'segment_counts': df['Advanced_Segment'].value_counts(),
+        'segments': by_segment,
+        'inactive': int((df['Visits'] == 0).sum()),
+    }
+
+
+def build_artifacts(memo, file_bytes, file_name, frame_key):
+    """
+    تعريف نتائج التحليل وما تعتمد عليه (تُحسب عند أول طلب من الصفحة فقط)
+
+    customers (مخزن الإطارات) -> high_risk / campaign_stats / suggestion_codes
+              -> stats -> business_metrics / alerts
+    upload -> row_hashes -> scores: فقط إذا لم يكن الملف في مخزن الإطارات
+    """
+    artifacts = LazyArtifacts(memo)
+    artifacts.declare('upload', lambda: load_upload(file_bytes, file_name))
+    artifacts.declare('row_hashes', lambda: shared_row_hashes(artifacts, frame_key))
+    artifacts.declare('scores', score_upload, ['upload', 'row_hashes'])
+    artifacts.declare('customers', lambda: shared_customers(artifacts, frame_key))
+    artifacts.declare('stats', partial_stats, ['customers'])
+    artifacts.declare('business_metrics', metrics_from_stats, ['stats'])
+    artifacts.declare('alerts', lambda stats: alerts_from_stats(stats, st.session_state.language, **alert_thresholds()), ['stats'])
+    artifacts.declare('high_risk', lambda df: df[df['Churn_Probability'] > 70], ['customers'])
+    artifacts.declare('campaign_stats', campaign_stats, ['customers'])
+    artifacts.declare('suggestion_codes', suggestion_codes, ['customers'])
+    return artifacts
+
+
+@st.cache_resource
+def get_scoring_cache():
+    """كاش مشترك على مستوى العملية للنتائج المحللة (LRU)"""
+    return ScoringCache(max_entries=8, max_bytes=512 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_frame_store():
+    """إطارات العملاء المحللة مشتركة بين كل الجلسات (نسخة واحدة لكل ملف ونماذج)"""
+    return FrameStore(max_bytes=1024 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_score_store():
+    """آخر نتائج لكل مستخدم (بصمة الصف -> النسب) لإعادة التحليل التدريجي"""
+    return ScoreStore()
+
+
+# بصمة النماذج الحالية: النتائج المحفوظة صالحة فقط لنفس ملفات النماذج
+model_fingerprint = scores_fingerprint(
+    {name: info.get('sha256') for name, info in model_stats().items()},
+    xgb_available=xgb_available,
+    fallback=rf_model is None and xgb_model is None,
+)
+
+
+# مفتاح الكاش: محتوى الملف + بصمات النماذج + الإعدادات المؤثرة على النتيجة
+file_bytes = uploaded_file.getvalue()
+cache_key = make_cache_key(
+    file_bytes,
+    list(MODEL_URLS.keys()),
+    {
+        'language': st.session_state.language,
+        'xgb_available': xgb_available,
+        **alert_thresholds(),
+    }
+)
+# مفتاح مخزن الإطارات: المحتوى + النماذج فقط (الإطار نفسه لا يتغير باللغة أو الحدود)
+frame_key = f"{fingerprint_bytes(file_bytes)}:{model_fingerprint}"
+scoring_cache = get_scoring_cache()
+# نتائج هذا الملف: تبدأ فارغة وتمتلئ بما تطلبه الصفحات المفتوحة فقط
+memo = scoring_cache.get(cache_key)
+from_cache = memo is not None
+if memo is None:
+    memo = {}
+    scoring_cache.put(cache_key, memo, nbytes=0)
+artifacts = build_artifacts(memo, file_bytes, uploaded_file.name, frame_key)
+
+# تُملأ بعد عرض الصفحة بحسب ما حسبته الصفحة من النتائج
+status_placeholder = st.empty()
+diagnostics_placeholder = st.sidebar.empty()
+
+if not (xgb_available and xgb_model is not None):
+    # inform user about the RF substitute used for XGB
+    if not xgb_available:
+        st.info("XGBoost not installed; using Random Forest results as substitute for display." if st.session_state.language == 'English' else "XGBoost غير منصب؛ تم استخدام نتيجة Random Forest كبديل للعرض.")
+    elif xgb_model is None:
+        st.info("XGBoost model file (xgb_churn_model.pkl) not found or corrupted; using Random Forest as temporary substitute." if st.session_state.language == 'English' else "ملف نموذج XGBoost (xgb_churn_model.pkl) غير موجود أو تالف؛ تم استخدام Random Forest كبديل مؤقت.")
 
 # ---------------- Pages ----------------
 # Dashboard
 if page == get_text('dashboard'):
+    df = artifacts['customers']
+    business_metrics = artifacts['business_metrics']
+    alerts = artifacts['alerts']
     st.title("Dashboard - KPIs" if st.session_state.language == 'English' else "لوحة القيادة - KPIs")
     
     # عرض التنبيهات أولاً
@@ -1036,8 +931,7 @@ if page == get_text('dashboard'):
     
     with col1:
         # توزيع الشرائح
-        pie_data = df['Segment'].value_counts().reset_index()
-        pie_data.columns = ['Segment', 'count']
+        pie_data = counts_frame(df['Segment'])
         
         if st.session_state.language == 'English':
             color_map = {"Loyal":"#31c48d","Medium":"#60a5fa","At Risk":"#f87171"}
@@ -1053,8 +947,7 @@ if page == get_text('dashboard'):
     
     with col2:
         # توزيع الشرائح المتقدمة
-        advanced_segment_data = df['Advanced_Segment'].value_counts().reset_index()
-        advanced_segment_data.columns = ['Segment', 'count']
+        advanced_segment_data = counts_frame(df['Advanced_Segment'])
         
         fig2 = px.bar(advanced_segment_data, x='Segment', y='count', 
                        title="Advanced Customer Segments" if st.session_state.language == 'English' else "الشرائح المتقدمة للعملاء",
@@ -1083,31 +976,49 @@ if page == get_text('dashboard'):
     st.divider()
     st.write("### 💾 حفظ التحليل" if st.session_state.language == 'العربية' else "### 💾 Save Analysis")
 
+    save_job = get_job(st.session_state.save_job_id) if st.session_state.get('save_job_id') else None
+    saving = save_job is not None and save_job['status'] in ACTIVE_STATUSES
+
     col1, col2 = st.columns([3, 1])
     with col1:
         st.info("احفظ هذا التحليل لمراجعته لاحقاً من صفحة 'سجل التحليلات'" if st.session_state.language == 'العربية' else "Save this analysis to review it later from 'Analysis History' page")
     with col2:
         button_text = "💾 حفظ التحليل" if st.session_state.language == 'العربية' else "💾 Save Analysis"
-        if st.button(button_text, type="primary", use_container_width=True):
-            with st.spinner("جاري حفظ التحليل..." if st.session_state.language == 'العربية' else "Saving analysis..."):
-                from database import save_analysis, delete_old_analyses
-                
-                analysis_id = save_analysis(df, st.session_state.username)
-                
-                if analysis_id:
-                    success_msg = f"✅ تم حفظ التحليل بنجاح! (رقم #{analysis_id})" if st.session_state.language == 'العربية' else f"✅ Analysis saved successfully! (ID #{analysis_id})"
-                    st.success(success_msg)
-                    st.session_state.last_analysis_saved = True
-                    
-                    delete_old_analyses(st.session_state.username, keep_count=10)
-                else:
-                    error_msg = "❌ فشل حفظ التحليل" if st.session_state.language == 'العربية' else "❌ Failed to save analysis"
-                    st.error(error_msg)
+        # الزر معطل أثناء الحفظ: الضغط مرتين لا يحفظ نفس التحليل مرتين
+        if st.button(button_text, type="primary", use_container_width=True, disabled=saving):
+            # الحفظ (وحذف التحليلات القديمة) في مهمة خلفية: الصفحة لا تنتظر الكتابة في قاعدة البيانات
+            # نفس المستخدم + نفس الملف والنماذج = نفس المهمة طالما لم تنتهِ
+            st.session_state.save_job_id = get_runner().submit('save', st.session_state.username, {
+                'df': df,
+                'username': st.session_state.username,
+                'row_hashes': artifacts['row_hashes'],
+                'model_fingerprint': model_fingerprint,
+                'keep_count': 10,
+            }, job_key=f"save:{st.session_state.username}:{frame_key}", reuse_done=False)
+            st.rerun()
+
+    if save_job is not None:
+        if save_job['status'] in ('done', 'failed'):
+            # الرسالة تظهر مرة واحدة بعد انتهاء الحفظ
+            del st.session_state.save_job_id
+        if save_job['status'] == 'done':
+            analysis_id = load_result(save_job['id'])['analysis_id']
+            success_msg = f"✅ تم حفظ التحليل بنجاح! (رقم #{analysis_id})" if st.session_state.language == 'العربية' else f"✅ Analysis saved successfully! (ID #{analysis_id})"
+            st.success(success_msg)
+            st.session_state.last_analysis_saved = True
+        elif save_job['status'] == 'failed':
+            error_msg = "❌ فشل حفظ التحليل" if st.session_state.language == 'العربية' else "❌ Failed to save analysis"
+            st.error(f"{error_msg}: {save_job['error']}" if save_job['error'] else error_msg)
+        else:
+            show_job_progress(save_job['id'], "جاري حفظ التحليل..." if st.session_state.language == 'العربية' else "Saving analysis...")
     
     # ========== نهاية الإضافة ========== ⬆️⬆️⬆️
 
 # Marketing Automation Page - الصفحة الجديدة# Marketing Automation Page
 elif page == get_text('marketing_automation'):
+    df = artifacts['customers']
+    business_metrics = artifacts['business_metrics']
+    campaign = artifacts['campaign_stats']
     st.header(get_text('marketing_automation_title'))
     
     tab1, tab2, tab3 = st.tabs([
@@ -1131,7 +1042,7 @@ elif page == get_text('marketing_automation'):
         st.info("🤖 الإجراءات الآلية الموصى بها لكل شريحة عملاء" if st.session_state.language == 'العربية' else "🤖 Automated actions recommended for each customer segment")
         
         # عرض الإجراءات الآلية لكل شريحة
-        segment_stats = df['Advanced_Segment'].value_counts()
+        segment_stats = campaign['segment_counts']
         
         for segment in segment_stats.index:
             customer_count = segment_stats[segment]
@@ -1188,8 +1099,8 @@ elif page == get_text('marketing_automation'):
         
         # توصية بناءً على تحليل البيانات
         total_customers = len(df)
-        high_risk_count = len(high_risk)
-        inactive_customers = len(df[df['Visits'] == 0])
+        high_risk_count = len(artifacts['high_risk'])
+        inactive_customers = campaign['inactive']
         
         recommendations = []
         
@@ -1227,10 +1138,9 @@ elif page == get_text('marketing_automation'):
         # توصيات مخصصة بناءً على الشرائح
         st.subheader("🎯 توصيات مخصصة للشرائح" if st.session_state.language == 'العربية' else "🎯 Customized segment recommendations")
         
-        for segment in df['Advanced_Segment'].unique():
-            segment_data = df[df['Advanced_Segment'] == segment]
-            segment_size = len(segment_data)
-            avg_churn = segment_data['Churn_Probability'].mean()
+        for segment, segment_row in campaign['segments'].iterrows():
+            segment_size = int(segment_row['size'])
+            avg_churn = segment_row['mean']
             
             if segment_size > 0:
                 col1, col2 = st.columns([3, 1])
@@ -1248,13 +1158,13 @@ elif page == get_text('marketing_automation'):
         if 'campaign_history' in st.session_state and st.session_state.campaign_history:
             st.success("📊 سجل الحملات المنفذة" if st.session_state.language == 'العربية' else "📊 Campaign execution history")
             
-            for campaign in reversed(st.session_state.campaign_history[-5:]):  # آخر 5 حملات
+            for sent_campaign in reversed(st.session_state.campaign_history[-5:]):  # آخر 5 حملات
                 st.markdown(f"""
                 <div class="campaign-card">
-                    <h4>🎯 حملة {campaign['segment']}</h4>
-                    <p><strong>الإجراء:</strong> {campaign['action']}</p>
-                    <p><strong>الوقت:</strong> {campaign['timestamp']}</p>
-                    <p><strong>النتائج:</strong> {campaign['results']['summary']}</p>
+                    <h4>🎯 حملة {sent_campaign['segment']}</h4>
+                    <p><strong>الإجراء:</strong> {sent_campaign['action']}</p>
+                    <p><strong>الوقت:</strong> {sent_campaign['timestamp']}</p>
+                    <p><strong>النتائج:</strong> {sent_campaign['results']['summary']}</p>
                 </div>
                 """, unsafe_allow_html=True)
         else:
@@ -1265,8 +1175,8 @@ elif page == get_text('marketing_automation'):
         
         if 'campaign_history' in st.session_state and st.session_state.campaign_history:
             total_campaigns = len(st.session_state.campaign_history)
-            total_expected_revenue = sum([campaign['results']['expected_revenue'] for campaign in st.session_state.campaign_history])
-            total_expected_conversions = sum([campaign['results']['expected_conversions'] for campaign in st.session_state.campaign_history])
+            total_expected_revenue = sum([sent_campaign['results']['expected_revenue'] for sent_campaign in st.session_state.campaign_history])
+            total_expected_conversions = sum([sent_campaign['results']['expected_conversions'] for sent_campaign in st.session_state.campaign_history])
             
             col1, col2, col3 = st.columns(3)
             col1.metric("🔄 عدد الحملات", total_campaigns)
@@ -1275,11 +1185,11 @@ elif page == get_text('marketing_automation'):
             
             # رسم بياني لأداء الحملات
             campaign_data = []
-            for campaign in st.session_state.campaign_history:
+            for sent_campaign in st.session_state.campaign_history:
                 campaign_data.append({
-                    'Campaign': campaign['segment'],
-                    'Expected Revenue': campaign['results']['expected_revenue'],
-                    'Expected Conversions': campaign['results']['expected_conversions']
+                    'Campaign': sent_campaign['segment'],
+                    'Expected Revenue': sent_campaign['results']['expected_revenue'],
+                    'Expected Conversions': sent_campaign['results']['expected_conversions']
                 })
             
             if campaign_data:
@@ -1292,41 +1202,70 @@ elif page == get_text('marketing_automation'):
             st.info("📊 ستظهر إحصائيات الأداء هنا بعد تنفيذ الحملات الأولى." if st.session_state.language == 'العربية' else "📊 Performance statistics will appear here after executing the first campaigns.")
 # الدعم الفوري - أضف هذا السطر هنا مباشرة بعد التسويق الآلي
 elif page == get_text('live_support'):
-    show_chatbot(df, business_metrics, alerts)
+    # البيانات تُحسب فقط عند الضغط على سؤال عن البيانات
+    show_chatbot(artifacts.lazy('customers'), artifacts.lazy('business_metrics'), artifacts.lazy('alerts'))
 # باقي الصفحات تبقى كما هي بدون تغيير
 # [High risk customers, Smart suggestions, Data page, Advanced Analytics, Alerts System, Model comparison]
 # ... (جميع الصفحات الأخرى تبقى كما هي بدون أي تغيير) ...
 
 # High risk customers
 elif page == get_text('high_risk'):
+    high_risk = artifacts['high_risk']
     st.header(get_text('high_risk_title'))
     risk_msg = get_text('risk_customers_found').format(len(high_risk))
     st.info(risk_msg)
     
     if len(high_risk) > 0:
-        title = "Most Risky Customers" if st.session_state.language == 'English' else "العملاء الأكثر خطورة"
-        fig = px.bar(high_risk, x="Name", y="Churn_Probability",
+        english = st.session_state.language == 'English'
+        ranked = high_risk.sort_values('Churn_Probability', ascending=False, kind='stable')
+
+        # الرسم لأعلى N عميل فقط، والباقي كمدرج مجمّع على السيرفر (عدد ثابت من الأعمدة)
+        title = f"Most Risky Customers (Top {HIGH_RISK_TOP_N})" if english else f"العملاء الأكثر خطورة (أعلى {HIGH_RISK_TOP_N})"
+        fig = px.bar(ranked.head(HIGH_RISK_TOP_N), x="Name", y="Churn_Probability",
                      color="Churn_Probability", color_continuous_scale=["#f87171", "#fdba74"],
                      title=title)
         st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-        
-        for _, r in high_risk.iterrows():
-            with st.expander(f"👤 {r['Name']} — {r['Churn_Probability']:.1f}% — {r['Advanced_Segment']}"):
-                st.metric("Churn Probability" if st.session_state.language == 'English' else "احتمال الرحيل", f"{r['Churn_Probability']:.1f}%")
-                st.write(f"- Purchases: {int(r['Purchases'])}" if st.session_state.language == 'English' else f"- المشتريات: {int(r['Purchases'])}")
-                st.write(f"- Total Value: {r['Total_Value']:.2f}" if st.session_state.language == 'English' else f"- القيمة الإجمالية: {r['Total_Value']:.2f}")
-                st.write(f"- Visits: {int(r['Visits'])}" if st.session_state.language == 'English' else f"- الزيارات: {int(r['Visits'])}")
-                st.write(f"- Segment: {r['Advanced_Segment']}" if st.session_state.language == 'English' else f"- الشريحة: {r['Advanced_Segment']}")
-                
-                suggestions_data = get_smart_suggestions(
-                    r['Churn_Probability'], 
-                    r['Total_Value'], 
-                    r['Purchases'], 
-                    r['Visits']
-                )
+
+        rest = ranked['Churn_Probability'].iloc[HIGH_RISK_TOP_N:].to_numpy(dtype=np.float64)
+        if len(rest):
+            hist = histogram_frame(rest, bins=HIGH_RISK_BINS)
+            bins = pd.DataFrame({'range': [f"{lo:g}–{hi:g}%" for lo, hi in zip(hist['start'], hist['end'])], 'count': hist['count']})
+            title = f"Remaining {len(rest):,} customers by churn probability" if english else f"باقي العملاء ({len(rest):,}) حسب احتمال الرحيل"
+            fig = px.bar(bins, x='range', y='count', title=title,
+                         labels={'range': 'Churn Probability' if english else 'احتمال الرحيل',
+                                 'count': 'Customers' if english else 'عدد العملاء'})
+            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+        # جدول مقسم لصفحات، والتفاصيل تُبنى للعميل المختار فقط (بدل expander لكل عميل)
+        labels = ({'Name': 'Name', 'Churn_Probability': 'Churn Probability', 'Purchases': 'Purchases',
+                   'Total_Value': 'Total Value', 'Visits': 'Visits', 'Advanced_Segment': 'Segment'}
+                  if english else
+                  {'Name': 'الاسم', 'Churn_Probability': 'احتمال الرحيل', 'Purchases': 'المشتريات',
+                   'Total_Value': 'القيمة الإجمالية', 'Visits': 'الزيارات', 'Advanced_Segment': 'الشريحة'})
+        page_index = show_paged_table(high_risk, list(labels), labels, key='high_risk',
+                                      percent_columns=['Churn_Probability'], sort_column='Churn_Probability',
+                                      category_column='Advanced_Segment', page_size=25)
+
+        if len(page_index):
+            selected = st.selectbox(
+                "Customer details" if english else "تفاصيل العميل", list(page_index),
+                format_func=lambda i: f"👤 {high_risk.at[i, 'Name']} — {high_risk.at[i, 'Churn_Probability']:.1f}%",
+                key='high_risk_customer',
+            )
+            r = high_risk.loc[selected]
+            codes = artifacts['suggestion_codes'].loc[selected]
+            with st.container(border=True):
+                st.markdown(f"#### 👤 {r['Name']} — {r['Advanced_Segment']}")
+                st.metric("Churn Probability" if english else "احتمال الرحيل", f"{r['Churn_Probability']:.1f}%")
+                st.write(f"- Purchases: {int(r['Purchases'])}" if english else f"- المشتريات: {int(r['Purchases'])}")
+                st.write(f"- Total Value: {r['Total_Value']:.2f}" if english else f"- القيمة الإجمالية: {r['Total_Value']:.2f}")
+                st.write(f"- Visits: {int(r['Visits'])}" if english else f"- الزيارات: {int(r['Visits'])}")
+                st.write(f"- Segment: {r['Advanced_Segment']}" if english else f"- الشريحة: {r['Advanced_Segment']}")
+
+                suggestions_data = describe(codes['Suggestion_Tier'], codes['AI_Note'], st.session_state.language)
                 for i, s in enumerate(suggestions_data['suggestions'], 1):
                     st.markdown(f"- **{i}.** {s}")
-                    
+
                 if suggestions_data['ai_note']:
                     st.info(suggestions_data['ai_note'])
     else:
@@ -1334,17 +1273,14 @@ elif page == get_text('high_risk'):
 
 # Smart suggestions
 elif page == get_text('suggestions'):
+    df = artifacts['customers']
     st.header(get_text('smart_suggestions'))
     selected_customer = st.selectbox(get_text('select_customer'), df['Name'].tolist())
     
     if selected_customer:
         customer = df[df['Name'] == selected_customer].iloc[0]
-        suggestions_data = get_smart_suggestions(
-            float(customer['Churn_Probability']), 
-            float(customer['Total_Value']), 
-            int(customer['Purchases']), 
-            int(customer['Visits'])
-        )
+        codes = artifacts['suggestion_codes'].loc[customer.name]
+        suggestions_data = describe(codes['Suggestion_Tier'], codes['AI_Note'], st.session_state.language)
         
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("👤 Name" if st.session_state.language == 'English' else "👤 الاسم", customer['Name'])
@@ -1372,36 +1308,44 @@ elif page == get_text('suggestions'):
         for i, action in enumerate(suggestions_data['actions'], 1):
             st.write(f"**{i}. {action}**")
 
+    st.divider()
+    export = suggestions_table(df, artifacts['suggestion_codes'], st.session_state.language)
+    st.download_button("📥 Download suggestions for all customers (CSV)" if st.session_state.language == 'English' else "📥 تنزيل اقتراحات كل العملاء (CSV)",
+                       data=export.to_csv(index=False, encoding="utf-8-sig"),
+                       file_name="customer_suggestions.csv",
+                       key="download_suggestions")
+
 # Data page
 elif page == get_text('customer_data'):
+    df = artifacts['customers']
     st.header(get_text('customer_data_title'))
     view = st.radio("Choose view method:" if st.session_state.language == 'English' else "اختر طريقة العرض:", 
                   get_text('view_options'), horizontal=True)
     
+    # الجدول يبقى رقمياً: البحث والترتيب والتقسيم على السيرفر والتنسيق للصفحة المعروضة فقط
     if view == get_text('view_options')[0]:  # Best model result
-        show_df = df[['Name','Purchases','Total_Value','Visits','Churn_Probability', 'Advanced_Segment']].copy()
-        show_df['Churn_Probability'] = show_df['Churn_Probability'].apply(lambda x: f"{x:.1f}%")
-        
         if st.session_state.language == 'English':
-            show_df.columns = ['Name', 'Purchases', 'Value', 'Visits', 'Churn Probability', 'Advanced Segment']
+            labels = {'Name': 'Name', 'Purchases': 'Purchases', 'Total_Value': 'Value', 'Visits': 'Visits',
+                      'Churn_Probability': 'Churn Probability', 'Advanced_Segment': 'Advanced Segment'}
         else:
-            show_df.columns = ['الاسم', 'المشتريات', 'القيمة', 'الزيارات', 'احتمال الرحيل', 'الشريحة المتقدمة']
-            
-        st.dataframe(show_df, width='stretch')
+            labels = {'Name': 'الاسم', 'Purchases': 'المشتريات', 'Total_Value': 'القيمة', 'Visits': 'الزيارات',
+                      'Churn_Probability': 'احتمال الرحيل', 'Advanced_Segment': 'الشريحة المتقدمة'}
+        show_paged_table(df, list(labels), labels, key='data_best', percent_columns=['Churn_Probability'],
+                         category_column='Advanced_Segment')
         
     elif view == get_text('view_options')[1]:  # Three models comparison
-        show_df = df[['Name','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability', 'Advanced_Segment']].copy()
-        show_df['Difference'] = abs(show_df['Churn_Probability_RF'] - show_df['Churn_Probability_XGB'])
-        
-        for col in ['Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability','Difference']:
-            show_df[col] = show_df[col].apply(lambda x: f"{x:.1f}%")
+        show_df = df[['Name','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability', 'Advanced_Segment']]
+        show_df = show_df.assign(Difference=(show_df['Churn_Probability_RF'] - show_df['Churn_Probability_XGB']).abs())
             
         if st.session_state.language == 'English':
-            show_df.columns = ['Name', 'Random Forest', 'XGBoost', 'Best', 'Advanced Segment', 'Difference']
+            labels = {'Name': 'Name', 'Churn_Probability_RF': 'Random Forest', 'Churn_Probability_XGB': 'XGBoost',
+                      'Churn_Probability': 'Best', 'Advanced_Segment': 'Advanced Segment', 'Difference': 'Difference'}
         else:
-            show_df.columns = ['الاسم', 'Random Forest', 'XGBoost', 'الأفضل', 'الشريحة المتقدمة', 'الفرق']
-            
-        st.dataframe(show_df, width='stretch')
+            labels = {'Name': 'الاسم', 'Churn_Probability_RF': 'Random Forest', 'Churn_Probability_XGB': 'XGBoost',
+                      'Churn_Probability': 'الأفضل', 'Advanced_Segment': 'الشريحة المتقدمة', 'Difference': 'الفرق'}
+        show_paged_table(show_df, list(labels), labels, key='data_models',
+                         percent_columns=['Churn_Probability_RF', 'Churn_Probability_XGB', 'Churn_Probability', 'Difference'],
+                         category_column='Advanced_Segment')
         
         st.write("#### Model Comparison Chart (First 10 Customers)" if st.session_state.language == 'English' else "#### رسم بياني للمقارنة (أول 10 عملاء)")
         top_df = df.head(10)
@@ -1413,21 +1357,18 @@ elif page == get_text('customer_data'):
         st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
         
     else:  # Full advanced details
-        show_df = df.copy()
+        # Final_Label هو نفس التصنيف النهائي بلغة الواجهة
         if st.session_state.language == 'English':
-            show_df['Classification'] = show_df['Churn_Probability'].apply(lambda x: '✅ Loyal' if x <= 30 else ('⚠️ Medium' if x <= 70 else '🚨 At Risk'))
-            show_df_display = show_df[['Name','Purchases','Total_Value','Visits','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability','Advanced_Segment','Classification']].copy()
-            for col in ['Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability']:
-                show_df_display[col] = show_df_display[col].apply(lambda x: f"{x:.1f}%")
-            show_df_display.columns = ['Name', 'Purchases', 'Value', 'Visits', 'RF %', 'XGB %', 'Best %', 'Advanced Segment', 'Final Classification']
+            labels = {'Name': 'Name', 'Purchases': 'Purchases', 'Total_Value': 'Value', 'Visits': 'Visits',
+                      'Churn_Probability_RF': 'RF %', 'Churn_Probability_XGB': 'XGB %', 'Churn_Probability': 'Best %',
+                      'Advanced_Segment': 'Advanced Segment', 'Final_Label': 'Final Classification'}
         else:
-            show_df['تصنيف'] = show_df['Churn_Probability'].apply(lambda x: '✅ مخلص' if x <= 30 else ('⚠️ متوسط' if x <= 70 else '🚨 معرض للرحيل'))
-            show_df_display = show_df[['Name','Purchases','Total_Value','Visits','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability','Advanced_Segment','تصنيف']].copy()
-            for col in ['Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability']:
-                show_df_display[col] = show_df_display[col].apply(lambda x: f"{x:.1f}%")
-            show_df_display.columns = ['الاسم', 'المشتريات', 'القيمة', 'الزيارات', 'RF %', 'XGB %', 'الأفضل %', 'الشريحة المتقدمة', 'التصنيف النهائي']
-            
-        st.dataframe(show_df_display, width='stretch')
+            labels = {'Name': 'الاسم', 'Purchases': 'المشتريات', 'Total_Value': 'القيمة', 'Visits': 'الزيارات',
+                      'Churn_Probability_RF': 'RF %', 'Churn_Probability_XGB': 'XGB %', 'Churn_Probability': 'الأفضل %',
+                      'Advanced_Segment': 'الشريحة المتقدمة', 'Final_Label': 'التصنيف النهائي'}
+        show_paged_table(df, list(labels), labels, key='data_full',
+                         percent_columns=['Churn_Probability_RF', 'Churn_Probability_XGB', 'Churn_Probability'],
+                         category_column='Advanced_Segment')
 
 # Advanced Analytics Page
 elif page == get_text('advanced_analytics'):
@@ -1435,6 +1376,8 @@ elif page == get_text('advanced_analytics'):
         st.warning('⚠️ التحليلات المتقدمة حصرية لباقة VIP!' if st.session_state.language == 'العربية' else '⚠️ Advanced Analytics exclusive to VIP!')
         st.info('👑 قم بالترقية لـ VIP' if st.session_state.language == 'العربية' else '👑 Upgrade to VIP')
         st.stop()
+    df = artifacts['customers']
+    business_metrics = artifacts['business_metrics']
     st.header(get_text('advanced_analytics_title'))
     
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -1488,24 +1431,21 @@ elif page == get_text('advanced_analytics'):
         
         with col1:
             # توزيع القيم
-            fig = px.histogram(df, x='Total_Value', nbins=20, 
-                               title="توزيع قيم العملاء" if st.session_state.language == 'العربية' else "Customer Value Distribution")
+            fig = histogram_figure(df['Total_Value'], x_label='Total_Value',
+                                   title="توزيع قيم العملاء" if st.session_state.language == 'العربية' else "Customer Value Distribution")
             st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
         
         with col2:
             # علاقة الزيارات بالمشتريات
-            fig = px.scatter(df, x='Visits', y='Purchases', color='Advanced_Segment',
-                             title="العلاقة بين الزيارات والمشتريات" if st.session_state.language == 'العربية' else "Visits vs Purchases Relationship")
+            fig = scatter_figure(df, x='Visits', y='Purchases', color='Advanced_Segment',
+                                 title="العلاقة بين الزيارات والمشتريات" if st.session_state.language == 'العربية' else "Visits vs Purchases Relationship")
             st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
     
     with tab3:
         st.subheader(get_text('retention_analysis'))
         
         # تحليل الاحتفاظ حسب الشرائح
-        retention_by_segment = df.groupby('Advanced_Segment').apply(
-            lambda x: (x[x['Purchases'] > 1].shape[0] / x.shape[0]) * 100
-        ).reset_index()
-        retention_by_segment.columns = ['Segment', 'Retention Rate']
+        retention_by_segment = rate_by_group(df, 'Advanced_Segment', df['Purchases'] > 1, rate_name='Retention Rate')
         
         fig = px.bar(retention_by_segment, x='Segment', y='Retention Rate',
                      title="معدل الاحتفاظ حسب الشريحة" if st.session_state.language == 'العربية' else "Retention Rate by Segment")
@@ -1524,8 +1464,8 @@ elif page == get_text('advanced_analytics'):
         st.subheader(get_text('lifetime_value'))
         
         # توزيع LTV
-        fig = px.histogram(df, x='predicted_future_value', nbins=20,
-                           title="توزيع القيمة الدائمة للعملاء" if st.session_state.language == 'العربية' else "Customer Lifetime Value Distribution")
+        fig = histogram_figure(df['predicted_future_value'], x_label='predicted_future_value',
+                               title="توزيع القيمة الدائمة للعملاء" if st.session_state.language == 'العربية' else "Customer Lifetime Value Distribution")
         st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
         
         # أفضل 10 عملاء من حيث القيمة المستقبلية
@@ -1535,6 +1475,7 @@ elif page == get_text('advanced_analytics'):
 
 # Alerts System Page
 elif page == get_text('alerts_system'):
+    alerts = artifacts['alerts']
     st.header(get_text('alerts_title'))
     
     tab1, tab2 = st.tabs([get_text('active_alerts'), get_text('alert_settings')])
@@ -1608,27 +1549,69 @@ elif page == get_text('model_comparison'):
         st.info('🚀 قم بالترقية للوصول لهذه الميزة' if st.session_state.language == 'العربية' else '🚀 Upgrade to access this feature')
         st.stop()
 
+    df = artifacts['customers']
     st.header(get_text('model_comparison_title'))
     st.info(get_text('model_comparison_desc'))
     
-    cmp_df = df[['Name','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability', 'Advanced_Segment']].copy()
-    cmp_df['Diff'] = (cmp_df['Churn_Probability_RF'] - cmp_df['Churn_Probability_XGB']).abs()
-    cmp_df = cmp_df.sort_values('Diff', ascending=False).head(50)
-    cmp_df_display = cmp_df.copy()
-    
-    for col in ['Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability','Diff']:
-        cmp_df_display[col] = cmp_df_display[col].apply(lambda x: f"{x:.1f}%")
+    cmp_df = df[['Name','Churn_Probability_RF','Churn_Probability_XGB','Churn_Probability', 'Advanced_Segment']]
+    cmp_df = cmp_df.assign(Diff=(cmp_df['Churn_Probability_RF'] - cmp_df['Churn_Probability_XGB']).abs())
     
     if st.session_state.language == 'English':
-        cmp_df_display.columns = ['Name', 'RF %', 'XGB %', 'Best %', 'Advanced Segment', 'Difference']
+        labels = {'Name': 'Name', 'Churn_Probability_RF': 'RF %', 'Churn_Probability_XGB': 'XGB %',
+                  'Churn_Probability': 'Best %', 'Advanced_Segment': 'Advanced Segment', 'Diff': 'Difference'}
         review_note = "### Review highest differences and check training data/model features."
     else:
-        cmp_df_display.columns = ['الاسم', 'RF %', 'XGB %', 'الأفضل %', 'الشريحة المتقدمة', 'الفرق']
+        labels = {'Name': 'الاسم', 'Churn_Probability_RF': 'RF %', 'Churn_Probability_XGB': 'XGB %',
+                  'Churn_Probability': 'الأفضل %', 'Advanced_Segment': 'الشريحة المتقدمة', 'Diff': 'الفرق'}
         review_note = "### راجع أعلى الاختلافات وتحقق من بيانات التدريب/مزايا النماذج."
     
-    st.dataframe(cmp_df_display, width='stretch')
+    # الصفحة الأولى = أعلى 50 اختلافاً (كما كان)، وباقي الحالات في الصفحات التالية
+    show_paged_table(cmp_df, list(labels), labels, key='model_cmp',
+                     percent_columns=['Churn_Probability_RF', 'Churn_Probability_XGB', 'Churn_Probability', 'Diff'],
+                     sort_column='Diff', descending=True, category_column='Advanced_Segment')
     st.write(review_note)
 
 # صفحة الاشتراكات
 elif page == get_text('subscriptions'):
     show_subscription_page()
+
+# ---------------- حالة الملف المرفوع (بعد عرض الصفحة) ----------------
+if artifacts.ready('upload') or artifacts.ready('customers'):
+    with status_placeholder.container():
+        success_msg = f"File loaded successfully: {uploaded_file.name}" if st.session_state.language == 'English' else f"تم تحميل الملف: {uploaded_file.name}"
+        st.success(success_msg)
+        incremental = artifacts['scores']['incremental'] if artifacts.ready('scores') else {'reused': 0}
+        if incremental['reused']:
+            st.caption(f"♻️ Reused results for {incremental['reused']:,} unchanged rows, rescored {incremental['rescored']:,} new/changed rows" if st.session_state.language == 'English' else f"♻️ تم إعادة استخدام نتائج {incremental['reused']:,} صف لم يتغير، وتحليل {incremental['rescored']:,} صف جديد/متغير")
+        elif not artifacts.ready('upload'):
+            st.caption("♻️ Same file already analyzed in another session; using the shared results" if st.session_state.language == 'English' else "♻️ نفس الملف محلل في جلسة أخرى؛ تم استخدام النتائج المشتركة")
+
+    # تشخيص قراءة الملف (الزمن والذاكرة والأنواع)
+    with diagnostics_placeholder.container():
+        with st.expander("🧾 تشخيص قراءة الملف" if st.session_state.language == 'العربية' else "🧾 Upload Diagnostics"):
+            if artifacts.ready('upload'):
+                ingest_report = artifacts['upload']['report']
+                peak = ingest_report['peak_bytes']
+                peak_text = f"{peak / 1024 / 1024:.1f} MB" if peak is not None else "-"
+                if st.session_state.language == 'العربية':
+                    st.caption(f"المحرك: {ingest_report['engine']}{' (من الكاش)' if from_cache else ''}")
+                    st.caption(f"الصفوف: {ingest_report['rows']:,} — الزمن: {ingest_report['seconds']:.2f}s")
+                    st.caption(f"ذروة الذاكرة: +{peak_text} — حجم الجدول: {ingest_report['memory_bytes'] / 1024 / 1024:.1f} MB")
+                else:
+                    st.caption(f"Engine: {ingest_report['engine']}{' (cached)' if from_cache else ''}")
+                    st.caption(f"Rows: {ingest_report['rows']:,} — Time: {ingest_report['seconds']:.2f}s")
+                    st.caption(f"Peak memory: +{peak_text} — Table size: {ingest_report['memory_bytes'] / 1024 / 1024:.1f} MB")
+                st.caption(", ".join(f"{col}: {dtype}" for col, dtype in ingest_report['dtypes'].items()))
+            store_stats = get_frame_store().stats()
+            if st.session_state.language == 'العربية':
+                st.caption(f"مخزن الإطارات المشترك: {store_stats['entries']} ملف، {store_stats['refs']} نسخة مستخدمة، {store_stats['bytes'] / 1024 / 1024:.1f} MB")
+            else:
+                st.caption(f"Shared frame store: {store_stats['entries']} files, {store_stats['refs']} views in use, {store_stats['bytes'] / 1024 / 1024:.1f} MB")
+            computed = artifacts.computed()
+            if computed:
+                st.caption(("محسوب في هذا التشغيل: " if st.session_state.language == 'العربية' else "Computed this run: ")
+                           + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in computed.items()))
+
+# تحديث حجم النتائج في الكاش بعد ما أضافته هذه الصفحة (الإطار المشترك محسوب في مخزن الإطارات)
+if artifacts.computed():
+    scoring_cache.put(cache_key, memo, nbytes=artifacts.nbytes(exclude=('customers',)))
@@ -1,7 +1,9 @@
 # pages/02_analysis_history.py
 import streamlit as st
 import pandas as pd
-from database import get_user_analyses, get_analysis_details
+import plotly.express as px
+from database import get_analysis_page, get_analysis_segments, get_analysis_trends, get_user_analyses
+from exports import EXPORT_FORMATS, available_formats, cached_export, write_export
 from auth import check_session
 
 
@@ -30,94 +32,186 @@ if not analyses:
     st.stop()
 
 
-# عرض عدد التحليلات
-st.write(f"**عدد التحليلات المحفوظة:** {len(analyses)}" if st.session_state.language == 'العربية' else f"**Number of saved analyses:** {len(analyses)}")
+trends_tab, list_tab = st.tabs([
+    "📈 الاتجاهات" if st.session_state.language == 'العربية' else "📈 Trends",
+    "📜 التحليلات" if st.session_state.language == 'العربية' else "📜 Analyses",
+])
 
 
-# عرض التحليلات
-for analysis in analyses:
-    with st.expander(
-        f"📊 التحليل #{analysis['id']} - {analysis['analysis_date']} ({analysis['total_customers']} عميل)" 
-        if st.session_state.language == 'العربية' 
-        else f"📊 Analysis #{analysis['id']} - {analysis['analysis_date']} ({analysis['total_customers']} customers)"
-    ):
-        # الإحصائيات الرئيسية
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric(
-                "إجمالي العملاء" if st.session_state.language == 'العربية' else "Total Customers",
-                analysis['total_customers']
+# ========== الاتجاهات (من الملخصات اليومية/الأسبوعية) ==========
+with trends_tab:
+    period_options = ['يومي', 'أسبوعي'] if st.session_state.language == 'العربية' else ['Daily', 'Weekly']
+    period = st.radio(
+        "الفترة" if st.session_state.language == 'العربية' else "Period",
+        period_options,
+        horizontal=True
+    )
+    trends = get_analysis_trends(username, 'day' if period == period_options[0] else 'week')
+    
+    if st.session_state.language == 'العربية':
+        labels = {'period_start': 'التاريخ', 'avg_churn_probability': 'متوسط احتمال الرحيل (%)',
+                  'revenue_at_risk': 'إيرادات معرضة للخطر', 'retention_rate': 'معدل الاحتفاظ (%)'}
+    else:
+        labels = {'period_start': 'Date', 'avg_churn_probability': 'Avg Churn Probability (%)',
+                  'revenue_at_risk': 'Revenue at Risk', 'retention_rate': 'Retention Rate (%)'}
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("عدد الفترات" if st.session_state.language == 'العربية' else "Periods", len(trends))
+    col2.metric("عدد التحليلات" if st.session_state.language == 'العربية' else "Analyses", int(trends['analyses'].sum()))
+    col3.metric("العملاء المحللون" if st.session_state.language == 'العربية' else "Customers Analyzed", f"{int(trends['total_customers'].sum()):,}")
+    
+    for column in ['avg_churn_probability', 'revenue_at_risk', 'retention_rate']:
+        fig = px.line(trends, x='period_start', y=column, markers=True, labels=labels, title=labels[column])
+        st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    
+    st.caption(
+        "قيم الفترة التي فيها أكثر من تحليل: المتوسط مرجح بعدد العملاء، والإيرادات المعرضة للخطر متوسط التحليلات"
+        if st.session_state.language == 'العربية' else
+        "Periods with several analyses: averages are weighted by customers; revenue at risk is the mean per analysis"
+    )
+
+
+# ========== تفاصيل تحليل واحد ==========
+DETAIL_PAGE_SIZE = 10
+
+
+def show_customer_details(analysis_id):
+    """
+    عملاء التحليل مرتبين من الأعلى خطراً، صفحة بصفحة من SQL (keyset)
+    
+    الملف الكامل يُقرأ فقط عند طلب التحميل
+    """
+    arabic = st.session_state.language == 'العربية'
+    st.write("### تفاصيل العملاء المحللين" if arabic else "### Analyzed Customers Details")
+    
+    segments = get_analysis_segments(analysis_id)
+    all_label = "الكل" if arabic else "All"
+    choice = st.selectbox("الشريحة" if arabic else "Segment", [all_label] + list(segments),
+                          key=f"details_segment_{analysis_id}")
+    segment = None if choice == all_label else choice
+    total = sum(segments.values()) if segment is None else segments.get(segment, 0)
+    
+    # بداية كل صفحة تمت زيارتها: (churn_probability_best, id) لآخر صف قبلها
+    state_key = f"details_cursors_{analysis_id}"
+    cursors = st.session_state.get(state_key)
+    if cursors is None or cursors['segment'] != segment:
+        cursors = st.session_state[state_key] = {'segment': segment, 'after': [None]}
+    
+    # صف إضافي لمعرفة وجود صفحة تالية
+    page = get_analysis_page(analysis_id, DETAIL_PAGE_SIZE + 1, cursors['after'][-1], segment)
+    has_next = len(page) > DETAIL_PAGE_SIZE
+    page = page.head(DETAIL_PAGE_SIZE)
+    page_number = len(cursors['after'])
+    
+    if page_number == 1:
+        st.write(f"**أعلى {DETAIL_PAGE_SIZE} عملاء معرضين للخطر:**" if arabic else f"**Top {DETAIL_PAGE_SIZE} At-Risk Customers:**")
+    
+    table = page.drop(columns=['id'])
+    if arabic:
+        table.columns = ['الاسم', 'المشتريات', 'القيمة', 'الزيارات', 'احتمال الرحيل', 'الشريحة']
+    else:
+        table.columns = ['Name', 'Purchases', 'Value', 'Visits', 'Churn Probability', 'Segment']
+    st.dataframe(table, width='stretch')
+    
+    def next_page():
+        last = page.iloc[-1]
+        cursors['after'].append((float(last['churn_probability_best']), int(last['id'])))
+    
+    def previous_page():
+        cursors['after'].pop()
+    
+    pages = max(1, -(-total // DETAIL_PAGE_SIZE))
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("⬅️ السابق" if arabic else "⬅️ Previous", key=f"details_prev_{analysis_id}",
+                disabled=page_number == 1, on_click=previous_page)
+    col2.caption(f"صفحة {page_number} من {pages} ({total:,} عميل)" if arabic else f"Page {page_number} of {pages} ({total:,} customers)")
+    col3.button("التالي ➡️" if arabic else "Next ➡️", key=f"details_next_{analysis_id}",
+                disabled=not has_next, on_click=next_page)
+    
+    # تحميل التفاصيل الكاملة: الملف يُكتب من SQLite على دفعات عند الطلب فقط ويُحفظ على القرص
+    col1, col2 = st.columns([1, 3])
+    fmt = col1.selectbox("الصيغة" if arabic else "Format", available_formats(),
+                         format_func=str.upper, key=f"details_format_{analysis_id}")
+    path = cached_export(analysis_id, fmt)
+    if path is None and col2.button("📄 تجهيز ملف التفاصيل الكاملة" if arabic else "📄 Prepare Full Details File",
+                                    key=f"prepare_details_{analysis_id}"):
+        with st.spinner("جاري تجهيز الملف..." if arabic else "Preparing file..."):
+            path = write_export(analysis_id, fmt)
+    if path is not None:
+        with open(path, 'rb') as f:
+            col2.download_button(
+                "📥 تحميل التفاصيل الكاملة" if arabic else "📥 Download Full Details",
+                data=f,
+                file_name=f"analysis_{analysis_id}_details.{fmt}",
+                mime=EXPORT_FORMATS[fmt],
+                key=f"download_details_{analysis_id}"  # ✅ أضفت key فريد
             )
+
+
+# ========== آخر التحليلات ==========
+with list_tab:
+    # عرض عدد التحليلات
+    st.write(f"**عدد التحليلات المحفوظة:** {len(analyses)}" if st.session_state.language == 'العربية' else f"**Number of saved analyses:** {len(analyses)}")
+
+
+    # عرض التحليلات
+    for analysis in analyses:
+        with st.expander(
+            f"📊 التحليل #{analysis['id']} - {analysis['analysis_date']} ({analysis['total_customers']} عميل)" 
+            if st.session_state.language == 'العربية' 
+            else f"📊 Analysis #{analysis['id']} - {analysis['analysis_date']} ({analysis['total_customers']} customers)"
+        ):
+            # الإحصائيات الرئيسية
+            col1, col2, col3, col4 = st.columns(4)
         
-        with col2:
-            high_risk_pct = (analysis['high_risk_count'] / analysis['total_customers'] * 100) if analysis['total_customers'] > 0 else 0
-            st.metric(
-                "معرضون للخطر" if st.session_state.language == 'العربية' else "At Risk",
-                analysis['high_risk_count'],
-                f"{high_risk_pct:.1f}%"
-            )
+            with col1:
+                st.metric(
+                    "إجمالي العملاء" if st.session_state.language == 'العربية' else "Total Customers",
+                    analysis['total_customers']
+                )
         
-        with col3:
-            st.metric(
-                "متوسط احتمال الرحيل" if st.session_state.language == 'العربية' else "Avg Churn Probability",
-                f"{analysis['avg_churn_probability']:.1f}%"
-            )
+            with col2:
+                high_risk_pct = (analysis['high_risk_count'] / analysis['total_customers'] * 100) if analysis['total_customers'] > 0 else 0
+                st.metric(
+                    "معرضون للخطر" if st.session_state.language == 'العربية' else "At Risk",
+                    analysis['high_risk_count'],
+                    f"{high_risk_pct:.1f}%"
+                )
         
-        with col4:
-            st.metric(
-                "إيرادات معرضة للخطر" if st.session_state.language == 'العربية' else "Revenue at Risk",
-                f"${analysis['revenue_at_risk']:,.0f}"
-            )
+            with col3:
+                st.metric(
+                    "متوسط احتمال الرحيل" if st.session_state.language == 'العربية' else "Avg Churn Probability",
+                    f"{analysis['avg_churn_probability']:.1f}%"
+                )
         
-        st.divider()
+            with col4:
+                st.metric(
+                    "إيرادات معرضة للخطر" if st.session_state.language == 'العربية' else "Revenue at Risk",
+                    f"${analysis['revenue_at_risk']:,.0f}"
+                )
         
-        # معلومات إضافية
-        col1, col2, col3 = st.columns(3)
+            st.divider()
         
-        with col1:
-            st.write(f"**{'متوسط قيمة العميل' if st.session_state.language == 'العربية' else 'Avg Customer Value'}:** ${analysis['avg_customer_value']:,.2f}")
-            st.write(f"**{'متوسط المشتريات' if st.session_state.language == 'العربية' else 'Avg Purchases'}:** {analysis['avg_purchases']:.1f}")
+            # معلومات إضافية
+            col1, col2, col3 = st.columns(3)
         
-        with col2:
-            st.write(f"**{'عملاء خطر منخفض' if st.session_state.language == 'العربية' else 'Low Risk Customers'}:** {analysis['low_risk_count']}")
-            st.write(f"**{'عملاء خطر متوسط' if st.session_state.language == 'العربية' else 'Medium Risk Customers'}:** {analysis['medium_risk_count']}")
+            with col1:
+                st.write(f"**{'متوسط قيمة العميل' if st.session_state.language == 'العربية' else 'Avg Customer Value'}:** ${analysis['avg_customer_value']:,.2f}")
+                st.write(f"**{'متوسط المشتريات' if st.session_state.language == 'العربية' else 'Avg Purchases'}:** {analysis['avg_purchases']:.1f}")
         
-        with col3:
-            if analysis['retention_rate']:
-                st.write(f"**{'معدل الاحتفاظ' if st.session_state.language == 'العربية' else 'Retention Rate'}:** {analysis['retention_rate']:.1f}%")
-            if analysis['predicted_future_value']:
-                st.write(f"**{'القيمة المستقبلية' if st.session_state.language == 'العربية' else 'Future Value'}:** ${analysis['predicted_future_value']:,.0f}")
+            with col2:
+                st.write(f"**{'عملاء خطر منخفض' if st.session_state.language == 'العربية' else 'Low Risk Customers'}:** {analysis['low_risk_count']}")
+                st.write(f"**{'عملاء خطر متوسط' if st.session_state.language == 'العربية' else 'Medium Risk Customers'}:** {analysis['medium_risk_count']}")
         
-        # زر لعرض التفاصيل
-        if st.button(
-            f"عرض تفاصيل العملاء" if st.session_state.language == 'العربية' else f"View Customer Details", 
-            key=f"details_{analysis['id']}"
-        ):
-            st.write("### تفاصيل العملاء المحللين" if st.session_state.language == 'العربية' else "### Analyzed Customers Details")
-            
-            details_df = get_analysis_details(analysis['id'])
-            
-            # عرض أعلى 10 عملاء معرضين للخطر
-            st.write("**أعلى 10 عملاء معرضين للخطر:**" if st.session_state.language == 'العربية' else "**Top 10 At-Risk Customers:**")
-            top_risk = details_df.head(10)[[
-                'customer_name', 'purchases', 'total_value', 
-                'visits', 'churn_probability_best', 'advanced_segment'
-            ]].copy()
-            
-            if st.session_state.language == 'العربية':
-                top_risk.columns = ['الاسم', 'المشتريات', 'القيمة', 'الزيارات', 'احتمال الرحيل', 'الشريحة']
-            else:
-                top_risk.columns = ['Name', 'Purchases', 'Value', 'Visits', 'Churn Probability', 'Segment']
-            
-            st.dataframe(top_risk, use_container_width=True)
-            
-            # زر لتحميل التفاصيل الكاملة
-            csv = details_df.to_csv(index=False, encoding='utf-8-sig')
-            st.download_button(
-                "📥 تحميل التفاصيل الكاملة (CSV)" if st.session_state.language == 'العربية' else "📥 Download Full Details (CSV)",
-                data=csv,
-                file_name=f"analysis_{analysis['id']}_details.csv",
-                mime="text/csv",
-                key=f"download_details_{analysis['id']}"  # ✅ أضفت key فريد
-            )
+            with col3:
+                if analysis['retention_rate']:
+                    st.write(f"**{'معدل الاحتفاظ' if st.session_state.language == 'العربية' else 'Retention Rate'}:** {analysis['retention_rate']:.1f}%")
+                if analysis['predicted_future_value']:
+                    st.write(f"**{'القيمة المستقبلية' if st.session_state.language == 'العربية' else 'Future Value'}:** ${analysis['predicted_future_value']:,.0f}")
+        
+            # التفاصيل تُقرأ من قاعدة البيانات صفحة بصفحة عند فتحها فقط
+            if st.toggle(
+                f"عرض تفاصيل العملاء" if st.session_state.language == 'العربية' else f"View Customer Details", 
+                key=f"details_{analysis['id']}"
+            ):
+                show_customer_details(analysis['id'])
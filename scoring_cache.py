@@ -0,0 +1,108 @@
+# scoring_cache.py - كاش نتائج التحليل حسب محتوى الملف المرفوع
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint_bytes(data):
+    """بصمة SHA-256 لمحتوى الملف المرفوع"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_fingerprint(path):
+    """بصمة خفيفة لملف النموذج (المسار + الحجم + وقت التعديل)"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"{path}:missing"
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def make_cache_key(file_bytes, model_paths, settings):
+    """
+    بناء مفتاح الكاش من محتوى الملف + بصمات النماذج + الإعدادات
+
+    Parameters:
+    - file_bytes: محتوى الملف المرفوع
+    - model_paths: مسارات ملفات النماذج
+    - settings: dict بالإعدادات المؤثرة على النتيجة (الحدود، اللغة)
+
+    Returns:
+    - str: مفتاح ثابت لنفس المدخلات
+    """
+    parts = [fingerprint_bytes(file_bytes)]
+    parts.extend(file_fingerprint(path) for path in model_paths)
+    parts.extend(f"{name}={settings[name]!r}" for name in sorted(settings))
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+
+def estimate_nbytes(value):
+    """تقدير حجم النتيجة في الذاكرة (DataFrame / Series / numpy أو dict منها)"""
+    if hasattr(value, 'memory_usage'):
+        # DataFrame يرجع Series لكل عمود و Series يرجع رقماً
+        return int(np.sum(value.memory_usage(deep=True)))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values())
+    return 0
+
+
+class ScoringCache:
+    """كاش LRU للإطارات المحللة محدود بعدد العناصر والحجم التقريبي"""
+
+    def __init__(self, max_entries=8, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """إرجاع النتيجة المحفوظة (أو None) وتحديث ترتيب الاستخدام"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key, value, nbytes=None):
+        """حفظ نتيجة جديدة مع إخراج الأقدم استخداماً عند تجاوز الحدود"""
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            # نحتفظ دائماً بآخر عنصر حتى لو كان أكبر من الحد
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self.total_bytes() > self.max_bytes
+            ):
+                old_key, _ = self._entries.popitem(last=False)
+                self._sizes.pop(old_key, None)
+
+    def total_bytes(self):
+        return sum(self._sizes.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def stats(self):
+        """إحصائيات الكاش للعرض في الشريط الجانبي"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes(),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,130 @@
+# scoring_engine.py - تشغيل عدة نماذج على نفس البيانات في تمريرة واحدة
+import time
+import warnings
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+
+# النماذج مدربة على DataFrame بأسماء أعمدة، ونحن نمرر مصفوفة float32 مباشرة
+warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+DEFAULT_CHUNK_SIZE = 20000
+
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+def model_fingerprint(model):
+    """بصمة محتوى النموذج (نموذجان بنفس البصمة = نفس التنبؤات)"""
+    if model is None:
+        return None
+    try:
+        return _fingerprints[model]
+    except (KeyError, TypeError):
+        pass
+    fingerprint = joblib.hash(model)
+    try:
+        _fingerprints[model] = fingerprint
+    except TypeError:
+        pass
+    return fingerprint
+
+
+def prepare_features(X):
+    """تحويل المدخلات مرة واحدة إلى مصفوفة float32 متصلة (نفس النوع الذي تستخدمه الأشجار داخلياً)"""
+    return np.ascontiguousarray(np.asarray(X, dtype=np.float32))
+
+
+def predict_proba_with_fallback(model, X):
+    """
+    نفس منطق safe_predict_proba: predict_proba ثم predict ثم أصفار
+
+    Returns:
+    - (proba, error): مصفوفة (n, 2) ورسالة الخطأ أو None
+    """
+    n = len(X)
+    if model is None:
+        return np.zeros((n, 2)), None
+    try:
+        proba = np.asarray(model.predict_proba(X))
+        if proba.ndim == 1:
+            proba = np.vstack([1 - proba, proba]).T
+        if proba.shape[1] == 1:
+            proba = np.hstack([1 - proba, proba])
+        return proba, None
+    except Exception:
+        # try predict -> map to probabilities 0/1
+        try:
+            preds = np.asarray(model.predict(X)).astype(int)
+            proba = np.zeros((n, 2))
+            proba[np.arange(n), preds] = 1
+            return proba, None
+        except Exception as e:
+            return np.zeros((n, 2)), str(e)
+
+
+def score_models(models, X, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None):
+    """
+    تشغيل النماذج المختلفة على البيانات بالتوازي وعلى دفعات ثابتة الحجم
+
+    Parameters:
+    - models: dict اسم -> نموذج (أو None)
+    - X: بيانات الميزات (DataFrame أو مصفوفة)
+    - chunk_size: عدد الصفوف في كل دفعة
+    - max_workers: عدد الخيوط (افتراضياً عدد النماذج المختلفة)
+
+    Returns:
+    - dict:
+        proba: اسم -> احتمال الرحيل (0-1) أو None إذا لم يوجد نموذج
+        aliases: اسم -> اسم النموذج الذي حُسبت نتيجته فعلاً
+        errors: اسم -> رسالة الخطأ للنماذج التي فشلت
+        seconds: زمن التنفيذ
+    """
+    start = time.perf_counter()
+    X_arr = prepare_features(X)
+    n = len(X_arr)
+
+    # إزالة النماذج المكررة (مثلاً best_churn_model هو نفس XGB)
+    distinct = {}
+    aliases = {}
+    for name, model in models.items():
+        if model is None:
+            continue
+        fingerprint = model_fingerprint(model)
+        if fingerprint not in distinct:
+            distinct[fingerprint] = name
+        aliases[name] = distinct[fingerprint]
+
+    outputs = {name: np.empty(n, dtype=np.float64) for name in distinct.values()}
+    errors = {}
+
+    def run_chunk(name, begin, end):
+        proba, error = predict_proba_with_fallback(models[name], X_arr[begin:end])
+        outputs[name][begin:end] = proba[:, 1]
+        return name, error
+
+    tasks = [
+        (name, begin, min(begin + chunk_size, n))
+        for name in outputs
+        for begin in range(0, n, chunk_size)
+    ]
+    if tasks:
+        workers = max_workers or len(outputs)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for name, error in pool.map(lambda task: run_chunk(*task), tasks):
+                if error and name not in errors:
+                    errors[name] = error
+
+    proba = {}
+    for name in models:
+        canonical = aliases.get(name)
+        proba[name] = outputs[canonical] if canonical else None
+
+    return {
+        'proba': proba,
+        'aliases': aliases,
+        'errors': {name: errors[canonical] for name, canonical in aliases.items() if canonical in errors},
+        'seconds': time.perf_counter() - start,
+    }
@@ -0,0 +1,306 @@
+# scoring_service.py - خدمة HTTP محلية لتحليل العملاء مع تجميع الطلبات الفردية في دفعات
+#
+# python scoring_service.py --port 8600 --batch-window-ms 5
+import argparse
+import asyncio
+import contextlib
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import FEATURE_COLUMNS, load_models, score_customers
+from incremental_scoring import SCORE_COLUMNS
+from model_registry import model_stats
+
+try:
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+except ImportError:
+    Starlette = None
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+
+# الطلبات الفردية التي تصل خلال هذه المدة تُحلل معاً في استدعاء واحد للنماذج
+DEFAULT_BATCH_WINDOW_MS = 5
+DEFAULT_MAX_BATCH_SIZE = 256
+
+# عدد آخر القياسات المستخدمة لحساب p50 / p99
+LATENCY_WINDOW = 10_000
+
+
+# ========== قياسات الخدمة ==========
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p99': None, 'max': None}
+    data = np.fromiter(values, dtype=np.float64)
+    p50, p99 = np.percentile(data, [50, 99])
+    return {'p50': float(p50), 'p99': float(p99), 'max': float(data.max())}
+
+
+def _size_bucket(size):
+    """حدود مدرج أحجام الدفعات: 1, 2, 4, 8, ..."""
+    bucket = 1
+    while bucket < size:
+        bucket *= 2
+    return bucket
+
+
+class ServiceMetrics:
+    """زمن الاستجابة (p50/p99) ومدرج أحجام الدفعات"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latency = {'single': deque(maxlen=window), 'batch': deque(maxlen=window)}
+        self._model_seconds = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self._histogram = Counter()
+        self.requests = Counter()
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_request(self, kind, seconds, rows):
+        with self._lock:
+            self.requests[kind] += 1
+            self.rows += rows
+            self._latency[kind].append(seconds * 1000)
+
+    def record_batch(self, size, seconds):
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(size)
+            self._histogram[_size_bucket(size)] += 1
+            self._model_seconds.append(seconds * 1000)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            sizes = list(self._batch_sizes)
+            return {
+                'requests': dict(self.requests),
+                'rows': self.rows,
+                'errors': self.errors,
+                'latency_ms': {kind: _percentiles(values) for kind, values in self._latency.items()},
+                'model_ms': _percentiles(self._model_seconds),
+                'batches': self.batches,
+                'batch_size': {
+                    'mean': float(np.mean(sizes)) if sizes else None,
+                    **_percentiles(sizes),
+                    'histogram': {f"<={bucket}": count for bucket, count in sorted(self._histogram.items())},
+                },
+            }
+
+
+# ========== التحليل ==========
+def features_frame(rows):
+    """
+    تحويل قائمة عملاء (dict) إلى DataFrame بأعمدة FEATURE_COLUMNS
+
+    Raises:
+    - ValueError: عمود مفقود أو قيمة غير رقمية
+    """
+    df = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    for col in FEATURE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    bad = df.isna().any(axis=1).to_numpy()
+    if bad.any():
+        raise ValueError(f"rows {np.flatnonzero(bad).tolist()[:10]} need numeric {FEATURE_COLUMNS}")
+    return df
+
+
+class ChurnScorer:
+    """النماذج نفسها التي يستخدمها الداشبورد (نفس اختيار best)"""
+
+    def __init__(self, models=None):
+        self.models = models if models is not None else load_models()
+
+    def score(self, df):
+        """(n, 3) نسب الرحيل بنفس ترتيب SCORE_COLUMNS"""
+        scores, _ = score_customers(df, self.models)
+        return scores[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+class MicroBatcher:
+    """
+    تجميع الطلبات الفردية المتزامنة في دفعة واحدة قبل استدعاء النماذج
+
+    أول طلب يفتح نافذة مدتها window_ms؛ كل ما يصل خلالها (حتى max_batch_size)
+    يُحلل معاً في خيط منفصل حتى لا يتوقف استقبال الطلبات
+    """
+
+    def __init__(self, scorer, metrics, window_ms=DEFAULT_BATCH_WINDOW_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, executor=None):
+        self.scorer = scorer
+        self.metrics = metrics
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.executor = executor
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def submit(self, row):
+        """تحليل عميل واحد (row: قيم FEATURE_COLUMNS بالترتيب)"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        # الطلبات التي وصلت أثناء تحليل الدفعة السابقة تدخل فوراً
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            df = pd.DataFrame(np.array([row for row, _ in batch], dtype=np.float64), columns=FEATURE_COLUMNS)
+            start = time.perf_counter()
+            try:
+                scores = await loop.run_in_executor(self.executor, self.scorer.score, df)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            for (_, future), values in zip(batch, scores):
+                if not future.done():
+                    future.set_result(values)
+
+
+# ========== تطبيق HTTP ==========
+def _result(values):
+    return {col: float(value) for col, value in zip(SCORE_COLUMNS, values)}
+
+
+def create_app(scorer=None, window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+    """
+    تطبيق Starlette
+
+    Routes:
+    - POST /score: عميل واحد {"Purchases", "Total_Value", "Visits"} (يُجمع مع غيره في دفعات)
+      أو عدة عملاء [{...}, ...] / {"customers": [...]} (دفعة مباشرة)
+    - GET /metrics: زمن الاستجابة p50/p99 ومدرج أحجام الدفعات
+    - GET /health
+    """
+    if Starlette is None:
+        raise RuntimeError("starlette is not installed (pip install starlette uvicorn)")
+
+    metrics = ServiceMetrics()
+    # خيط واحد: الدفعات تُحلل بالترتيب و score_models يوزع النماذج على خيوطه
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='scoring')
+    state = {'scorer': scorer, 'batcher': None}
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        if state['scorer'] is None:
+            state['scorer'] = await asyncio.get_running_loop().run_in_executor(executor, ChurnScorer)
+        state['batcher'] = MicroBatcher(state['scorer'], metrics, window_ms, max_batch_size, executor)
+        state['batcher'].start()
+        yield
+        await state['batcher'].stop()
+        executor.shutdown(wait=False)
+
+    async def score(request):
+        start = time.perf_counter()
+        try:
+            payload = await request.json()
+        except ValueError:
+            metrics.record_error()
+            return JSONResponse({'error': 'invalid JSON'}, status_code=400)
+
+        if isinstance(payload, dict) and 'customers' in payload:
+            payload = payload['customers']
+        single = isinstance(payload, dict)
+        try:
+            if not single and not isinstance(payload, list):
+                raise ValueError('expected a customer object or a list of customers')
+            df = features_frame([payload] if single else payload)
+        except (ValueError, TypeError) as e:
+            metrics.record_error()
+            return JSONResponse({'error': str(e)}, status_code=422)
+
+        if single:
+            values = await state['batcher'].submit(df.iloc[0].to_numpy())
+            body = _result(values)
+        else:
+            batch_start = time.perf_counter()
+            scores = await asyncio.get_running_loop().run_in_executor(executor, state['scorer'].score, df)
+            metrics.record_batch(len(df), time.perf_counter() - batch_start)
+            body = {'results': [_result(values) for values in scores]}
+
+        metrics.record_request('single' if single else 'batch', time.perf_counter() - start, len(df))
+        return JSONResponse(body)
+
+    async def metrics_endpoint(request):
+        return JSONResponse({
+            **metrics.snapshot(),
+            'batch_window_ms': window_ms,
+            'max_batch_size': max_batch_size,
+        })
+
+    async def health(request):
+        return JSONResponse({
+            'ok': state['scorer'] is not None,
+            'models': {name: {'loaded': info.get('loaded'), 'compiled': info.get('compiled')}
+                       for name, info in model_stats().items()},
+        })
+
+    return Starlette(routes=[
+        Route('/score', score, methods=['POST']),
+        Route('/metrics', metrics_endpoint),
+        Route('/health', health),
+    ], lifespan=lifespan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خدمة HTTP لتحليل العملاء (POST /score)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--batch-window-ms', type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="مدة انتظار الطلبات الفردية قبل تحليلها كدفعة")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if uvicorn is None:
+        raise SystemExit("❌ uvicorn غير مثبت (pip install uvicorn)")
+    app = create_app(window_ms=args.batch_window_ms, max_batch_size=args.max_batch_size)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+# sharded_scoring.py - تحليل ملف كبير في الذاكرة على عدة عمليات (shards) عبر ذاكرة مشتركة
+#
+# الميزات تُنسخ مرة واحدة إلى ذاكرة مشتركة، وكل عملية تقرأ صفوف الجزء الخاص بها مباشرة
+# (بدون pickle للبيانات) وتكتب النسب وأرقام الشرائح في مصفوفات مشتركة في نفس الصفوف.
+# الدمج لا يعتمد على ترتيب انتهاء الأجزاء، فالنتيجة مطابقة لـ score_customers + analyze_scored.
+#
+# مثال:
+#     with ShardedScorer(workers=8) as scorer:
+#         scores, errors = scorer.score(df)
+#         analyzed, errors = scorer.analyze(df, language='English')
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import (ADVANCED_SEGMENTS, FEATURE_COLUMNS, RISK_BINS, RISK_LABELS, SEGMENT_BINS,
+                            add_predicted_value, advanced_conditions, load_models, score_customers,
+                            xgboost_installed)
+from incremental_scoring import SCORE_COLUMNS
+
+
+# عدد الصفوف في كل جزء (أجزاء أكثر من العمليات حتى تتوزع الأحمال إذا اختلفت السرعة)
+DEFAULT_SHARD_ROWS = 50_000
+
+# أقل من ذلك: تكلفة بدء العمليات أكبر من الفائدة
+SHARD_MIN_ROWS = 200_000
+
+# أعمدة الأرقام المكتوبة لكل صف (رقم التسمية، -1 = بدون تسمية كما في pd.cut)
+CODE_COLUMNS = ['Segment', 'Final_Label'] + list(SEGMENT_BINS) + ['Advanced_Segment']
+
+# النماذج تُحمّل مرة واحدة في كل عملية عاملة
+_models = None
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def use_shards(rows, workers=None):
+    """هل يستحق هذا العدد من الصفوف التقسيم على عمليات؟"""
+    return rows >= SHARD_MIN_ROWS and (workers or default_workers()) > 1
+
+
+# ========== حساب الشرائح (بدون نصوص) ==========
+def _cut_codes(values, bins):
+    # نفس pd.cut (الحد الأيمن ضمن الفئة، وما خارج الحدود أو NaN = -1)
+    codes = pd.cut(values, bins=bins, labels=False)
+    return np.where(np.isnan(codes), -1, codes).astype(np.int8)
+
+
+def segment_codes(features, churn):
+    """
+    أرقام التسميات لكل صف بنفس قواعد add_risk_labels و advanced_customer_segmentation
+
+    Parameters:
+    - features: مصفوفة (n, 3) بترتيب FEATURE_COLUMNS
+    - churn: Churn_Probability (n,)
+
+    Returns:
+    - مصفوفة int8 (n, len(CODE_COLUMNS))
+    """
+    columns = dict(zip(FEATURE_COLUMNS, features.T))
+    codes = np.empty((len(churn), len(CODE_COLUMNS)), dtype=np.int8)
+    codes[:, 0] = _cut_codes(churn, RISK_BINS)
+    codes[:, 1] = np.select([churn <= 30, churn <= 70], [0, 1], default=2)
+    for i, (source, bins, _) in enumerate(SEGMENT_BINS.values(), start=2):
+        codes[:, i] = _cut_codes(columns[source], bins)
+    conditions = advanced_conditions(columns['Purchases'], columns['Total_Value'], columns['Visits'], churn)
+    codes[:, -1] = np.select(conditions, range(len(conditions)), default=len(ADVANCED_SEGMENTS) - 1)
+    return codes
+
+
+def segment_labels(codes, language='العربية'):
+    """
+    أعمدة التسميات من الأرقام (النصوص تُبنى مرة واحدة في العملية الرئيسية)
+
+    Returns:
+    - dict: اسم العمود -> Categorical (يشارك codes بدون نسخ) أو مصفوفة نصوص
+    """
+    labels = RISK_LABELS['English' if language == 'English' else 'العربية']
+    categories = [labels['segment'], labels['final']] + [labels for _, _, labels in SEGMENT_BINS.values()] + [ADVANCED_SEGMENTS]
+    columns = {}
+    for i, (column, values) in enumerate(zip(CODE_COLUMNS, categories)):
+        if column in ('Final_Label', 'Advanced_Segment'):
+            # أعمدة نصية عادية في المسار الأصلي (apply / np.select)
+            columns[column] = np.asarray(values, dtype=object)[codes[:, i]]
+        else:
+            columns[column] = pd.Categorical.from_codes(codes[:, i], categories=values, ordered=True)
+    return columns
+
+
+def apply_segment_codes(df, codes, language='العربية'):
+    """إضافة أعمدة التسميات من الأرقام إلى df"""
+    for column, values in segment_labels(codes, language).items():
+        df[column] = values
+    return df
+
+
+# ========== العمليات العاملة ==========
+def init_worker(xgb_available):
+    global _models
+    _models = load_models(xgb_available)
+
+
+def score_shard(task):
+    """
+    تحليل صفوف [begin, end) من الذاكرة المشتركة وكتابة النتائج في نفس الصفوف
+
+    Returns:
+    - list: رسائل الأخطاء (مرتبة)
+    """
+    names, n, begin, end = task
+    # العمليات العاملة تشارك متتبع موارد العملية الرئيسية، والرئيسية هي التي تحذف الذاكرة (unlink)
+    shms = [SharedMemory(name=name) if name else None for name in names]
+    try:
+        features = np.ndarray((n, len(FEATURE_COLUMNS)), dtype=np.float64, buffer=shms[0].buf)[begin:end]
+        scores, errors = score_customers(pd.DataFrame(features, columns=FEATURE_COLUMNS, copy=False), _models)
+        values = scores[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+        np.ndarray((n, len(SCORE_COLUMNS)), dtype=np.float64, buffer=shms[1].buf)[begin:end] = values
+        if shms[2] is not None:
+            churn = values[:, SCORE_COLUMNS.index('Churn_Probability')]
+            np.ndarray((n, len(CODE_COLUMNS)), dtype=np.int8, buffer=shms[2].buf)[begin:end] = segment_codes(features, churn)
+        # المصفوفات تشير للذاكرة المشتركة ويجب حذفها قبل close()
+        del features, scores
+        return sorted(errors)
+    finally:
+        for shm in shms:
+            if shm is not None:
+                shm.close()
+
+
+# ========== التقسيم والدمج ==========
+class ShardedScorer:
+    """
+    مجموعة عمليات ثابتة (النماذج تُحمّل مرة واحدة لكل عملية) لتحليل عدة ملفات أو دفعات
+
+    workers=1 يحلل في نفس العملية بنفس الكود (بدون ذاكرة مشتركة)
+    """
+
+    def __init__(self, workers=None, xgb_available=None, shard_rows=DEFAULT_SHARD_ROWS):
+        self.workers = workers or default_workers()
+        self.xgb_available = xgboost_installed() if xgb_available is None else xgb_available
+        self.shard_rows = shard_rows
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _run(self, df, with_codes):
+        n = len(df)
+        features = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        scores = np.empty((n, len(SCORE_COLUMNS)), dtype=np.float64)
+        codes = np.empty((n, len(CODE_COLUMNS)), dtype=np.int8) if with_codes else None
+        if n == 0:
+            return scores, codes, []
+
+        if self.workers <= 1:
+            global _models
+            if _models is None:
+                init_worker(self.xgb_available)
+            part, errors = score_customers(pd.DataFrame(features, columns=FEATURE_COLUMNS), _models)
+            scores[:] = part[SCORE_COLUMNS].to_numpy(dtype=np.float64)
+            if with_codes:
+                codes[:] = segment_codes(features, scores[:, SCORE_COLUMNS.index('Churn_Probability')])
+            return scores, codes, sorted(errors)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                 initargs=(self.xgb_available,))
+        arrays = [features, scores] + ([codes] if with_codes else [])
+        shms = [SharedMemory(create=True, size=max(array.nbytes, 1)) for array in arrays]
+        try:
+            np.ndarray(features.shape, dtype=features.dtype, buffer=shms[0].buf)[:] = features
+            names = [shm.name for shm in shms] + [None] * (3 - len(shms))
+            tasks = [(names, n, begin, min(begin + self.shard_rows, n)) for begin in range(0, n, self.shard_rows)]
+            errors = set()
+            for shard_errors in self._executor.map(score_shard, tasks):
+                errors.update(shard_errors)
+            # نسخ النتائج قبل تحرير الذاكرة المشتركة
+            for array, shm in list(zip(arrays, shms))[1:]:
+                array[:] = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+        return scores, codes, sorted(errors)
+
+    def score(self, df):
+        """
+        نسب الرحيل فقط (بديل score_customers)
+
+        Returns:
+        - (DataFrame بأعمدة SCORE_COLUMNS بنفس index, list رسائل الأخطاء)
+        """
+        scores, _, errors = self._run(df, with_codes=False)
+        return pd.DataFrame(scores, columns=SCORE_COLUMNS, index=df.index), errors
+
+    def analyze(self, df, language='العربية'):
+        """
+        النسب + التسميات + الشرائح + القيمة المتوقعة (بديل score_customers ثم analyze_scored)
+
+        Returns:
+        - (نسخة من df مع الأعمدة الجديدة, list رسائل الأخطاء)
+        """
+        scores, codes, errors = self._run(df, with_codes=True)
+        df = df.copy()
+        for i, col in enumerate(SCORE_COLUMNS):
+            df[col] = scores[:, i]
+        df = apply_segment_codes(df, codes, language)
+        return add_predicted_value(df), errors
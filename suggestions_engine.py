@@ -0,0 +1,204 @@
+# suggestions_engine.py - قواعد الاقتراحات الذكية على كل العملاء دفعة واحدة (بدون حلقة لكل عميل)
+import numpy as np
+import pandas as pd
+
+
+# حدود نسبة الرحيل لكل مستوى: <=30 منخفض، <=50 متوسط، <=70 عالٍ، غير ذلك حرج
+TIER_LIMITS = [30, 50, 70]
+TIERS = ['low', 'medium', 'high', 'critical']
+
+AI_NOTES = ['', 'vip', 'reactivation']
+
+# ========== جدول النصوص ==========
+# كل مستوى: الأولوية، الفئة، الاقتراحات، الإجراءات (النصوص تُجلب فقط للصفوف المعروضة)
+SUGGESTION_TEXT = {
+    'English': {
+        'low': {
+            'priority': "Low ✅",
+            'category': "Loyal",
+            'suggestions': [
+                "✅ Customer is very loyal - maintain this level",
+                "💎 Offer periodic appreciation gifts",
+                "🎁 Simple and easy loyalty program",
+                "📧 Send special offers to loyal customers"
+            ],
+            'actions': ["Maintain", "Appreciation", "Loyalty"],
+        },
+        'medium': {
+            'priority': "Medium ⚠️",
+            'category': "Normal",
+            'suggestions': [
+                "⚠️ Customer is committed but should be monitored",
+                "🎯 Offer exclusive and new offers",
+                "📞 Contact to understand their needs",
+                "🚀 Suggest new products matching their history"
+            ],
+            'actions': ["Monitor", "Offers", "Contact"],
+        },
+        'high': {
+            'priority': "High ⚠️",
+            'category': "Medium Risk",
+            'suggestions': [
+                "🔴 Customer showing signs of weak commitment",
+                "💰 Offer limited-time special discount (15-20%)",
+                "📞 Call personally to check satisfaction",
+                "🎁 Offer gift or extra reward",
+                "⭐ Ask for service rating for improvement"
+            ],
+            'actions': ["Discount", "Call", "Improvement"],
+        },
+        'critical': {
+            'priority': "Critical 🚨",
+            'category': "Very High Risk",
+            'suggestions': [
+                "🚨 This customer is about to leave - act now!",
+                "💰 Offer very large discount (25-30%)",
+                "📞 Call immediately - there might be a problem",
+                "🎁 Offer valuable gift or large reward",
+                "👥 Have customer service team follow up personally",
+                "📋 Ask for reasons of dissatisfaction"
+            ],
+            'actions': ["Immediate Rescue", "Big Discount", "Personal Follow-up"],
+        },
+        'notes': {
+            '': "",
+            'vip': "Suggestion: Target with VIP offers as customer has high value.",
+            'reactivation': "Suggestion: Reactivation campaign with welcome discount.",
+        },
+    },
+    'العربية': {
+        'low': {
+            'priority': "منخفضة ✅",
+            'category': "مخلص",
+            'suggestions': [
+                "✅ العميل مخلص جداً - حافظ على هذا المستوى",
+                "💎 قدم هدايا تقديرية دورية",
+                "🎁 برنامج ولاء بسيط وسهل",
+                "📧 إرسال عروض خاصة للعملاء المخلصين"
+            ],
+            'actions': ["الحفاظ", "التقدير", "الولاء"],
+        },
+        'medium': {
+            'priority': "متوسطة ⚠️",
+            'category': "عادي",
+            'suggestions': [
+                "⚠️ العميل ملتزم لكن يجب مراقبته",
+                "🎯 قدم له عروض حصرية وجديدة",
+                "📞 تواصل معه للتعرف على احتياجاته",
+                "🚀 اقترح منتجات جديدة تناسب تاريخه"
+            ],
+            'actions': ["المراقبة", "العروض", "التواصل"],
+        },
+        'high': {
+            'priority': "عالية ⚠️",
+            'category': "خطر متوسط",
+            'suggestions': [
+                "🔴 العميل بدأ يظهر علامات ضعف الالتزام",
+                "💰 قدم خصم خاص محدود الوقت (15-20%)",
+                "📞 اتصل به شخصياً للتحقق من رضاه",
+                "🎁 قدم هدية أو مكافأة إضافية",
+                "⭐ اطلب منه تقييم خدمتك للتحسين"
+            ],
+            'actions': ["الخصم", "الاتصال", "التحسين"],
+        },
+        'critical': {
+            'priority': "حرجة جداً 🚨",
+            'category': "خطر جداً",
+            'suggestions': [
+                "🚨 هذا العميل على وشب الرحيل - تصرف الآن!",
+                "💰 عرض خصم كبير جداً (25-30%)",
+                "📞 اتصل به فوراً - قد يكون هناك مشكلة",
+                "🎁 قدم هدية قيمة أو مكافأة كبيرة",
+                "👥 اجعل فريق خدمة العملاء يتابعه شخصياً",
+                "📋 اطلب منه أسباب عدم رضاه"
+            ],
+            'actions': ["الإنقاذ الفوري", "الخصم الكبير", "المتابعة الشخصية"],
+        },
+        'notes': {
+            '': "",
+            'vip': "اقتراح: استهداف بعروض VIP لأن العميل قيمة عالية.",
+            'reactivation': "اقتراح: حملة إعادة تفعيل مع خصم ترحيبي.",
+        },
+    },
+}
+
+
+def _texts(language):
+    return SUGGESTION_TEXT['English' if language == 'English' else 'العربية']
+
+
+def suggestion_ids(tier):
+    """معرفات اقتراحات المستوى بالترتيب (مثلاً 'critical_1' ... 'critical_6')"""
+    name = TIERS[tier]
+    return [f"{name}_{i}" for i in range(1, len(SUGGESTION_TEXT['English'][name]['suggestions']) + 1)]
+
+
+# ========== القواعد (على كل الصفوف) ==========
+def suggestion_codes(df):
+    """
+    تطبيق قواعد الاقتراحات على كل العملاء مرة واحدة
+
+    Returns:
+    - DataFrame بنفس index لـ df:
+      Suggestion_Tier: رقم المستوى في TIERS (يحدد الأولوية والفئة ومجموعة الاقتراحات والإجراءات)
+      AI_Note: رقم الملاحظة في AI_NOTES (0 = بدون ملاحظة)
+    """
+    churn = df['Churn_Probability'].to_numpy(dtype=np.float64)
+    purchases = df['Purchases'].to_numpy(dtype=np.float64)
+    value = df['Total_Value'].to_numpy(dtype=np.float64)
+
+    # نسبة مفقودة (NaN) لا تحقق أي شرط فتصبح "حرجة" كما في الشروط الأصلية
+    tier = np.select([churn <= limit for limit in TIER_LIMITS], [0, 1, 2], default=3)
+    note = np.select([(purchases > 5) & (value > 500), purchases == 0], [1, 2], default=0)
+    return pd.DataFrame({
+        'Suggestion_Tier': tier.astype(np.int8),
+        'AI_Note': note.astype(np.int8),
+    }, index=df.index)
+
+
+# ========== النصوص ==========
+def describe(tier, note, language='العربية'):
+    """
+    نصوص عميل واحد (للصفوف المعروضة فقط)
+
+    Returns:
+    - dict: priority, suggestions, actions, category, ai_note
+    """
+    texts = _texts(language)
+    level = texts[TIERS[int(tier)]]
+    return {
+        'priority': level['priority'],
+        'suggestions': list(level['suggestions']),
+        'actions': list(level['actions']),
+        'category': level['category'],
+        'ai_note': texts['notes'][AI_NOTES[int(note)]],
+    }
+
+
+def _column(codes, values):
+    # النص يُخزن مرة واحدة لكل مستوى وكل صف يشير إليه برقمه (بدون نسخ النصوص لكل عميل)
+    return pd.Categorical.from_codes(codes, categories=values)
+
+
+def suggestions_table(df, codes, language='العربية', columns=('Name', 'Churn_Probability')):
+    """
+    جدول اقتراحات كل العملاء للتصدير (الاقتراحات والإجراءات مفصولة بـ " | ")
+
+    Suggestion_IDs و AI_Note_Code معرفات ثابتة لا تتغير باللغة (للفلترة بعد التصدير)
+
+    Parameters:
+    - codes: ناتج suggestion_codes(df)
+    """
+    texts = _texts(language)
+    levels = [texts[name] for name in TIERS]
+    tier = codes['Suggestion_Tier'].to_numpy()
+    table = df[list(columns)].copy()
+    table['Priority'] = _column(tier, [level['priority'] for level in levels])
+    table['Category'] = _column(tier, [level['category'] for level in levels])
+    table['Suggestion_IDs'] = _column(tier, [" | ".join(suggestion_ids(i)) for i in range(len(TIERS))])
+    table['Suggestions'] = _column(tier, [" | ".join(level['suggestions']) for level in levels])
+    table['Actions'] = _column(tier, [" | ".join(level['actions']) for level in levels])
+    note = codes['AI_Note'].to_numpy()
+    table['AI_Note_Code'] = _column(note, AI_NOTES)
+    table['AI_Note'] = _column(note, [texts['notes'][name] for name in AI_NOTES])
+    return table
@@ -0,0 +1,119 @@
+# table_view.py - عرض جداول العملاء الكبيرة صفحة بصفحة (بحث وترتيب وتصفية على السيرفر)
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+# ========== التصفية والترتيب (بدون Streamlit) ==========
+def contains_mask(series, query):
+    """
+    mask للصفوف التي يحتوي عمودها النصي على query (بدون حساسية لحالة الأحرف)
+
+    الأعمدة category تُفحص قيمها المختلفة فقط ثم تُوزع النتيجة على الصفوف
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        hits = series.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+        # الكود -1 (قيمة مفقودة) يأخذ آخر عنصر = False
+        return np.append(np.asarray(hits, dtype=bool), False)[series.cat.codes.to_numpy()]
+    return series.astype(str).str.contains(query, case=False, regex=False, na=False).to_numpy()
+
+
+def filter_positions(df, search=None, search_column='Name', category_column=None, categories=None):
+    """
+    أرقام الصفوف (مواقع iloc) التي تطابق البحث والتصفية
+
+    Parameters:
+    - search: نص يُبحث عنه في search_column
+    - category_column / categories: إبقاء الصفوف التي قيمتها ضمن categories فقط
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if search:
+        mask &= contains_mask(df[search_column], search)
+    if category_column and categories:
+        mask &= df[category_column].isin(categories).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def page_positions(df, positions, sort_column=None, descending=False, page=1, page_size=50):
+    """
+    مواقع صفوف صفحة واحدة بعد الترتيب
+
+    Returns:
+    - (positions الصفحة, عدد الصفحات)
+    """
+    if sort_column is not None and len(positions):
+        values = df[sort_column].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    pages = max(1, -(-len(positions) // page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return positions[start:start + page_size], pages
+
+
+# ========== العرض ==========
+def show_paged_table(df, columns, labels=None, key='table', percent_columns=(), sort_column=None,
+                     descending=True, search_column='Name', category_column=None, page_size=50):
+    """
+    جدول مقسم لصفحات: يُنسخ ويُرسل للمتصفح صف الصفحة الحالية فقط
+
+    Parameters:
+    - df: البيانات الرقمية كما هي (بدون تحويل النسب إلى نصوص)
+    - columns: الأعمدة المعروضة
+    - labels: أسماء الأعمدة المعروضة {column: label}
+    - key: بادئة مفاتيح عناصر التحكم (مختلفة لكل جدول)
+    - percent_columns: أعمدة تُعرض كنسبة مئوية (التنسيق في المتصفح عبر column_config)
+    - sort_column / descending: الترتيب الافتراضي (None = ترتيب الملف)
+    - category_column: عمود تصفية بقائمة اختيار (مثلاً Advanced_Segment)
+
+    Returns:
+    - index صفوف الصفحة المعروضة (بنفس ترتيب العرض)
+    """
+    arabic = st.session_state.get('language', 'العربية') == 'العربية'
+    labels = labels or {}
+
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    search = c1.text_input('🔎 بحث بالاسم' if arabic else '🔎 Search by name', key=f"{key}_search")
+    sort_options = [None] + list(columns)
+    sort_by = c2.selectbox(
+        'الترتيب حسب' if arabic else 'Sort by', sort_options,
+        index=sort_options.index(sort_column) if sort_column in sort_options else 0,
+        format_func=lambda c: ('ترتيب الملف' if arabic else 'File order') if c is None else labels.get(c, c),
+        key=f"{key}_sort",
+    )
+    desc = c3.checkbox('تنازلي' if arabic else 'Descending', value=descending, key=f"{key}_desc")
+    size = c4.selectbox('عدد الصفوف' if arabic else 'Rows', PAGE_SIZES,
+                        index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 0, key=f"{key}_size")
+
+    categories = None
+    if category_column:
+        options = sorted(df[category_column].dropna().unique().tolist())
+        categories = st.multiselect(labels.get(category_column, category_column), options, key=f"{key}_categories")
+
+    positions = filter_positions(df, search.strip() or None, search_column, category_column, categories)
+    pages = max(1, -(-len(positions) // size))
+
+    # الصفحة المحفوظة قد تتجاوز العدد الجديد بعد البحث أو التصفية (القيمة من session_state فقط، بدون value)
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = st.number_input('الصفحة' if arabic else 'Page', min_value=1, max_value=pages, step=1, key=page_key)
+
+    rows, pages = page_positions(df, positions, sort_by, desc, int(page), size)
+    page_df = df.iloc[rows][list(columns)].rename(columns=labels)
+    column_config = {
+        labels.get(col, col): st.column_config.NumberColumn(labels.get(col, col), format="%.1f%%")
+        for col in percent_columns
+    }
+    st.dataframe(page_df, column_config=column_config, width='stretch')
+
+    start = (int(page) - 1) * size
+    total = len(positions)
+    if arabic:
+        st.caption(f"الصفوف {min(start + 1, total):,}–{start + len(rows):,} من {total:,} (صفحة {int(page)} من {pages})")
+    else:
+        st.caption(f"Rows {min(start + 1, total):,}–{start + len(rows):,} of {total:,} (page {int(page)} of {pages})")
+    return df.index[rows]
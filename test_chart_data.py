@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from chart_data import (counts_frame, figure_nbytes, histogram_figure, histogram_frame, rate_by_group,
+                        scatter_figure)
+
+# عدد العملاء في الاختبار، والحد الأقصى لحجم كل رسم مجمع (بايت)
+ROWS = 100_000
+MAX_FIGURE_BYTES = 64 * 1024
+
+# نفس حدود مدرج باقي العملاء في صفحة العملاء المعرضين للخطر
+HIGH_RISK_TOP_N = 20
+HIGH_RISK_BINS = np.arange(70, 102.5, 2.5)
+
+
+def make_customers(n, seed=42):
+    """بيانات عشوائية بأعمدة الداشبورد المستخدمة في الرسوم"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Name': [f"Customer {i}" for i in range(n)],
+        'Purchases': rng.integers(0, 60, n),
+        'Total_Value': rng.uniform(100, 3000, n),
+        'Visits': rng.integers(1, 61, n),
+        'Churn_Probability': rng.uniform(0, 100, n),
+        'predicted_future_value': rng.uniform(0, 5000, n),
+        'Segment': rng.choice(['Loyal', 'Medium', 'At Risk'], n),
+        'Advanced_Segment': rng.choice(['VIP', 'Regular', 'At Risk', 'New'], n),
+    })
+
+
+# ========== الرسوم كما تُبنى في الصفحات ==========
+def segment_pie(df):
+    pie_data = counts_frame(df['Segment'])
+    assert pie_data['count'].sum() == len(df)
+    return px.pie(pie_data, names='Segment', values='count', color='Segment',
+                  color_discrete_map={"Loyal": "#31c48d", "Medium": "#60a5fa", "At Risk": "#f87171"},
+                  title="Customer Segments Distribution")
+
+
+def advanced_segment_bar(df):
+    data = counts_frame(df['Advanced_Segment'])
+    assert data['count'].sum() == len(df)
+    return px.bar(data, x='Segment', y='count', title="Advanced Customer Segments",
+                  color='count', color_continuous_scale='viridis')
+
+
+def high_risk_remainder(df):
+    ranked = df[df['Churn_Probability'] > 70].sort_values('Churn_Probability', ascending=False)
+    rest = ranked['Churn_Probability'].iloc[HIGH_RISK_TOP_N:].to_numpy(dtype=np.float64)
+    hist = histogram_frame(rest, bins=HIGH_RISK_BINS)
+    assert hist['count'].sum() == len(rest)
+    bins = pd.DataFrame({'range': [f"{lo:g}–{hi:g}%" for lo, hi in zip(hist['start'], hist['end'])], 'count': hist['count']})
+    return px.bar(bins, x='range', y='count', title=f"Remaining {len(rest):,} customers by churn probability",
+                  labels={'range': 'Churn Probability', 'count': 'Customers'})
+
+
+def value_histogram(df):
+    return histogram_figure(df['Total_Value'], x_label='Total_Value', title="Customer Value Distribution")
+
+
+def visits_scatter(df):
+    return scatter_figure(df, x='Visits', y='Purchases', color='Advanced_Segment',
+                          title="Visits vs Purchases Relationship")
+
+
+def retention_bar(df):
+    data = rate_by_group(df, 'Advanced_Segment', df['Purchases'] > 1, rate_name='Retention Rate')
+    expected = df.groupby('Advanced_Segment')['Purchases'].apply(lambda x: (x > 1).mean() * 100)
+    assert np.allclose(data['Retention Rate'].to_numpy(), expected.to_numpy())
+    return px.bar(data, x='Segment', y='Retention Rate', title="Retention Rate by Segment")
+
+
+def lifetime_value_histogram(df):
+    return histogram_figure(df['predicted_future_value'], x_label='predicted_future_value',
+                            title="Customer Lifetime Value Distribution")
+
+
+def churn_histogram(df):
+    # dashboard.py (تطبيق Dash)
+    return histogram_figure(df['Churn_Probability'], x_label='Churn_Probability',
+                            title='توزيع احتمالية الرحيل', color_discrete_sequence=['#1f77b4'])
+
+
+FIGURES = [segment_pie, advanced_segment_bar, high_risk_remainder, value_histogram, visits_scatter,
+           retention_bar, lifetime_value_histogram, churn_histogram]
+
+
+# ========== الاختبار ==========
+def test_figure_payloads():
+    df = make_customers(ROWS)
+    for build in FIGURES:
+        nbytes = figure_nbytes(build(df))
+        print(f"   {build.__name__:>26} | {nbytes / 1024:>8.1f} KB")
+        assert nbytes <= MAX_FIGURE_BYTES, f"{build.__name__}: {nbytes:,} bytes for {ROWS:,} rows"
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print(f"📦 اختبار حجم الرسوم المجمعة ({ROWS:,} عميل، الحد {MAX_FIGURE_BYTES // 1024} KB لكل رسم)")
+    print("=" * 80)
+    test_figure_payloads()
+
+    print("\n" + "=" * 80)
+    print("✅ انتهى الاختبار")
+    print("=" * 80)
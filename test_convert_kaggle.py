@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from convert_kaggle_FINAL import CustomerMerger, customer_groups, merge_similar_customers
+
+# حجم البيانات التجريبية (الحلقة الأصلية O(n²) فتبقى صغيرة)
+N_TRANSACTIONS = 3000
+SEED = 42
+
+# السماحية بين الحلقة الأصلية والدمج الجديد (نفس البذرة لكن ترتيب سحب الأرقام مختلف)
+MERGED_SHARE_TOLERANCE = 0.02
+UNIQUE_IDS_TOLERANCE = 0.03
+MULTI_IDS_TOLERANCE = 0.10
+MAX_PER_ID_TOLERANCE = 3
+
+
+def make_transactions(n=N_TRANSACTIONS, seed=SEED):
+    """معاملات عشوائية بأعمدة Kaggle المستخدمة في الدمج (كل معاملة بعميل مختلف كما في الملف الأصلي)"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'customer_id': [f"C{i}" for i in range(n)],
+        'gender': rng.choice(['Male', 'Female'], n),
+        'age': rng.integers(18, 70, n),
+        'shopping_mall': rng.choice(['Kanyon', 'Metrocity', 'Zorlu'], n),
+    })
+    # مجموعات صغيرة (أقل من 3 معاملات) لا يجب أن تُدمج
+    df.loc[n - 3:, 'shopping_mall'] = ['Rare A', 'Rare B', 'Rare B']
+    df['customer_group'] = customer_groups(df)
+    return df
+
+
+def valid_groups_of(df):
+    group_sizes = df.groupby('customer_group').size()
+    return group_sizes[group_sizes >= 3].index
+
+
+def baseline_merge(df_clean, valid_groups):
+    """حلقة الدمج كما كانت في السكربت الأصلي (iterrows + np.random.seed(42))"""
+    np.random.seed(42)
+    new_customer_ids = []
+    for idx, row in df_clean.iterrows():
+        if row['customer_group'] in valid_groups:
+            # احتمال 30% لدمج العملاء المتشابهين
+            if np.random.random() < 0.30:
+                group_customers = df_clean[
+                    (df_clean['customer_group'] == row['customer_group']) &
+                    (df_clean.index < idx)
+                ]
+                if len(group_customers) > 0:
+                    merged_customer = np.random.choice(group_customers['customer_id'].values)
+                    new_customer_ids.append(merged_customer)
+                else:
+                    new_customer_ids.append(row['customer_id'])
+            else:
+                new_customer_ids.append(row['customer_id'])
+        else:
+            new_customer_ids.append(row['customer_id'])
+    return np.array(new_customer_ids, dtype=object)
+
+
+def merge_stats(df, new_ids):
+    counts = pd.Series(new_ids).value_counts()
+    return {
+        'merged_share': float((new_ids != df['customer_id'].to_numpy()).mean()),
+        'unique_ids': len(counts),
+        'max_per_id': int(counts.max()),
+        'ids_with_2_plus': int((counts >= 2).sum()),
+    }
+
+
+# ========== اختبار 1: نفس إحصائيات الحلقة الأصلية ==========
+def test_stats_match_baseline():
+    df = make_transactions()
+    valid_groups = valid_groups_of(df)
+    expected = merge_stats(df, baseline_merge(df, valid_groups))
+    actual = merge_stats(df, merge_similar_customers(df, valid_groups, seed=SEED))
+
+    print(f"   الأصلي: {expected}")
+    print(f"   الجديد: {actual}")
+    assert abs(actual['merged_share'] - expected['merged_share']) <= MERGED_SHARE_TOLERANCE
+    assert abs(actual['unique_ids'] - expected['unique_ids']) <= UNIQUE_IDS_TOLERANCE * expected['unique_ids']
+    assert abs(actual['ids_with_2_plus'] - expected['ids_with_2_plus']) <= MULTI_IDS_TOLERANCE * expected['ids_with_2_plus']
+    assert abs(actual['max_per_id'] - expected['max_per_id']) <= MAX_PER_ID_TOLERANCE
+
+
+# ========== اختبار 2: قواعد الدمج ==========
+def test_merge_invariants():
+    df = make_transactions()
+    valid_groups = valid_groups_of(df)
+    new_ids = merge_similar_customers(df, valid_groups, seed=SEED)
+    customer_ids = df['customer_id'].to_numpy()
+    groups = df['customer_group'].to_numpy()
+    row_of = {customer: i for i, customer in enumerate(customer_ids)}
+
+    merged = np.flatnonzero(new_ids != customer_ids)
+    assert len(merged) > 0
+    for i in merged:
+        source = row_of[new_ids[i]]
+        # الدمج مع معاملة سابقة من نفس المجموعة فقط
+        assert groups[source] == groups[i]
+        assert source < i
+
+    # المعاملة الأولى في كل مجموعة لا تُدمج
+    first_rows = df.groupby('customer_group').head(1).index.to_numpy()
+    assert (new_ids[first_rows] == customer_ids[first_rows]).all()
+
+    # المجموعات الأقل من 3 معاملات تبقى كما هي
+    small = ~pd.Series(groups).isin(valid_groups).to_numpy()
+    assert small.sum() == 3
+    assert (new_ids[small] == customer_ids[small]).all()
+
+
+# ========== اختبار 3: وضع الدفعات = دفعة واحدة ==========
+def test_chunked_matches_whole():
+    df = make_transactions()
+    valid_groups = valid_groups_of(df)
+    whole = merge_similar_customers(df, valid_groups, seed=SEED)
+
+    merger = CustomerMerger(valid_groups, seed=SEED)
+    chunks = [merger.merge(part['customer_id'].to_numpy(), part['customer_group'].to_numpy())
+              for _, part in df.groupby(np.arange(len(df)) // 700)]
+    assert (np.concatenate(chunks) == whole).all()
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("🧪 اختبار دمج العملاء في convert_kaggle_FINAL.py")
+    print("=" * 80)
+    for test in [test_stats_match_baseline, test_merge_invariants, test_chunked_matches_whole]:
+        print(f"\n🔄 {test.__name__}")
+        test()
+        print("   ✅ ناجح")
+
+    print("\n" + "=" * 80)
+    print("✅ انتهى الاختبار")
+    print("=" * 80)
@@ -7,6 +7,7 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import silhouette_score, davies_bouldin_score, calinski_harabasz_score
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
 import warnings
+from data_io import load_customers
 warnings.filterwarnings('ignore')
 
 print("="*80)
@@ -15,7 +16,7 @@ print("="*80)
 
 # قراءة البيانات
 try:
-    df = pd.read_excel('customers_kaggle_improved.xlsx')
+    df = load_customers('customers_kaggle_improved.xlsx')
     print(f"\n✅ تم تحميل البيانات: {len(df)} عميل")
 except FileNotFoundError:
     print("\n❌ الملف غير موجود: customers_kaggle.xlsx")
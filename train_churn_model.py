@@ -9,9 +9,13 @@ import joblib
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.ensemble import RandomForestClassifier
+from tree_runtime import compile_model
+from model_registry import compiled_path, file_sha256
+from data_io import load_customers
 
 # ==================== تحميل البيانات ====================
-df = pd.read_excel('customers_churn.xlsx')
+# customers_churn.parquet إن وُجد (أسرع ويحفظ الأنواع) وإلا ملف Excel
+df = load_customers('customers_churn.xlsx')
 X = df[['Purchases', 'Total_Value', 'Visits']]
 y = df['churned']
 
@@ -196,9 +200,21 @@ print("✅ تم حفظ 'confusion_matrix_best.png'")
 plt.close()
 
 # ==================== حفظ النماذج ====================
-joblib.dump(xgb_model, 'xgb_churn_model.pkl')
-joblib.dump(rf_model, 'rf_churn_model.pkl')
-joblib.dump(best_model, 'best_churn_model.pkl')
+# حفظ بدون ضغط حتى يمكن تحميل مصفوفات numpy بـ mmap_mode='r' (model_registry.py)
+joblib.dump(xgb_model, 'xgb_churn_model.pkl', compress=0)
+joblib.dump(rf_model, 'rf_churn_model.pkl', compress=0)
+joblib.dump(best_model, 'best_churn_model.pkl', compress=0)
+
+# ==================== تصدير النماذج لمحرك NumPy ====================
+# نسخة مسطحة من الأشجار يستخدمها الداشبورد بدلاً من unpickle + predict_proba
+for model_file, model in [('xgb_churn_model.pkl', xgb_model),
+                          ('rf_churn_model.pkl', rf_model),
+                          ('best_churn_model.pkl', best_model)]:
+    compiled = compile_model(model, source_sha256=file_sha256(model_file))
+    if compiled is not None:
+        joblib.dump(compiled, compiled_path(model_file), compress=0)
+        mode = "جدول بحث" if compiled.table is not None else "نزول في الأشجار"
+        print(f"  • {compiled_path(model_file)} ({mode})")
 
 print("\n" + "=" * 70)
 print("✅ تم حفظ النماذج:")
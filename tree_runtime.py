@@ -0,0 +1,264 @@
+# tree_runtime.py - تقييم أشجار RF/XGBoost المصدّرة كمصفوفات NumPy
+import json
+
+import numpy as np
+
+
+# أقصى عدد خلايا لجدول البحث المسبق (8 bytes لكل خلية)
+MAX_TABLE_CELLS = 4_000_000
+
+
+class CompiledForest:
+    """
+    غابة أشجار مسطحة في مصفوفات NumPy متجاورة (بديل predict_proba)
+
+    كل العقد لكل الأشجار في مصفوفة واحدة، والأوراق تشير لنفسها حتى يكفي
+    تكرار خطوة النزول max_depth مرة لكل الصفوف دفعة واحدة.
+    إذا كانت شبكة العتبات (حاصل ضرب عدد العتبات لكل ميزة) صغيرة، تُحسب
+    النتيجة مسبقاً لكل خلية ويصبح التنبؤ مجرد searchsorted + قراءة من جدول.
+    """
+
+    # عدد الصفوف في كل دفعة تقييم (حجم مصفوفة العقد = الأشجار × الصفوف)
+    BLOCK_ROWS = 4096
+
+    def __init__(self, kind, feature, threshold, children, default_left, leaf_value,
+                 roots, max_depth, n_features, base_margin=0.0, source_sha256=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.default_left = default_left
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.base_margin = base_margin
+        self.source_sha256 = source_sha256
+        self.bin_edges = None
+        self.table = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    # ========== التقييم بالنزول في الأشجار ==========
+    def _leaf_nodes(self, X):
+        """إرجاع رقم الورقة لكل (شجرة، صف) بشكل (n_trees, n_rows)"""
+        n = len(X)
+        # الميزات مرتبة عمودياً في مصفوفة مسطحة: القيمة = Xt[feature * n + row]
+        Xt = np.ascontiguousarray(X.T).ravel()
+        rows = np.arange(n, dtype=np.int64)
+        node = np.repeat(self.roots[:, None], n, axis=1)
+        for _ in range(self.max_depth):
+            values = Xt[self.feature[node] * n + rows]
+            if self.kind == 'rf':
+                # sklearn: X <= threshold يذهب لليسار (مقارنة float32 مع float64)
+                go_right = values > self.threshold[node]
+            else:
+                # XGBoost: x < split_condition يذهب لليسار
+                go_right = ~(values < self.threshold[node])
+            # القيم المفقودة تذهب حسب الاتجاه المحفوظ في كل عقدة
+            missing = np.isnan(values)
+            if missing.any():
+                go_right[missing] = ~self.default_left[node[missing]]
+            node = self.children[2 * node + go_right]
+        return node
+
+    def _traverse_block(self, X):
+        values = self.leaf_value[self._leaf_nodes(X)]
+        if self.kind == 'rf':
+            # نفس ترتيب الجمع في RandomForestClassifier: مجموع الأشجار ثم القسمة
+            total = np.zeros(len(X), dtype=np.float64)
+            for tree_values in values:
+                total += tree_values
+            return total / self.n_trees
+        # XGBoost يجمع الهامش بـ float32 بدءاً من base_margin ثم sigmoid
+        margin = np.full(len(X), self.base_margin, dtype=np.float32)
+        for tree_values in values:
+            margin += tree_values
+        exp = np.exp(-margin.astype(np.float64)).astype(np.float32)
+        return np.float32(1.0) / (exp + np.float32(1.0))
+
+    def _traverse(self, X):
+        positive = np.empty(len(X), dtype=self._output_dtype())
+        for begin in range(0, len(X), self.BLOCK_ROWS):
+            end = begin + self.BLOCK_ROWS
+            positive[begin:end] = self._traverse_block(X[begin:end])
+        return positive
+
+    def _output_dtype(self):
+        return np.float64 if self.kind == 'rf' else np.float32
+
+    # ========== جدول البحث المسبق ==========
+    def _bins(self, column, feature):
+        # rf: اليمين إذا x > t ، xgb: اليمين إذا x >= t
+        side = 'left' if self.kind == 'rf' else 'right'
+        return np.searchsorted(self.bin_edges[feature], column, side=side)
+
+    def _cell_index(self, X):
+        shape = tuple(len(edges) + 1 for edges in self.bin_edges)
+        bins = [self._bins(X[:, f], f) for f in range(self.n_features)]
+        return np.ravel_multi_index(bins, shape)
+
+    def build_table(self, max_cells=MAX_TABLE_CELLS):
+        """
+        حساب النتيجة مسبقاً لكل خلية من شبكة العتبات إن كانت صغيرة بما يكفي
+
+        كل ورقة تغطي صندوقاً في فضاء الخلايا، فنضيف قيمتها للصندوق كاملاً
+        شجرة بعد شجرة. كل خلية تستقبل قيمة واحدة من كل شجرة وبنفس ترتيب
+        الأشجار، فالنتيجة مطابقة للنزول في الأشجار صفاً صفاً.
+        """
+        internal = self.children[0::2] != np.arange(len(self.feature))
+        edges = [np.unique(self.threshold[internal & (self.feature == f)])
+                 for f in range(self.n_features)]
+        shape = tuple(len(e) + 1 for e in edges)
+        if np.prod(shape, dtype=np.float64) > max_cells:
+            return False
+
+        # رتبة عتبة كل عقدة داخل حدود ميزتها
+        rank = np.zeros(len(self.feature), dtype=np.int64)
+        for f, e in enumerate(edges):
+            mask = internal & (self.feature == f)
+            rank[mask] = np.searchsorted(e, self.threshold[mask])
+
+        if self.kind == 'rf':
+            table = np.zeros(shape, dtype=np.float64)
+        else:
+            table = np.full(shape, self.base_margin, dtype=np.float32)
+        leaf_value = self.leaf_value.astype(table.dtype)
+
+        for root in self.roots:
+            stack = [(root, [0] * len(shape), list(shape))]
+            while stack:
+                node, low, high = stack.pop()
+                if not internal[node]:
+                    table[tuple(slice(l, h) for l, h in zip(low, high))] += leaf_value[node]
+                    continue
+                f, split = self.feature[node], rank[node] + 1
+                left_high = list(high)
+                left_high[f] = min(high[f], split)
+                right_low = list(low)
+                right_low[f] = max(low[f], split)
+                stack.append((self.children[2 * node], low, left_high))
+                stack.append((self.children[2 * node + 1], right_low, high))
+
+        if self.kind == 'rf':
+            table /= self.n_trees
+        else:
+            exp = np.exp(-table.astype(np.float64)).astype(np.float32)
+            table = np.float32(1.0) / (exp + np.float32(1.0))
+
+        self.bin_edges = edges
+        self.table = table.ravel()
+        return True
+
+    # ========== واجهة مثل sklearn ==========
+    def predict_proba(self, X):
+        """احتمالات (n, 2) بنفس شكل predict_proba في sklearn"""
+        X = np.asarray(X, dtype=np.float32)
+        if self.table is not None:
+            missing = np.isnan(X).any(axis=1)
+            positive = self.table[self._cell_index(np.where(missing[:, None], 0, X))]
+            if missing.any():
+                positive[missing] = self._traverse(X[missing])
+        else:
+            positive = self._traverse(X)
+        return np.column_stack([1 - positive, positive])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(int)
+
+
+def _pack(trees):
+    """
+    دمج قائمة أشجار (left, right, feature, threshold, default_left, leaf_value)
+    في مصفوفات واحدة مع تحويل الأوراق لتشير لنفسها
+    """
+    offsets = np.cumsum([0] + [len(tree[0]) for tree in trees])
+    total = offsets[-1]
+    feature = np.zeros(total, dtype=np.int64)
+    threshold = np.zeros(total, dtype=np.float64)
+    children = np.zeros(2 * total, dtype=np.int64)
+    default_left = np.zeros(total, dtype=bool)
+    leaf_value = np.zeros(total, dtype=np.float64)
+    for offset, (left, right, feat, thresh, dleft, value) in zip(offsets, trees):
+        nodes = np.arange(len(left)) + offset
+        is_leaf = left < 0
+        feature[nodes] = np.where(is_leaf, 0, feat)
+        threshold[nodes] = thresh
+        children[2 * nodes] = np.where(is_leaf, nodes, left + offset)
+        children[2 * nodes + 1] = np.where(is_leaf, nodes, right + offset)
+        default_left[nodes] = dleft
+        leaf_value[nodes] = value
+    return feature, threshold, children, default_left, leaf_value, offsets[:-1].astype(np.int64)
+
+
+def _tree_depth(left, right):
+    depth = np.zeros(len(left), dtype=np.int64)
+    for node in range(len(left)):
+        if left[node] >= 0:
+            depth[left[node]] = depth[node] + 1
+            depth[right[node]] = depth[node] + 1
+    return int(depth.max())
+
+
+def compile_random_forest(model, source_sha256=None):
+    """تصدير RandomForestClassifier (تصنيف ثنائي) إلى CompiledForest"""
+    trees = []
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = tree.__getstate__()['nodes']
+        if 'missing_go_to_left' in nodes.dtype.names:
+            missing_left = nodes['missing_go_to_left'].astype(bool)
+        else:
+            missing_left = np.ones(tree.node_count, dtype=bool)
+        # tree_.value يحتوي النسب مباشرة، وهي ما يرجعه predict_proba لكل شجرة
+        trees.append((
+            tree.children_left, tree.children_right, tree.feature, tree.threshold,
+            missing_left, tree.value[:, 0, 1]
+        ))
+        max_depth = max(max_depth, tree.max_depth)
+    feature, threshold, children, default_left, leaf_value, roots = _pack(trees)
+    return CompiledForest('rf', feature, threshold, children, default_left, leaf_value,
+                          roots, max_depth, model.n_features_in_, source_sha256=source_sha256)
+
+
+def compile_xgboost(model, source_sha256=None):
+    """تصدير XGBClassifier (binary:logistic) إلى CompiledForest من JSON النموذج"""
+    booster = model.get_booster()
+    config = json.loads(booster.save_raw('json').decode('utf-8'))
+    learner = config['learner']
+    base_score = np.float32(str(learner['learner_model_param']['base_score']).strip('[]'))
+    trees = []
+    max_depth = 0
+    for tree in learner['gradient_booster']['model']['trees']:
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        # في الأوراق تحمل split_conditions قيمة الورقة
+        trees.append((
+            left, right, np.asarray(tree['split_indices'], dtype=np.int64),
+            conditions.astype(np.float64), np.asarray(tree['default_left'], dtype=bool),
+            np.where(left < 0, conditions, 0.0)
+        ))
+        max_depth = max(max_depth, _tree_depth(left, right))
+    feature, threshold, children, default_left, leaf_value, roots = _pack(trees)
+    return CompiledForest('xgb', feature, threshold, children, default_left,
+                          leaf_value.astype(np.float32), roots, max_depth,
+                          booster.num_features(),
+                          base_margin=np.log(base_score / (np.float32(1.0) - base_score)),
+                          source_sha256=source_sha256)
+
+
+def compile_model(model, source_sha256=None, max_table_cells=MAX_TABLE_CELLS):
+    """تصدير النموذج حسب نوعه مع جدول البحث إن أمكن (أو None إذا لم يكن مدعوماً)"""
+    name = type(model).__name__
+    if name == 'RandomForestClassifier' and getattr(model, 'n_classes_', 2) == 2:
+        compiled = compile_random_forest(model, source_sha256)
+    elif name == 'XGBClassifier' and getattr(model, 'objective', None) == 'binary:logistic':
+        compiled = compile_xgboost(model, source_sha256)
+    else:
+        return None
+    compiled.build_table(max_table_cells)
+    return compiled